@@ -0,0 +1,52 @@
+"""Пропускная способность ConcurrentLibrary при 1-32 потоках
+
+Запуск: python -m benchmarks.concurrency
+"""
+import random
+import threading
+import time
+
+from src.Library.book import Book
+from src.Library.concurrent import ConcurrentLibrary
+from src.samples import GENRES, READERS
+
+BOOKS = 5_000
+AUTHORS = [f"Автор {i}" for i in range(500)]
+TOTAL_OPS = 160_000
+
+
+def worker(library: ConcurrentLibrary, seed: int, ops: int) -> None:
+    rng = random.Random(seed)
+    for _ in range(ops):
+        isbn = f"978-{rng.randrange(BOOKS):09d}"
+        roll = rng.random()
+        if roll < 0.4:
+            library.search_books(rng.choice(AUTHORS))
+        elif roll < 0.7:
+            library.borrow_book(isbn, rng.choice(READERS))
+        elif roll < 0.99:
+            library.return_book(isbn)
+        else:
+            library.edit_book(isbn, year=rng.randrange(1800, 2024))
+
+
+def main() -> None:
+    for threads in (1, 2, 4, 8, 16, 32):
+        library = ConcurrentLibrary("Бенчмарк")
+        library.add_books(Book(f"Книга {i}", AUTHORS[i % len(AUTHORS)], 1900 + i % 120,
+                               GENRES[i % len(GENRES)], f"978-{i:09d}") for i in range(BOOKS))
+        ops = TOTAL_OPS // threads
+        pool = [threading.Thread(target=worker, args=(library, seed, ops)) for seed in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        library.update_index(verify=True)
+        assert len(library._borrowed_books) == len(library._loans)
+        print(f"потоков {threads:>2}: {ops * threads / elapsed:>10.0f} оп/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Целые ключи ISBN и фильтр Блума против строкового индекса
+
+Память: словарь ISBN -> книга на строковых ключах (строки общие с книгами),
+на целых ключах и фильтр Блума. Промахи: поиск отсутствующего ISBN в
+словаре, через фильтр и в ShardedLibrary с шардами в процессах - с фильтром
+и без него.
+
+Запуск: python -m benchmarks.isbn [--books 200000]
+"""
+import argparse
+import timeit
+import tracemalloc
+from typing import Callable, List
+
+from src.Library.bloom import BloomFilter
+from src.Library.book import Book
+from src.Library.isbn import isbn13_check_digit, isbn_key, parse_isbn
+from src.Library.sharded import ShardedLibrary
+
+
+def make_books(n: int) -> List[Book]:
+    books = []
+    for i in range(n):
+        body = f"9785{i:08d}"
+        digits = body + str(isbn13_check_digit(body))
+        isbn = f"{digits[:3]}-{digits[3]}-{digits[4:8]}-{digits[8:12]}-{digits[12]}"
+        books.append(Book(f"Книга {i}", f"Автор {i % 1000}", 1900 + i % 120, "Роман", isbn))
+    return books
+
+
+def traced(build: Callable[[], object]) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used
+
+
+def per_call_us(call: Callable[[], object], number: int = 20_000) -> float:
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=200_000)
+    args = parser.parse_args()
+    books = make_books(args.books)
+    n = len(books)
+
+    def bloom() -> BloomFilter:
+        result = BloomFilter(n)
+        result.update(parse_isbn(book.isbn) for book in books)
+        return result
+
+    print("Память на книгу, байт:")
+    print(f"  dict[str, Book]   {traced(lambda: {book.isbn: book for book in books}) / n:6.1f}")
+    print(f"  dict[int, Book]   {traced(lambda: {parse_isbn(book.isbn): book for book in books}) / n:6.1f}")
+    print(f"  BloomFilter 1%    {traced(bloom) / n:6.1f}")
+
+    by_str = {book.isbn: book for book in books}
+    by_int = {parse_isbn(book.isbn): book for book in books}
+    bits = bloom()
+    missing = "978-5-9999-9999-" + str(isbn13_check_digit("978599999999"))
+    print("Промах, мкс:")
+    print(f"  dict[str]              {per_call_us(lambda: missing in by_str):7.3f}")
+    print(f"  разбор + dict[int]     {per_call_us(lambda: parse_isbn(missing) in by_int):7.3f}")
+    print(f"  разбор + фильтр        {per_call_us(lambda: isbn_key(missing) in bits):7.3f}")
+
+    with ShardedLibrary("Бенчмарк", shards=4, processes=True) as sharded:
+        sharded.add_books(books)
+        print(f"  ShardedLibrary, шард   {per_call_us(lambda: sharded._call(missing, '__contains__', books[0]), 2000):7.3f}")
+        print(f"  ShardedLibrary, фильтр {per_call_us(lambda: sharded.get_book(missing), 2000):7.3f}")
+        probes = [f"978-4-{i:09d}" for i in range(20_000)]
+        false_positives = sum(sharded._known(isbn) for isbn in probes)
+        print(f"Ложные срабатывания фильтра: {false_positives / len(probes):.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Слияние филиалов в центральный каталог: merge против добавления по одной книге
+
+Каждый филиал держит часть общего каталога с перекрытием соседних филиалов
+и небольшой долей книг с исправленными полями. Сравнивается цикл
+`if book not in central: central + book` и Library.merge; отдельно замеряется diff.
+
+Запуск: python -m benchmarks.merge [--branches 40] [--books 20000] [--overlap 0.5]
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from src.Library.library import Library
+from src.samples import synthetic_books
+
+
+def make_branches(count: int, size: int, overlap: float, rng: random.Random) -> List[Library]:
+    step = max(1, int(size * (1 - overlap)))
+    books = synthetic_books(step * (count - 1) + size)
+    branches = []
+    for i in range(count):
+        branch = Library(f"Филиал {i}")
+        branch.add_books(books[i * step:i * step + size])
+        for book in rng.sample(books[i * step:i * step + size], size // 50):
+            branch.edit_book(book.isbn, title=book.title + " (испр.)")
+        branch.update_index()
+        branches.append(branch)
+    return branches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--branches", type=int, default=40)
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--overlap", type=float, default=0.5)
+    args = parser.parse_args()
+    branches = make_branches(args.branches, args.books, args.overlap, random.Random(3))
+
+    start = time.perf_counter()
+    loop = Library("Центральная")
+    for branch in branches:
+        for book in branch._books:
+            if book not in loop:
+                loop + book
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    diffs = [loop.diff(branch) for branch in branches]
+    diff_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged = Library("Центральная")
+    for branch in branches:
+        merged.merge(branch, conflict="theirs")
+    merge_seconds = time.perf_counter() - start
+
+    print(f"{args.branches} филиалов по {args.books} книг, в центральном каталоге {len(merged)}")
+    print(f"по одной книге:   {loop_seconds * 1000:9.1f} мс (книг: {len(loop)})")
+    print(f"merge:            {merge_seconds * 1000:9.1f} мс, ускорение {loop_seconds / merge_seconds:.1f}x")
+    print(f"diff всех:        {diff_seconds * 1000:9.1f} мс, изменено: {sum(len(d.changed) for d in diffs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Library.search_many против цикла вызовов search_books
+
+Запросы - смесь авторов, годов, жанров, ISBN и слов названий с повторами,
+как на страницах выдачи и в списках рекомендаций: несколько тысяч разных
+запросов, популярные встречаются чаще.
+
+Запуск: python -m benchmarks.search_many [--books 100000] [--queries 20000]
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.samples import synthetic_books
+
+
+def make_queries(books: List[Book], n: int, distinct: int, rng: random.Random) -> List[str]:
+    pool = []
+    for _ in range(distinct):
+        book = rng.choice(books)
+        roll = rng.random()
+        if roll < 0.5:
+            pool.append(book.author)
+        elif roll < 0.7:
+            pool.append(str(book.year))
+        elif roll < 0.75:
+            pool.append(book.genre)
+        elif roll < 0.95:
+            pool.append(book.isbn)
+        else:
+            pool.append(book.title.split()[0])
+    # популярность по закону Ципфа: k-й запрос встречается в ~1/k раз реже первого
+    weights = [1 / (k + 1) for k in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=n)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    books = synthetic_books(args.books)
+    library = Library("Бенчмарк")
+    library.add_books(books)
+    queries = make_queries(books, args.queries, args.distinct, rng)
+    print(f"{len(queries)} запросов, различных: {len(set(queries))}")
+
+    start = time.perf_counter()
+    loop = [library.search_books(query) for query in queries]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = library.search_many(queries)
+    batch_seconds = time.perf_counter() - start
+
+    assert [sorted(b.isbn for b in result) for result in loop] == \
+        [sorted(b.isbn for b in result) for result in batch]
+    print(f"цикл search_books: {loop_seconds * 1000:8.1f} мс, {len(queries) / loop_seconds:9.0f} запр/с")
+    print(f"search_many:       {batch_seconds * 1000:8.1f} мс, {len(queries) / batch_seconds:9.0f} запр/с")
+    print(f"ускорение: {loop_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Нагрузочный клиент для src.server: запросы в секунду и задержки
+
+Сервер запускается в отдельном процессе (одно ядро, один цикл событий),
+клиенты шлют команды пачками по --pipeline штук.
+
+Запуск: python -m benchmarks.server_load [--clients 32] [--requests 2000] [--pipeline 16]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from typing import List
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.samples import GENRES, READERS
+from src.server import serve
+
+BOOKS = 50_000
+
+
+def run_server(port: int, ready) -> None:
+    async def main() -> None:
+        library = Library("Нагрузочный тест")
+        library.add_books(Book(f"Книга {i}", f"Автор {i % 5000}", 1900 + i % 120,
+                               GENRES[i % len(GENRES)], f"978-{i:09d}") for i in range(BOOKS))
+        server = await serve(library, "127.0.0.1", port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def make_command(rng: random.Random) -> str:
+    isbn = f"978-{rng.randrange(BOOKS):09d}"
+    roll = rng.random()
+    if roll < 0.5:
+        return f"search 'Автор {rng.randrange(5000)}'"
+    if roll < 0.75:
+        return f"borrow {isbn} '{rng.choice(READERS)}'"
+    return f"return {isbn}"
+
+
+async def client(port: int, seed: int, requests: int, pipeline: int, latencies: List[float]) -> None:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for _ in range(requests // pipeline):
+        batch = "".join(make_command(rng) + "\n" for _ in range(pipeline))
+        start = time.perf_counter()
+        writer.write(batch.encode("utf-8"))
+        await writer.drain()
+        for _ in range(pipeline):
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+    writer.write(b"q\n")
+    writer.close()
+
+
+async def load(port: int, clients: int, requests: int, pipeline: int) -> None:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, seed, requests, pipeline, latencies) for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"клиентов {clients}, конвейер {pipeline}: {len(latencies) / elapsed:.0f} запр/с, "
+          f"p50 {p50:.2f} мс, p99 {p99:.2f} мс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=7071)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на клиента")
+    parser.add_argument("--pipeline", type=int, default=16)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_server, args=(args.port, ready), daemon=True)
+    server.start()
+    ready.wait()
+    try:
+        asyncio.run(load(args.port, args.clients, args.requests, args.pipeline))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Масштабный бенчмарк операций Library на каталогах разного размера
+
+Каталоги генерирует samples.synthetic_books. Для каждого размера
+замеряются отдельные вызовы операций, и в отчёт попадает медиана. Показатель
+сложности равен наклону log(медиана) по log(размер) между крайними размерами:
+около 0 означает O(1), около 1 означает O(n).
+
+С --save результаты записываются как базовые. Без него идёт сравнение с
+сохранённой базой, и скрипт завершается с кодом 1, если у операции вырос
+показатель сложности больше чем на --slope-tolerance или медиана на каком-то
+размере выросла больше чем в --median-threshold раз. Медианы зависят от
+машины: сохранённая в репозитории база годится для сравнения показателей
+сложности, а медианы на другой машине сначала сохраняют заново с --save.
+
+Запуск: python -m benchmarks.suite [--sizes 1000,100000,1000000] [--save] [--baseline путь]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from statistics import median
+from typing import Callable, Dict, List, Optional
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.samples import synthetic_books
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SAMPLES = 300
+ROUNDS = 5
+BUDGET_NS = 500_000_000  # на один раунд
+SEED = 17
+
+
+def measure(operation: Callable[[int], None], setup: Optional[Callable[[int], None]] = None,
+            samples: int = SAMPLES) -> float:
+    """Медиана одиночного вызова в микросекундах
+
+    operation и setup получают номер попытки; setup выполняется перед
+    каждым вызовом и в замер не входит. Замер повторяется ROUNDS раз, и берётся
+    наименьшая медиана: так меньше влияют прогрев и соседние процессы.
+    Медленные операции прерываются по BUDGET_NS, но не раньше пяти вызовов.
+    """
+    clock = time.perf_counter_ns
+    best = math.inf
+    for _ in range(ROUNDS):
+        timings = []
+        deadline = clock() + BUDGET_NS
+        for i in range(samples):
+            if setup is not None:
+                setup(i)
+            start = clock()
+            operation(i)
+            timings.append(clock() - start)
+            if start > deadline and len(timings) >= 5:
+                break
+        best = min(best, median(timings))
+    return best / 1000
+
+
+def bench_size(n: int) -> Dict[str, float]:
+    """Медианы всех операций на каталоге из n книг"""
+    rng = random.Random(SEED)
+    books = synthetic_books(n, SEED)
+    library = Library("Бенчмарк")
+    library.add_books(books)
+
+    picked = [rng.choice(books) for _ in range(SAMPLES)]
+    fresh = synthetic_books(SAMPLES, SEED + 1, first=n)
+    missing = [Book(b.title, b.author, b.year, b.genre, "000-" + b.isbn) for b in fresh]
+
+    def add_remove(i: int) -> None:
+        library.add_book(fresh[i])
+        library.remove_book(fresh[i].isbn)
+
+    def edit(i: int) -> None:
+        library.edit_book(picked[i].isbn, year=picked[i].year + 1)
+
+    return {
+        "search_author": measure(lambda i: library.search_books(picked[i].author)),
+        "search_genre": measure(lambda i: library.search_books(picked[i].genre)),
+        "search_year": measure(lambda i: library.search_books(str(picked[i].year))),
+        "search_missing": measure(lambda i: library.search_books(missing[i].isbn)),
+        "contains_hit": measure(lambda i: picked[i] in library),
+        "contains_miss": measure(lambda i: missing[i] in library),
+        "add_remove": measure(add_remove),
+        # update_index после правки одной книги
+        "update_index": measure(lambda i: library.update_index(), setup=edit),
+    }
+
+
+def slope(medians: Dict[int, float]) -> float:
+    """Наклон log(время) по log(размер) между наименьшим и наибольшим размером"""
+    lo, hi = min(medians), max(medians)
+    if lo == hi:
+        return 0.0
+    return math.log(max(medians[hi], 1e-3) / max(medians[lo], 1e-3)) / math.log(hi / lo)
+
+
+def run(sizes: List[int]) -> dict:
+    by_size = {}
+    for n in sizes:
+        start = time.perf_counter()
+        by_size[n] = bench_size(n)
+        print(f"{n:>9} книг: {time.perf_counter() - start:.1f} с", file=sys.stderr)
+
+    report = {}
+    for operation in by_size[sizes[0]]:
+        medians = {n: by_size[n][operation] for n in sizes}
+        report[operation] = {
+            "median_us": {str(n): round(value, 3) for n, value in medians.items()},
+            "slope": round(slope(medians), 3),
+        }
+    return report
+
+
+def compare(report: dict, baseline: dict, median_threshold: float, slope_tolerance: float) -> List[str]:
+    """Список регрессий относительно базовых результатов"""
+    problems = []
+    for operation, current in report.items():
+        base = baseline.get(operation)
+        if base is None:
+            continue
+        if current["slope"] > base["slope"] + slope_tolerance:
+            problems.append(f"{operation}: сложность n^{base['slope']:.2f} -> n^{current['slope']:.2f}")
+        for size, value in current["median_us"].items():
+            old = base["median_us"].get(size)
+            if old and value > old * median_threshold:
+                problems.append(f"{operation} при {size}: медиана {old:.2f} -> {value:.2f} мкс")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк операций Library")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="записать результаты как базовые")
+    parser.add_argument("--median-threshold", type=float, default=1.5,
+                        help="допустимый рост медианы, во сколько раз")
+    parser.add_argument("--slope-tolerance", type=float, default=0.25,
+                        help="допустимый рост показателя сложности")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    report = run(sizes)
+    for operation, row in report.items():
+        medians = "  ".join(f"{size}: {value:9.2f}" for size, value in row["median_us"].items())
+        print(f"{operation:15} n^{row['slope']:<6.2f} {medians}  мкс")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Базовые результаты сохранены в {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Нет базовых результатов {args.baseline}; запустите с --save")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = compare(report, baseline, args.median_threshold, args.slope_tolerance)
+    for problem in problems:
+        print(f"РЕГРЕССИЯ {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Пропускная способность Library с журналом изменений и без него
+
+Запуск: python -m benchmarks.wal
+"""
+import os
+import tempfile
+import time
+from typing import Optional
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.Library.wal import WriteAheadLog
+
+BOOKS = 20_000
+
+
+def run(wal: Optional[WriteAheadLog]) -> float:
+    """Операций в секунду: добавление, выдача и возврат каждой книги"""
+    library = Library("Бенчмарк")
+    library.attach_wal(wal)
+    start = time.perf_counter()
+    for i in range(BOOKS):
+        isbn = f"978-{i:09d}"
+        library.add_book(Book(f"Книга {i}", f"Автор {i % 500}", 1900 + i % 120, "Роман", isbn))
+        library.borrow_book(isbn=isbn, reader="Иванов И.И.")
+        library.return_book(isbn)
+    if wal is not None:
+        wal.close()
+    return 3 * BOOKS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    print(f"без журнала: {run(None):>12.0f} оп/с")
+    with tempfile.TemporaryDirectory() as directory:
+        for group_size, fsync in [(1, True), (64, True), (1024, True), (1024, False)]:
+            path = os.path.join(directory, f"wal-{group_size}-{fsync}.log")
+            ops = run(WriteAheadLog(path, group_size=group_size, fsync=fsync))
+            print(f"журнал, группа {group_size:>4}, fsync={fsync!s:<5}: {ops:>12.0f} оп/с")
+
+
+if __name__ == "__main__":
+    main()
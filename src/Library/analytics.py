@@ -0,0 +1,154 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.Library.book import Book
+
+# numpy импортируется при первом построении аналитики: он необязателен,
+# а его импорт заметно замедлил бы запуск остальной библиотеки
+np = None
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Для аналитики каталога нужен numpy: pip install numpy") from None
+        np = numpy
+
+
+class CatalogAnalytics:
+    """колоночное представление каталога для отчётов
+
+    Год, код жанра, код автора и признак выдачи хранятся в массивах numpy,
+    строка на книгу. Удалённые строки помечаются и переиспользуются, поэтому
+    изменения обходятся в O(1), а отчёты считаются векторно по всем строкам.
+    """
+
+    def __init__(self, books: Iterable[Book] = (), borrowed: Iterable[str] = ()):
+        _import_numpy()
+        self._rows: Dict[str, int] = {}  # ISBN -> строка
+        self._free: List[int] = []
+        self._strings: List[str] = []  # код -> автор или жанр
+        self._codes: Dict[str, int] = {}
+        self._size = 0  # занятая часть массивов, включая освободившиеся строки
+        self._allocate(1024)
+        for book in books:
+            self.add(book)
+        for isbn in borrowed:
+            self.set_borrowed(isbn, True)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __repr__(self) -> str:
+        return f"CatalogAnalytics(книг: {len(self)}, строк: {self._size})"
+
+    def _allocate(self, capacity: int) -> None:
+        old = self._size
+        columns = {"_years": np.int32, "_genres": np.int32, "_authors": np.int32,
+                   "_borrowed": np.bool_, "_alive": np.bool_}
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if old:
+                column[:old] = getattr(self, name)[:old]
+            setattr(self, name, column)
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def add(self, book: Book) -> None:
+        """Добавление книги; для существующего ISBN строка перезаписывается"""
+        row = self._rows.get(book.isbn)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == len(self._years):
+                    self._allocate(2 * self._size)
+                row = self._size
+                self._size += 1
+            self._rows[book.isbn] = row
+            self._borrowed[row] = False
+        self._years[row] = book.year
+        self._genres[row] = self._code(book.genre)
+        self._authors[row] = self._code(book.author)
+        self._alive[row] = True
+
+    def remove(self, isbn: str) -> bool:
+        row = self._rows.pop(isbn, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self._borrowed[row] = False
+        self._free.append(row)
+        return True
+
+    def clear(self) -> None:
+        """Удаление всех строк; объект остаётся тем же, ссылки на него не устаревают"""
+        self._rows.clear()
+        self._free.clear()
+        self._strings.clear()
+        self._codes.clear()
+        self._size = 0
+        self._allocate(1024)
+
+    def set_borrowed(self, isbn: str, borrowed: bool) -> None:
+        row = self._rows.get(isbn)
+        if row is not None:
+            self._borrowed[row] = borrowed
+
+    def _column(self, name: str):
+        """Значения колонки по живым строкам"""
+        return getattr(self, name)[:self._size][self._alive[:self._size]]
+
+    def _named_counts(self, codes) -> Dict[str, int]:
+        counts = np.bincount(codes, minlength=len(self._strings))
+        return {self._strings[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def count_by_genre(self) -> Dict[str, int]:
+        return self._named_counts(self._column("_genres"))
+
+    def count_by_author(self) -> Dict[str, int]:
+        return self._named_counts(self._column("_authors"))
+
+    def count_by_decade(self) -> Dict[int, int]:
+        decades, counts = np.unique(self._column("_years") // 10 * 10, return_counts=True)
+        return {int(decade): int(n) for decade, n in zip(decades, counts)}
+
+    def year_histogram(self, lo: int, hi: int, step: int = 1) -> Dict[int, int]:
+        """Число книг по интервалам [год, год + step) с lo по hi включительно"""
+        years = self._column("_years").astype(np.int64)
+        years = years[(years >= lo) & (years <= hi)]
+        counts = np.bincount((years - lo) // step, minlength=(hi - lo) // step + 1)
+        return {lo + i * step: int(n) for i, n in enumerate(counts)}
+
+    def top_authors(self, k: int = 10) -> List[Tuple[str, int]]:
+        """k авторов с наибольшим числом книг; при равенстве - в порядке появления"""
+        counts = np.bincount(self._column("_authors"), minlength=len(self._strings))
+        k = min(k, int(np.count_nonzero(counts)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-counts, k - 1)[:k]
+        top = top[np.lexsort((top, -counts[top]))]
+        return [(self._strings[code], int(counts[code])) for code in top]
+
+    def loan_ratio_by_genre(self) -> Dict[str, float]:
+        """Доля выданных книг в каждом жанре"""
+        genres = self._column("_genres")
+        total = np.bincount(genres, minlength=len(self._strings))
+        borrowed = np.bincount(genres, weights=self._column("_borrowed"), minlength=len(self._strings))
+        return {self._strings[code]: float(borrowed[code] / total[code]) for code in np.flatnonzero(total)}
+
+    def borrowed_count(self, genre: Optional[str] = None) -> int:
+        borrowed = self._column("_borrowed")
+        if genre is not None:
+            code = self._codes.get(genre)
+            if code is None:
+                return 0
+            borrowed = borrowed & (self._column("_genres") == code)
+        return int(np.count_nonzero(borrowed))
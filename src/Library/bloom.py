@@ -0,0 +1,64 @@
+import math
+from typing import Hashable, Iterable
+
+_MASK = (1 << 64) - 1
+
+
+class BloomFilter:
+    """фильтр Блума: «точно нет» или «возможно есть»
+
+    Размер и число хеш-функций подбираются по ожидаемому числу ключей и
+    доле ложных срабатываний. Удалять ключи нельзя: после удалений фильтр
+    перестраивают заново. Ключи хешируются встроенным hash(), который для строк
+    различается между процессами, поэтому фильтр живёт только в памяти.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        bits = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self._size = max(bits, 64)
+        self._hashes = max(1, round(self._size / self.capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"BloomFilter(ключей: {self.count}, бит: {self._size}, хешей: {self._hashes})"
+
+    def _positions(self, key: Hashable) -> range:
+        # двойное хеширование: k позиций из двух половин одного 64-битного хеша
+        # хеш кортежа (xxHash) хорошо перемешивает даже соседние целые ключи
+        h = hash((key, 0x9E3779B9)) & _MASK
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return range(h1, h1 + self._hashes * h2, h2)
+
+    def add(self, key: Hashable) -> None:
+        size, bits = self._size, self._bits
+        for position in self._positions(key):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        size, bits = self._size, self._bits
+        for position in self._positions(key):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def overfull(self) -> bool:
+        """Ключей больше расчётного: доля ложных срабатываний выше заданной"""
+        return self.count > self.capacity
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
@@ -2,9 +2,9 @@ from dataclasses import dataclass
 from typing import Optional, List, Dict, Union, Iterator
 import random
 
-@dataclass
+@dataclass(slots=True)
 class Book:
-    """класс книги"""
+    """класс книги (без __dict__, чтобы экономить память на больших каталогах)"""
     title: str
     author: str
     year: int
@@ -19,57 +19,86 @@ class Book:
 
 
 class BookCollection:
-    """пользовательская списоковая коллекция книг"""
+    """пользовательская коллекция книг с доступом по ISBN"""
 
     def __init__(self, books: Optional[List[Book]] = None):
-        self._books = books if books is not None else []
+        # слоты в порядке добавления, удалённые книги оставляют None
+        self._books: List[Optional[Book]] = []
+        self._positions: Dict[str, int] = {}  # ISBN -> номер слота
+        self._holes = 0
+        if books is not None:
+            for book in books:
+                self.add(book)
 
     def __iter__(self) -> Iterator[Book]:
-        return iter(self._books)
+        return (book for book in self._books if book is not None)
 
     def __len__(self) -> int:
-        return len(self._books)
+        return len(self._positions)
 
     def __getitem__(self, key: Union[int, slice]) -> Union[Book, 'BookCollection']:
+        if self._holes:
+            self._compact()
         if isinstance(key, slice):
             return BookCollection(self._books[key])
         return self._books[key]
 
     def __contains__(self, book: Book) -> bool:
         """наличие книги в коллекции"""
-        for i in range(0, len(self._books) + 1):
-            if self._books[i] == book:
-                return True
-        return False
+        position = self._positions.get(book.isbn)
+        return position is not None and self._books[position] == book
 
     def __repr__(self) -> str:
         return f"BookCollection(books={len(self)} шт.)"
 
+    def _compact(self) -> None:
+        """Удаление пустых слотов с сохранением порядка"""
+        self._books = [book for book in self._books if book is not None]
+        self._positions = {book.isbn: i for i, book in enumerate(self._books)}
+        self._holes = 0
+
     def add(self, book: Book) -> None:
+        position = self._positions.get(book.isbn)
+        if position is not None:
+            self._books[position] = book
+            return
+        self._positions[book.isbn] = len(self._books)
         self._books.append(book)
 
     def remove(self, book: Book) -> bool:
-        if book in self._books:
-            self._books.remove(book)
-            return True
-        return False
+        if book not in self:
+            return False
+        position = self._positions.pop(book.isbn)
+        self._books[position] = None
+        self._holes += 1
+        if self._holes * 2 > len(self._books):
+            self._compact()
+        return True
 
     def clear(self) -> None:
         self._books.clear()
+        self._positions.clear()
+        self._holes = 0
+
+    def get(self, isbn: str) -> Optional[Book]:
+        """Книга по ISBN"""
+        position = self._positions.get(isbn)
+        return None if position is None else self._books[position]
 
     def filter_by_author(self, author: str) -> 'BookCollection':
-        return BookCollection([book for book in self._books if book.author == author])
+        return BookCollection([book for book in self if book.author == author])
 
     def filter_by_genre(self, genre: str) -> 'BookCollection':
-        return BookCollection([book for book in self._books if not (book.genre == genre)])
+        return BookCollection([book for book in self if book.genre == genre])
 
     def filter_by_year(self, year: int) -> 'BookCollection':
-        return BookCollection([book for book in self._books if book.year == year])
+        return BookCollection([book for book in self if book.year == year])
 
     def get_random_book(self) -> Optional[Book]:
-        if not self._books:
+        if not self._positions:
             return None
-        return random.choice(self._books)
-
-
-
+        # пустых слотов не больше половины, поэтому в среднем хватает двух попыток
+        while True:
+            book = self._books[random.randrange(len(self._books))]
+            if book is not None:
+                return book
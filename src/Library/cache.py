@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Hashable, Tuple, Any
+
+
+@dataclass
+class CacheStats:
+    """статистика кэша запросов"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    stale: int = 0  # записи, отброшенные из-за смены версии или TTL
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class QueryCache:
+    """LRU-кэш результатов поиска с версией данных и TTL
+
+    Запись действительна, пока версия библиотеки не изменилась и не истёк ttl.
+    Размер оценивается вызывающей стороной; при превышении max_entries или
+    max_bytes вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # ключ -> (версия, момент истечения, размер, значение)
+        self._entries: 'OrderedDict[Hashable, Tuple[int, float, int, Any]]' = OrderedDict()
+        self._bytes = 0
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"QueryCache(записей: {len(self)}, попаданий: {self._stats.hits}, промахов: {self._stats.misses})"
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        with self._lock:
+            return self._get(key, version)
+
+    def _get(self, key: Hashable, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, expires, _, value = entry
+            if entry_version == version and expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return value
+            self._drop(key)
+            self._stats.stale += 1
+        self._stats.misses += 1
+        return None
+
+    def put(self, key: Hashable, version: int, value: Any, size: int = 0) -> None:
+        with self._lock:
+            self._put(key, version, value, size)
+
+    def _put(self, key: Hashable, version: int, value: Any, size: int) -> None:
+        if key in self._entries:
+            self._drop(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (version, expires, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self._stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        """Снимок статистики"""
+        return CacheStats(self._stats.hits, self._stats.misses, self._stats.evictions,
+                          self._stats.stale, len(self._entries), self._bytes)
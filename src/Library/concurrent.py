@@ -0,0 +1,215 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Any, Optional, List, Iterable, Iterator, Tuple, Union
+
+from src.Library.analytics import CatalogAnalytics
+from src.Library.book import Book, BookCollection
+from src.Library.diff import CatalogDiff, Resolver
+from src.Library.library import Library
+from src.Library.loans import Loan, LoanRegistry
+from src.Library.locks import RWLock, StripedLock
+from src.Library.query import Query
+
+
+class LockedLoanRegistry(LoanRegistry):
+    """реестр выдач с внутренней блокировкой на время одной операции"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def borrow(self, isbn: str, reader: str, due: Optional[float] = None) -> Optional[Loan]:
+        with self._lock:
+            return super().borrow(isbn, reader, due)
+
+    def return_loan(self, isbn: str) -> Optional[Loan]:
+        with self._lock:
+            return super().return_loan(isbn)
+
+    def renew(self, isbn: str, due: Optional[float] = None) -> bool:
+        with self._lock:
+            return super().renew(isbn, due)
+
+    def __iter__(self) -> Iterator[Loan]:
+        with self._lock:
+            return iter(list(super().__iter__()))
+
+    def loans_of(self, reader: str) -> List[Loan]:
+        with self._lock:
+            return super().loans_of(reader)
+
+    def overdue(self, n: Optional[int] = None, now: Optional[float] = None) -> List[Loan]:
+        with self._lock:
+            return super().overdue(n, now)
+
+
+@dataclass(frozen=True)
+class LockedQuery(Query):
+    """составной запрос к ConcurrentLibrary: книги выбираются под блокировкой чтения"""
+
+    def __iter__(self) -> Iterator[Book]:
+        # результат собирается целиком, иначе обход шёл бы по корзинам индекса без блокировки
+        with self.library._rwlock.read():
+            return iter(list(super().__iter__()))
+
+    def explain(self) -> str:
+        with self.library._rwlock.read():
+            return super().explain()
+
+
+class LockedAnalytics:
+    """отчёты CatalogAnalytics под блокировкой чтения библиотеки"""
+
+    def __init__(self, analytics: CatalogAnalytics, rwlock: RWLock):
+        self._analytics = analytics
+        self._rwlock = rwlock
+
+    def __len__(self) -> int:
+        with self._rwlock.read():
+            return len(self._analytics)
+
+    def __repr__(self) -> str:
+        return f"Locked{self._analytics!r}"
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._analytics, name)
+
+        def locked(*args, **kwargs):
+            with self._rwlock.read():
+                return method(*args, **kwargs)
+
+        return locked
+
+
+class ConcurrentLibrary(Library):
+    """библиотека для работы из нескольких потоков
+
+    Поиск идёт параллельно под блокировкой чтения, изменения каталога берут
+    блокировку записи. Выдача и возврат идут под чтением каталога и
+    блокировкой полосы своего ISBN, поэтому одну книгу нельзя выдать дважды,
+    а операции с разными книгами не ждут друг друга. Общие структуры реестра
+    выдач защищены его собственной короткой блокировкой.
+    """
+
+    def __init__(self, name: str, books: Optional[BookCollection] = None, stripes: int = 64):
+        self._rwlock = RWLock()
+        self._isbn_locks = StripedLock(stripes)
+        super().__init__(name, books)
+        self._loans = LockedLoanRegistry()
+        self._borrowed_books = self._loans.readers
+        self._locked_analytics: Optional[LockedAnalytics] = None
+
+    def __len__(self) -> int:
+        with self._rwlock.read():
+            return super().__len__()
+
+    def __contains__(self, book: Book) -> bool:
+        with self._rwlock.read():
+            return super().__contains__(book)
+
+    def add_book(self, book: Book) -> None:
+        with self._rwlock.write():
+            super().add_book(book)
+
+    def add_books(self, books: Iterable[Book]) -> int:
+        with self._rwlock.write():
+            return super().add_books(books)
+
+    def remove_book(self, isbn: str) -> bool:
+        with self._rwlock.write():
+            return super().remove_book(isbn)
+
+    def edit_book(self, isbn: str, **fields: Union[str, int]) -> bool:
+        with self._rwlock.write():
+            return super().edit_book(isbn, **fields)
+
+    @contextmanager
+    def _locked_with(self, other: Library, write: bool) -> Iterator[None]:
+        """Своя блокировка (записи или чтения) и чтение other, если это тоже ConcurrentLibrary
+
+        Блокировки берутся в порядке id библиотек, поэтому встречные
+        a.merge(b) и b.merge(a) не ждут друг друга.
+        """
+        locks = [(id(self), self._rwlock.write if write else self._rwlock.read)]
+        if isinstance(other, ConcurrentLibrary) and other is not self:
+            locks.append((id(other), other._rwlock.read))
+        with ExitStack() as stack:
+            for _, lock in sorted(locks, key=lambda item: item[0]):
+                stack.enter_context(lock())
+            yield
+
+    def diff(self, other: Library) -> CatalogDiff:
+        with self._locked_with(other, write=False):
+            return super().diff(other)
+
+    def merge(self, other: Library, conflict: Union[str, Resolver] = "ours") -> CatalogDiff:
+        # слияние целиком под записью: читатели не видят каталог без части выдач
+        with self._locked_with(other, write=True):
+            return super().merge(other, conflict)
+
+    def update_index(self, verify: bool = False) -> None:
+        with self._rwlock.write():
+            super().update_index(verify)
+
+    def rebuild_index(self) -> None:
+        with self._rwlock.write():
+            super().rebuild_index()
+
+    def check_index(self) -> List[str]:
+        with self._rwlock.read():
+            return super().check_index()
+
+    def query(self) -> LockedQuery:
+        return LockedQuery(self)
+
+    def analytics(self) -> LockedAnalytics:
+        """Отчёты по каталогу; каждый отчёт считается под блокировкой чтения"""
+        if self._locked_analytics is not None:
+            return self._locked_analytics
+        # первое построение меняет библиотеку
+        with self._rwlock.write():
+            if self._locked_analytics is None:
+                self._locked_analytics = LockedAnalytics(super().analytics(), self._rwlock)
+            return self._locked_analytics
+
+    def set_loan_policy(self, loan_days: float = 14, max_per_reader: Optional[int] = None) -> None:
+        with self._rwlock.write():
+            super().set_loan_policy(loan_days, max_per_reader)
+
+    def search_books(self, query: str) -> BookCollection:
+        with self._rwlock.read():
+            return super().search_books(query)
+
+    def search_many(self, queries: Iterable[str]) -> List[Tuple[Book, ...]]:
+        with self._rwlock.read():
+            return super().search_many(queries)
+
+    def search_by_title(self, query: str, k: Optional[int] = 10, fuzzy: bool = True) -> BookCollection:
+        with self._rwlock.read():
+            return super().search_by_title(query, k, fuzzy)
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        # результат собирается под блокировкой, иначе поток читал бы индекс уже без неё
+        with self._rwlock.read():
+            return iter(list(super().search_by_year_range(lo, hi)))
+
+    def search_by_decade(self, decade: int) -> Iterator[Book]:
+        with self._rwlock.read():
+            return iter(list(super().search_by_decade(decade)))
+
+    def get_random_book(self) -> Optional[Book]:
+        with self._rwlock.read():
+            return super().get_random_book()
+
+    def borrow_book(self, isbn: str, reader: str, due: Optional[float] = None) -> bool:
+        with self._rwlock.read(), self._isbn_locks.lock(isbn):
+            return super().borrow_book(isbn, reader, due)
+
+    def return_book(self, isbn: str) -> bool:
+        with self._rwlock.read(), self._isbn_locks.lock(isbn):
+            return super().return_book(isbn)
+
+    def save(self, path: str) -> None:
+        with self._rwlock.write():
+            super().save(path)
@@ -0,0 +1,49 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+from src.Library.book import Book, BookCollection
+
+# выбор версии книги при слиянии: (наша, их) -> итоговая
+Resolver = Callable[[Book, Book], Book]
+
+FIELDS = ("title", "author", "year", "genre")
+
+
+def book_fields(book: Book) -> Tuple[str, str, int, str]:
+    """Поля книги без ISBN; Book и BookView сравниваются одинаково"""
+    return book.title, book.author, book.year, book.genre
+
+
+@dataclass
+class CatalogDiff:
+    """различия двух каталогов по ISBN: чего нет у нас, чего нет у них, что отличается"""
+    added: List[Book] = field(default_factory=list)
+    removed: List[Book] = field(default_factory=list)
+    changed: List[Tuple[Book, Book]] = field(default_factory=list)  # (наша, их)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self) -> str:
+        return f"CatalogDiff(добавлено: {len(self.added)}, удалено: {len(self.removed)}, изменено: {len(self.changed)})"
+
+
+def diff_books(ours: BookCollection, theirs: BookCollection, removed: bool = True) -> CatalogDiff:
+    """Сравнение каталогов по ISBN за один проход по каждому, O(n + m)
+
+    removed=False пропускает проход по нашему каталогу: слиянию удалённые
+    книги не нужны, а наш каталог обычно намного больше.
+    """
+    result = CatalogDiff()
+    ours_get, theirs_get = ours.get, theirs.get
+    for book in theirs:
+        current = ours_get(book.isbn)
+        if current is None:
+            result.added.append(book)
+        # сравнение Book == Book быстрее, поля сравниваются, только если оно не сработало
+        elif current != book and book_fields(current) != book_fields(book):
+            result.changed.append((current, book))
+    for book in ours if removed else ():
+        if theirs_get(book.isbn) is None:
+            result.removed.append(book)
+    return result
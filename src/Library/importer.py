@@ -0,0 +1,91 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Optional, List, Dict, Iterator, Iterable
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.Library.store import check_year
+
+FIELDS = ("title", "author", "year", "genre", "isbn")
+
+
+@dataclass
+class ImportReport:
+    """итоги импорта каталога"""
+    rows: int = 0
+    added: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)  # первые ошибки для диагностики
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"Импорт: строк {self.rows}, добавлено {self.added}, дубликатов {self.duplicates}, "
+                f"отклонено {self.rejected}, {self.rows_per_second:.0f} строк/с")
+
+
+def read_csv(path: str) -> Iterator[Dict[str, str]]:
+    """Построчное чтение CSV с заголовком title,author,year,genre,isbn"""
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, object]]:
+    """Построчное чтение JSONL; битые строки отдаются как None"""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def parse_books(rows: Iterable[Optional[Dict]], report: ImportReport, max_errors: int = 20) -> Iterator[Book]:
+    """Преобразование строк в книги с подсчётом отклонённых строк"""
+    for row in rows:
+        report.rows += 1
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("строка не разобрана")
+            values = {name: row.get(name) for name in FIELDS}
+            missing = [name for name, value in values.items() if value in (None, "")]
+            if missing:
+                raise ValueError(f"нет полей {', '.join(missing)}")
+            year = int(values["year"])
+            check_year(year)
+            yield Book(str(values["title"]), str(values["author"]), year,
+                       str(values["genre"]), str(values["isbn"]))
+        except (ValueError, TypeError) as e:
+            report.rejected += 1
+            if len(report.errors) < max_errors:
+                report.errors.append(f"строка {report.rows}: {e}")
+
+
+def batched(books: Iterable[Book], size: int) -> Iterator[List[Book]]:
+    """Разбиение потока на пакеты фиксированного размера"""
+    iterator = iter(books)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_catalog(library: Library, path: str, batch_size: int = 10_000) -> ImportReport:
+    """Потоковый импорт CSV/JSONL в библиотеку пакетами через Library.add_books"""
+    report = ImportReport()
+    rows = read_jsonl(path) if path.endswith((".jsonl", ".ndjson")) else read_csv(path)
+
+    start = time.perf_counter()
+    for batch in batched(parse_books(rows, report), batch_size):
+        added = library.add_books(batch)
+        report.added += added
+        report.duplicates += len(batch) - added
+    report.seconds = time.perf_counter() - start
+    return report
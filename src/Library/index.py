@@ -1,13 +1,26 @@
+from bisect import bisect_left, bisect_right, insort
 from src.Library.book import Book
-from typing import Optional, List, Dict, Union, Iterator
+from typing import Optional, List, Dict, Union, Iterator, Iterable
 
 class IndexDict:
-    """пользовательская словарная коллекция для индексации книг"""
+    """пользовательская словарная коллекция для индексации книг
+
+    Вторичные индексы хранят книги в словарях ISBN -> книга: порядок
+    добавления сохраняется, а удаление из корзины не требует обхода.
+    """
+
+    # операции, которые измеряются при включённых метриках библиотеки
+    MEASURED = (
+        "add_book", "add_books", "remove_book", "search_by_isbn", "search_by_author",
+        "search_by_year", "search_by_genre", "search_by_year_range", "count_year_range",
+    )
 
     def __init__(self):
         self._isbn_index: Dict[str, Book] = {}
-        self._author_index: Dict[str, List[Book]] = {}
-        self._year_index: Dict[int, List[Book]] = {}
+        self._author_index: Dict[str, Dict[str, Book]] = {}
+        self._year_index: Dict[int, Dict[str, Book]] = {}
+        self._genre_index: Dict[str, Dict[str, Book]] = {}
+        self._year_keys: List[int] = []  # отсортированные годы для диапазонных запросов
 
     def __len__(self) -> int:
         return len(self._isbn_index)
@@ -17,9 +30,9 @@ class IndexDict:
         if key in self._isbn_index:
             return self._isbn_index[key]
         elif key in self._author_index:
-            return self._author_index[key]
+            return list(self._author_index[key].values())
         elif str(key).isdigit() and int(key) in self._year_index:
-            return self._year_index[int(key)]
+            return list(self._year_index[int(key)].values())
         raise KeyError(f"Ключ '{key}' не найден в индексах")
 
     def __iter__(self) -> Iterator[str]:
@@ -31,7 +44,7 @@ class IndexDict:
         return isbn in self._isbn_index
 
     def __repr__(self) -> str:
-        return f"IndexDict(книг: {len(self._isbn_index)}, авторов: {len(self._author_index)}, годов: {len(self._year_index)})"
+        return f"IndexDict(книг: {len(self._isbn_index)}, авторов: {len(self._author_index)}, годов: {len(self._year_index)}, жанров: {len(self._genre_index)})"
 
     def add_book(self, book: Book) -> None:
         """Добавление книги во все индексы"""
@@ -40,48 +53,147 @@ class IndexDict:
 
         # по автору
         if book.author not in self._author_index:
-            self._author_index[book.author] = []
-        self._author_index[book.author].append(book)
+            self._author_index[book.author] = {}
+        self._author_index[book.author][book.isbn] = book
 
         # по году
         if book.year not in self._year_index:
-            self._year_index[book.year] = []
-        self._year_index[book.year].append(book)
-
-    def remove_book(self, isbn: str) -> bool:
-        """Удаление книги из всех индексов"""
+            self._year_index[book.year] = {}
+            insort(self._year_keys, book.year)
+        self._year_index[book.year][book.isbn] = book
+
+        # по жанру
+        if book.genre not in self._genre_index:
+            self._genre_index[book.genre] = {}
+        self._genre_index[book.genre][book.isbn] = book
+
+    def add_books(self, books: Iterable[Book]) -> None:
+        """Пакетное добавление: корзины строятся за один проход, годы сортируются один раз"""
+        isbn_index = self._isbn_index
+        author_index = self._author_index
+        year_index = self._year_index
+        genre_index = self._genre_index
+        new_years = set()
+
+        for book in books:
+            isbn = book.isbn
+            isbn_index[isbn] = book
+
+            bucket = author_index.get(book.author)
+            if bucket is None:
+                bucket = author_index[book.author] = {}
+            bucket[isbn] = book
+
+            bucket = year_index.get(book.year)
+            if bucket is None:
+                bucket = year_index[book.year] = {}
+                new_years.add(book.year)
+            bucket[isbn] = book
+
+            bucket = genre_index.get(book.genre)
+            if bucket is None:
+                bucket = genre_index[book.genre] = {}
+            bucket[isbn] = book
+
+        if new_years:
+            self._year_keys = sorted(new_years.union(self._year_keys))
+
+    def remove_book(self, isbn: str, indexed: Optional[Book] = None) -> bool:
+        """Удаление книги из всех индексов
+
+        indexed - копия книги в том виде, в каком она индексировалась,
+        если книга с тех пор изменилась на месте.
+        """
         if isbn not in self._isbn_index:
             return False
 
-        book = self._isbn_index[isbn]
+        book = indexed if indexed is not None else self._isbn_index[isbn]
 
         # по ISBN
         del self._isbn_index[isbn]
 
         # по автору
         if book.author in self._author_index:
-            self._author_index[book.author].remove(book)
+            del self._author_index[book.author][isbn]
             if not self._author_index[book.author]:
                 del self._author_index[book.author]
 
         # по году
         if book.year in self._year_index:
-            self._year_index[book.year].remove(book)
+            del self._year_index[book.year][isbn]
             if not self._year_index[book.year]:
                 del self._year_index[book.year]
+                del self._year_keys[bisect_left(self._year_keys, book.year)]
+
+        # по жанру
+        if book.genre in self._genre_index:
+            del self._genre_index[book.genre][isbn]
+            if not self._genre_index[book.genre]:
+                del self._genre_index[book.genre]
 
         return True
 
+    def check_book(self, book: Book) -> bool:
+        """Книга присутствует во всех индексах под своими текущими ключами"""
+        return (self._isbn_index.get(book.isbn) is not None
+                and book.isbn in self._author_index.get(book.author, {})
+                and book.isbn in self._year_index.get(book.year, {})
+                and book.isbn in self._genre_index.get(book.genre, {}))
+
+    def extra_entries(self) -> int:
+        """Записи в корзинах автора, года и жанра сверх одной на книгу
+
+        Лишние записи остаются от книг, проиндексированных под прежними полями.
+        """
+        books = len(self._isbn_index)
+        return sum(sum(map(len, index.values())) - books
+                   for index in (self._author_index, self._year_index, self._genre_index))
+
     def search_by_isbn(self, isbn: str) -> Optional[Book]:
         return self._isbn_index.get(isbn)
 
     def search_by_author(self, author: str) -> List[Book]:
-        return self._author_index.get(author, [])
+        return list(self._author_index.get(author, {}).values())
 
     def search_by_year(self, year: int) -> List[Book]:
-        return self._year_index.get(year, [])
+        return list(self._year_index.get(year, {}).values())
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        """Книги с годом издания из [lo, hi] в порядке возрастания года"""
+        start = bisect_left(self._year_keys, lo)
+        stop = bisect_right(self._year_keys, hi)
+        for year in self._year_keys[start:stop]:
+            yield from self._year_index[year].values()
+
+    def search_by_decade(self, decade: int) -> Iterator[Book]:
+        """Книги десятилетия: 1930 -> 1930-1939"""
+        start = decade - decade % 10
+        return self.search_by_year_range(start, start + 9)
+
+    def search_by_genre(self, genre: str) -> List[Book]:
+        return list(self._genre_index.get(genre, {}).values())
+
+    def author_bucket(self, author: str) -> Dict[str, Book]:
+        """Корзина автора без копирования (только для чтения)"""
+        return self._author_index.get(author, {})
+
+    def genre_bucket(self, genre: str) -> Dict[str, Book]:
+        """Корзина жанра без копирования (только для чтения)"""
+        return self._genre_index.get(genre, {})
+
+    def year_bucket(self, year: int) -> Dict[str, Book]:
+        """Корзина года без копирования (только для чтения)"""
+        return self._year_index.get(year, {})
+
+    def count_year_range(self, lo: int, hi: int) -> int:
+        """Количество книг с годом из [lo, hi] без обхода самих книг"""
+        start = bisect_left(self._year_keys, lo)
+        stop = bisect_right(self._year_keys, hi)
+        return sum(len(self._year_index[year]) for year in self._year_keys[start:stop])
 
     def clear(self) -> None:
         self._isbn_index.clear()
         self._author_index.clear()
         self._year_index.clear()
+        self._genre_index.clear()
+        self._year_keys.clear()
@@ -0,0 +1,65 @@
+from typing import Union
+
+
+def _digits(text: str) -> str:
+    return text.replace("-", "").replace(" ", "").upper() if not text.isdigit() else text
+
+
+def isbn13_check_digit(digits: str) -> int:
+    """Контрольная цифра по первым 12 цифрам ISBN-13: веса 1 и 3 по очереди"""
+    codes = digits.encode("ascii")
+    # коды ASCII: у каждой из 12 цифр лишние 48, с весами 1 и 3 это 48 * 24
+    total = sum(codes[0:12:2]) + 3 * sum(codes[1:12:2]) - 48 * 24
+    return (10 - total % 10) % 10
+
+
+def isbn10_check_digit(digits: str) -> int:
+    """Контрольная цифра ISBN-10 по первым 9 цифрам; 10 записывается как X"""
+    total = sum(int(d) * (10 - i) for i, d in enumerate(digits[:9]))
+    return (11 - total % 11) % 11
+
+
+def parse_isbn(text: str) -> int:
+    """ISBN-13 или ISBN-10 в виде целого 13-значного ключа
+
+    Дефисы и пробелы игнорируются, ISBN-10 переводится в ISBN-13 с префиксом
+    978. Неверная длина, символы или контрольная цифра - ValueError.
+    """
+    digits = _digits(text)
+    if len(digits) == 10:
+        body, check = digits[:9], digits[9]
+        if not body.isdigit() or not (check.isdigit() or check == "X"):
+            raise ValueError(f"Некорректный ISBN-10: {text}")
+        if (10 if check == "X" else int(check)) != isbn10_check_digit(body):
+            raise ValueError(f"Неверная контрольная цифра ISBN-10: {text}")
+        body = "978" + body
+        return int(body + str(isbn13_check_digit(body)))
+    if len(digits) != 13 or not digits.isdigit():
+        raise ValueError(f"Некорректный ISBN-13: {text}")
+    if ord(digits[12]) - 48 != isbn13_check_digit(digits):
+        raise ValueError(f"Неверная контрольная цифра ISBN-13: {text}")
+    return int(digits)
+
+
+def isbn_key(text: str) -> Union[int, str]:
+    """Ключ для сравнения ISBN: целое для корректного ISBN, иначе исходная строка
+
+    Разные записи одного ISBN (с дефисами, без них, ISBN-10) дают один ключ.
+    """
+    try:
+        return parse_isbn(text)
+    except ValueError:
+        return text
+
+
+def is_valid_isbn(text: str) -> bool:
+    try:
+        parse_isbn(text)
+    except ValueError:
+        return False
+    return True
+
+
+def format_isbn13(key: int) -> str:
+    """Ключ обратно в 13 цифр без дефисов; расстановка дефисов зависит от диапазонов и не восстанавливается"""
+    return f"{key:013d}"
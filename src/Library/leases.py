@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Callable, Tuple, Iterable
+
+from src.Library.loans import DAY
+
+
+@dataclass(slots=True)
+class Lease:
+    """выдача цифровой копии читателю на срок"""
+    id: int
+    isbn: str
+    reader: str
+    borrowed_at: float
+    due: float
+
+
+class LeaseRegistry:
+    """лицензии цифровых копий: свободные копии, выдачи и куча сроков
+
+    Копия занята, пока по ней есть выдача. Истёкшие выдачи возвращаются
+    лениво: перед каждой выдачей из кучи снимаются записи со сроком не позже
+    текущего момента. Вернуть можно только выданную копию, поэтому свободных
+    копий никогда не становится больше, чем лицензий.
+    """
+
+    def __init__(self, lease_period: float = 14 * DAY, clock: Callable[[], float] = time.time):
+        self.lease_period = lease_period
+        self.clock = clock
+        self.available: Dict[str, int] = {}  # ISBN -> свободные копии
+        self._leases: Dict[int, Lease] = {}
+        # (ISBN, читатель) -> выдачи в порядке оформления
+        self._by_holder: Dict[Tuple[str, str], Dict[int, Lease]] = {}
+        self._by_isbn: Dict[str, Dict[int, Lease]] = {}
+        self._heap: List[Tuple[float, int]] = []  # (срок, номер выдачи)
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def __repr__(self) -> str:
+        return f"LeaseRegistry(изданий: {len(self.available)}, выдано копий: {len(self)})"
+
+    def licensed(self, isbn: str) -> int:
+        """Всего копий издания: свободные и выданные"""
+        return self.available.get(isbn, 0) + len(self._by_isbn.get(isbn, ()))
+
+    def add_copies(self, isbn: str, copies: int, limit: int) -> int:
+        """Добавление копий; всего копий, свободных и выданных, остаётся не больше limit"""
+        leased = len(self._by_isbn.get(isbn, ()))
+        self.available[isbn] = max(0, min(self.available.get(isbn, 0) + copies, limit - leased))
+        return self.available[isbn]
+
+    def leases_of(self, isbn: str) -> List[Lease]:
+        """Действующие выдачи издания в порядке оформления"""
+        return list(self._by_isbn.get(isbn, {}).values())
+
+    def reclaim(self, now: Optional[float] = None) -> int:
+        """Возврат всех истёкших выдач; возвращает их количество"""
+        now = self.clock() if now is None else now
+        reclaimed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, lease_id = heapq.heappop(self._heap)
+            lease = self._leases.get(lease_id)
+            if lease is not None:
+                self._release(lease)
+                reclaimed += 1
+        return reclaimed
+
+    def _grant(self, isbn: str, reader: str, now: float, due: float) -> Lease:
+        lease = Lease(next(self._ids), isbn, reader, now, due)
+        self._leases[lease.id] = lease
+        self.available[isbn] -= 1
+        holder = (isbn, reader)
+        if holder not in self._by_holder:
+            self._by_holder[holder] = {}
+        self._by_holder[holder][lease.id] = lease
+        if isbn not in self._by_isbn:
+            self._by_isbn[isbn] = {}
+        self._by_isbn[isbn][lease.id] = lease
+        heapq.heappush(self._heap, (due, lease.id))
+        return lease
+
+    def _release(self, lease: Lease) -> None:
+        del self._leases[lease.id]
+        self.available[lease.isbn] += 1
+        holder = (lease.isbn, lease.reader)
+        leases = self._by_holder[holder]
+        del leases[lease.id]
+        if not leases:
+            del self._by_holder[holder]
+        leases = self._by_isbn[lease.isbn]
+        del leases[lease.id]
+        if not leases:
+            del self._by_isbn[lease.isbn]
+        # возвращённых раньше срока записей больше, чем живых: перестраиваем кучу
+        if len(self._heap) > 2 * len(self._leases) + 64:
+            self._heap = [(current.due, current.id) for current in self._leases.values()]
+            heapq.heapify(self._heap)
+
+    def borrow(self, isbn: str, reader: str, due: Optional[float] = None) -> Optional[Lease]:
+        """Выдача копии; None, если свободных копий нет"""
+        now = self.clock()
+        self.reclaim(now)
+        if self.available.get(isbn, 0) <= 0:
+            return None
+        return self._grant(isbn, reader, now, due if due is not None else now + self.lease_period)
+
+    def release(self, isbn: str, reader: Optional[str] = None) -> Optional[Lease]:
+        """Возврат самой ранней выдачи издания читателю reader (или любому читателю)"""
+        leases = self._by_isbn.get(isbn) if reader is None else self._by_holder.get((isbn, reader))
+        if not leases:
+            return None
+        lease = next(iter(leases.values()))
+        self._release(lease)
+        return lease
+
+    def borrow_many(self, requests: Iterable[Tuple[str, str]], due: Optional[float] = None) -> List[Lease]:
+        """Выдача пачки копий по принципу всё или ничего
+
+        Если хотя бы на одно издание не хватает свободных копий, ничего не
+        выдаётся и возвращается пустой список.
+        """
+        requests = list(requests)
+        now = self.clock()
+        self.reclaim(now)
+        demand = Counter(isbn for isbn, _ in requests)
+        if any(self.available.get(isbn, 0) < n for isbn, n in demand.items()):
+            return []
+        due = due if due is not None else now + self.lease_period
+        return [self._grant(isbn, reader, now, due) for isbn, reader in requests]
+
+    def release_many(self, requests: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """Возврат пачки выдач; возвращает количество возвращённых"""
+        return sum(self.release(isbn, reader) is not None for isbn, reader in requests)
+
+    def clear(self) -> None:
+        self.available.clear()
+        self._leases.clear()
+        self._by_holder.clear()
+        self._by_isbn.clear()
+        self._heap.clear()
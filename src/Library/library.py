@@ -1,14 +1,28 @@
 from src.Library.book import BookCollection, Book
-from typing import Optional, Dict
+import threading
+import time
+from typing import Any, Optional, Dict, Iterator, Iterable, List, Tuple, Union
 from src.Library.index import IndexDict
+from src.Library.text_index import TitleIndex
+from src.Library.analytics import CatalogAnalytics
+from src.Library.cache import QueryCache
+from src.Library.diff import FIELDS, CatalogDiff, Resolver, book_fields, diff_books
+from src.Library.query import Query
+from src.Library.loans import DAY, Loan, LoanRegistry
+from src.Library.leases import Lease, LeaseRegistry
+from src.Library.metrics import Hook, Metrics, instrument, uninstrument
+from src.Library.store import BookView
+from src.Library.snapshot import (
+    CatalogSnapshot, SnapshotCollection, SnapshotIndex, SnapshotTitleIndex, save_snapshot,
+)
 
 
 class BaseLibrary:
     """базовая библиотека"""
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, books: Optional[BookCollection] = None):
         self.name = name
-        self._books = BookCollection()
+        self._books = books if books is not None else BookCollection()
 
     def __len__(self) -> int:
         return len(self._books)
@@ -30,14 +44,36 @@ class BaseLibrary:
 
 
 class Library(BaseLibrary):
-    def __init__(self, name: str):
-        super().__init__(name)
+    # операции, которые измеряются после enable_metrics
+    MEASURED = (
+        "add_book", "add_books", "remove_book", "edit_book",
+        "search_books", "search_many", "search_by_title", "search_by_year_range", "search_by_decade",
+        "borrow_book", "return_book", "update_index", "rebuild_index", "get_random_book",
+    )
+
+    def __init__(self, name: str, books: Optional[BookCollection] = None):
+        super().__init__(name, books)
         self._index = IndexDict()
-        self._borrowed_books: Dict[str, str] = {}
-
-    def __add__(self, book: Book) -> 'Library':
-        """library + book"""
-        self.add_book(book)
+        self._titles = TitleIndex()
+        self._loans = LoanRegistry()
+        self._borrowed_books: Dict[str, str] = self._loans.readers  # ISBN -> читатель
+        # ISBN -> копия книги в том виде, в каком она проиндексирована
+        self._changed: Dict[str, Book] = {}
+        self._wal = None  # журнал изменений, см. attach_wal
+        self._version = 0  # растёт при каждом изменении индексов, сбрасывает кэш
+        self._cache: Optional[QueryCache] = None
+        self._metrics: Optional[Metrics] = None
+        self._analytics: Optional[CatalogAnalytics] = None  # создаётся при первом analytics()
+        self.rebuild_index()
+
+    def __add__(self, other: Union[Book, 'Library']) -> 'Library':
+        """library + book или library + другая библиотека (слияние, см. merge)"""
+        if isinstance(other, Library):
+            self.merge(other)
+        elif isinstance(other, (Book, BookView)):
+            self.add_book(other)
+        else:
+            raise TypeError(f"К библиотеке можно прибавить книгу или библиотеку, а не {type(other).__name__}")
         return self
 
     def __call__(self, query: str) -> BookCollection:
@@ -48,82 +84,452 @@ class Library(BaseLibrary):
         return f"Library(name='{self.name}', books={len(self)}, borrowed={len(self._borrowed_books)})"
 
     def add_book(self, book: Book) -> None:
-        """Переопределение метода"""
+        """Добавление книги; книга с уже известным ISBN заменяет прежнюю и в индексах"""
+        current = self._books.get(book.isbn)
+        if current is not None:
+            # как правка: книга уходит из корзин по полям, под которыми проиндексирована
+            if book.isbn not in self._changed:
+                self._changed[book.isbn] = Book(current.title, current.author, current.year, current.genre, book.isbn)
+            super().add_book(book)
+            self._reindex(book.isbn)
+            self._version += 1
+            self._log_book("add", self._books.get(book.isbn))
+            return
         super().add_book(book)
-        self._index.add_book(book)
+        # индексируем экземпляр из хранилища: для BookStore это лёгкое представление
+        stored = self._books.get(book.isbn)
+        self._index.add_book(stored)
+        self._titles.add_book(stored)
+        if self._analytics is not None:
+            self._analytics.add(stored)
+        self._version += 1
+        self._log_book("add", stored)
+
+    def add_books(self, books: Iterable[Book]) -> int:
+        """Пакетное добавление книг с пропуском повторяющихся ISBN
+
+        Возвращает количество добавленных книг.
+        """
+        added: List[Book] = []
+        try:
+            for book in books:
+                # коллекция уже содержит и старые книги, и книги этого пакета
+                if self._books.get(book.isbn) is not None:
+                    continue
+                self._books.add(book)
+                added.append(self._books.get(book.isbn))
+        finally:
+            # при ошибке посреди пакета уже добавленные книги всё равно индексируются
+            self._index.add_books(added)
+            self._titles.add_books(added)
+            self._version += 1
+            for book in added:
+                if self._analytics is not None:
+                    self._analytics.add(book)
+                self._log_book("add", book)
+        return len(added)
 
     def remove_book(self, isbn: str) -> bool:
         """Удаление книги по ISBN"""
+        if isbn in self._changed:
+            self._reindex(isbn)
         book = self._index.search_by_isbn(isbn)
         if book and book in self._books:
-            self._books.remove(book)
+            # сначала индекс: представления из BookStore читают поля из хранилища
             self._index.remove_book(isbn)
-            if isbn in self._borrowed_books:
-                del self._borrowed_books[isbn]
+            self._titles.remove_book(book)
+            self._books.remove(book)
+            if self._analytics is not None:
+                self._analytics.remove(isbn)
+            self._version += 1
+            self._loans.return_loan(isbn)
+            if self._wal is not None:
+                self._wal.append("remove", isbn)
             return True
         return False
 
+    def edit_book(self, isbn: str, **fields: Union[str, int]) -> bool:
+        """Изменение полей книги; индексы догоняют изменения при update_index"""
+        current = self._books.get(isbn)
+        if current is None:
+            return False
+        if "isbn" in fields:
+            raise ValueError("ISBN книги изменить нельзя")
+
+        if isbn not in self._changed:
+            self._changed[isbn] = Book(current.title, current.author, current.year, current.genre, isbn)
+        values = {"title": current.title, "author": current.author, "year": current.year, "genre": current.genre}
+        values.update(fields)
+        self._books.add(Book(isbn=isbn, **values))
+        self._version += 1
+        self._log_book("edit", self._books.get(isbn))
+        return True
+
+    def diff(self, other: 'Library') -> CatalogDiff:
+        """Отличия каталога other от нашего по ISBN
+
+        added - книги, которых у нас нет, removed - книги, которых нет в other,
+        changed - пары (наша, их) с одним ISBN и разными полями.
+        """
+        return diff_books(self._books, other._books)
+
+    def merge(self, other: 'Library', conflict: Union[str, Resolver] = "ours") -> CatalogDiff:
+        """Слияние каталога и выдач другой библиотеки по ISBN
+
+        Недостающие книги добавляются одним пакетом, книги, которых нет в other,
+        остаются. conflict решает, какая версия книги с разными полями
+        остаётся: "ours" - наша, "theirs" - их, "error" - ValueError до
+        каких-либо изменений, функция (наша, их) -> книга выбирает сама.
+        Выдачи other переносятся на невыданные у нас книги; при "theirs" их
+        выдача заменяет нашу. Возвращает добавленные книги и применённые
+        изменения в виде CatalogDiff без removed.
+        """
+        if conflict not in ("ours", "theirs", "error") and not callable(conflict):
+            raise ValueError(f"Неизвестная политика конфликтов: {conflict}")
+        diff = diff_books(self._books, other._books, removed=False)
+        if conflict == "error" and diff.changed:
+            isbns = ", ".join(ours.isbn for ours, _ in diff.changed[:10])
+            raise ValueError(f"Книги различаются в каталогах: {isbns}")
+
+        changes = []
+        if conflict != "ours":
+            for ours, theirs in diff.changed:
+                chosen = theirs if conflict == "theirs" else conflict(ours, theirs)
+                if book_fields(chosen) != book_fields(ours):
+                    # BookView читает поля из хранилища, поэтому запоминаем прежнюю версию
+                    changes.append((Book(*book_fields(ours), ours.isbn), chosen))
+
+        self.add_books(diff.added)
+        for ours, chosen in changes:
+            self.edit_book(ours.isbn, **dict(zip(FIELDS, book_fields(chosen))))
+        if changes:
+            self.update_index()
+
+        for loan in other._loans:
+            current = self._loans.get(loan.isbn)
+            if current is not None:
+                if conflict != "theirs" or current.reader == loan.reader:
+                    continue
+                self.return_book(loan.isbn)
+            # выдача переносится целиком, вместе со временем оформления
+            if self.borrow_book(loan.isbn, loan.reader, loan.due):
+                self._loans.get(loan.isbn).borrowed_at = loan.borrowed_at
+        return CatalogDiff(diff.added, [], changes)
+
+    def enable_cache(self, max_entries: int = 1024, ttl: Optional[float] = None,
+                     max_bytes: Optional[int] = None) -> QueryCache:
+        """Включение кэша результатов search_books"""
+        self._cache = QueryCache(max_entries, ttl, max_bytes)
+        return self._cache
+
+    def disable_cache(self) -> None:
+        self._cache = None
+
+    def enable_metrics(self, hooks: Iterable[Hook] = ()) -> Metrics:
+        """Включение метрик операций библиотеки и её индекса
+
+        hooks вызываются на каждое измерение: hook(операция, секунды, размер результата).
+        Поиск search_books дополнительно учитывается по ветке: search_books.author,
+        .year, .genre, .isbn или .title (попадания в кэш в ветки не попадают).
+        """
+        self.disable_metrics()
+        self._metrics = Metrics(hooks)
+        instrument(self, self._metrics, self.MEASURED)
+        self._instrument_index()
+        return self._metrics
+
+    def _instrument_index(self) -> None:
+        # обёртки стоят на экземпляре индекса: после замены _index их ставят заново
+        if self._metrics is not None and self._index.MEASURED[0] not in vars(self._index):
+            instrument(self._index, self._metrics, self._index.MEASURED, "index.")
+
+    def disable_metrics(self) -> None:
+        if self._metrics is not None:
+            uninstrument(self, self.MEASURED)
+            uninstrument(self._index, self._index.MEASURED)
+            self._metrics = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Снимок метрик по операциям; пустой, если метрики не включены"""
+        return self._metrics.snapshot() if self._metrics is not None else {}
+
+    def analytics(self) -> CatalogAnalytics:
+        """Колоночные отчёты по каталогу (нужен numpy)
+
+        Строится при первом вызове и дальше обновляется вместе с индексами;
+        правки книг попадают в отчёты после update_index.
+        """
+        if self._analytics is None:
+            # неприменённые правки учитываются так же, как в индексах
+            self._analytics = CatalogAnalytics(self._changed.get(book.isbn, book) for book in self._books)
+            for isbn in self._borrowed_books:
+                self._analytics.set_borrowed(isbn, True)
+        return self._analytics
+
     def search_books(self, query: str) -> BookCollection:
-        """Поиск книг"""
+        """Поиск книг
+
+        При включённом кэше возвращается общий для всех вызовов результат,
+        изменять его нельзя.
+        """
+        if self._cache is None:
+            return self._search_books(query)
+
+        result = self._cache.get(query, self._version)
+        if result is None:
+            result = self._search_books(query)
+            # оценка размера: слот со ссылкой на книгу и запись ISBN -> позиция
+            self._cache.put(query, self._version, result, 200 + 120 * len(result))
+        return result
+
+    def _search_books(self, query: str) -> BookCollection:
+        start = time.perf_counter() if self._metrics is not None else 0.0
         result = BookCollection()
 
         # поиск по автору
+        branch = "author"
         books_by_author = self._index.search_by_author(query)
         if books_by_author:
             result = BookCollection(books_by_author)
         else:
             # по году
             if query.isdigit():
+                branch = "year"
                 year_str = query.strip()
                 year = int(year_str)
-                if year < 100:
-                    year += 1900
                 books_by_year = self._index.search_by_year(year)
                 if books_by_year:
                     result = BookCollection(books_by_year)
             # по жанру
             else:
-                result = self._books.filter_by_genre(query)
-
+                branch = "genre"
+                books_by_genre = self._index.search_by_genre(query)
+                if books_by_genre:
+                    result = BookCollection(books_by_genre)
+            # по ISBN
+            if not result:
+                book = self._index.search_by_isbn(query)
+                if book is not None:
+                    branch = "isbn"
+                    result = BookCollection([book])
+                # по названию (точные слова и префикс последнего слова), без ограничения
+                # числа книг, как и в остальных ветках
+                elif not query.isdigit():
+                    branch = "title"
+                    result = self.search_by_title(query, k=None, fuzzy=False)
+
+        if self._metrics is not None:
+            self._metrics.record(f"search_books.{branch}", time.perf_counter() - start, len(result))
         return result
 
-    def borrow_book(self, reader: str, isbn: str) -> bool:
-        """Выдача книги читателю"""
+    def search_many(self, queries: Iterable[str]) -> List[Tuple[Book, ...]]:
+        """Пакетный поиск: ответ на каждый запрос в порядке запросов
+
+        Результаты те же, что у search_books, но в виде кортежей книг.
+        Повторяющиеся запросы выполняются один раз и получают общий кортеж.
+        Запросы разбираются группами: сначала все по авторам, затем
+        оставшиеся по годам и жанрам, затем по ISBN и по названию.
+        """
+        queries = list(queries)
+        found: Dict[str, Tuple[Book, ...]] = {}
+        index = self._index
+
+        pending = []
+        for query in dict.fromkeys(queries):
+            bucket = index.author_bucket(query)
+            if bucket:
+                found[query] = tuple(bucket.values())
+            else:
+                pending.append(query)
+
+        rest = []
+        for query in pending:
+            bucket = index.year_bucket(int(query)) if query.isdigit() else index.genre_bucket(query)
+            if bucket:
+                found[query] = tuple(bucket.values())
+            else:
+                rest.append(query)
+
+        for query in rest:
+            book = index.search_by_isbn(query)
+            if book is not None:
+                found[query] = (book,)
+            elif query.isdigit():
+                found[query] = ()
+            else:
+                found[query] = tuple(self._titles.search(query, None, False))
+
+        return [found[query] for query in queries]
+
+    def query(self) -> Query:
+        """Составной запрос: library.query().author(a).genre(g).year_between(lo, hi).limit(n)"""
+        return Query(self)
+
+    def search_by_title(self, query: str, k: Optional[int] = 10, fuzzy: bool = True) -> BookCollection:
+        """Топ-k книг по названию с учётом опечаток; k=None - все подходящие"""
+        return BookCollection(self._titles.search(query, k, fuzzy))
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        """Книги, изданные с lo по hi включительно, по возрастанию года"""
+        return self._index.search_by_year_range(lo, hi)
+
+    def search_by_decade(self, decade: int) -> Iterator[Book]:
+        """Книги десятилетия"""
+        return self._index.search_by_decade(decade)
+
+    def borrow_book(self, isbn: str, reader: str, due: Optional[float] = None) -> bool:
+        """Выдача книги читателю до срока due (по умолчанию - срок выдачи из политики)"""
         if isbn not in self._index:
             return False
 
-        if isbn in self._borrowed_books:
-            return False  # уже выдана
+        loan = self._loans.borrow(isbn, reader, due)
+        if loan is None:
+            return False  # уже выдана или исчерпан лимит читателя
+        if self._analytics is not None:
+            self._analytics.set_borrowed(isbn, True)
 
-        self._borrowed_books[isbn] = reader
+        if self._wal is not None:
+            self._wal.append("borrow", isbn, reader, repr(loan.due))
         return True
 
     def return_book(self, isbn: str) -> bool:
         """Возврат книги читателем"""
-        if isbn not in self._borrowed_books:
+        if self._loans.return_loan(isbn) is None:
             return False
+        if self._analytics is not None:
+            self._analytics.set_borrowed(isbn, False)
 
-        del self._borrowed_books[isbn]
+        if self._wal is not None:
+            self._wal.append("return", isbn)
         return True
 
-    def update_index(self) -> None:
-        """Обновление индексов"""
+    def set_loan_policy(self, loan_days: float = 14, max_per_reader: Optional[int] = None) -> None:
+        """Срок выдачи в днях и лимит книг на читателя"""
+        self._loans.loan_period = loan_days * DAY
+        self._loans.max_per_reader = max_per_reader
+
+    def loans_of(self, reader: str) -> List[Loan]:
+        """Книги на руках у читателя"""
+        return self._loans.loans_of(reader)
+
+    def overdue_loans(self, n: Optional[int] = None, now: Optional[float] = None) -> List[Loan]:
+        """Ближайшие n просроченных выдач по возрастанию срока"""
+        return self._loans.overdue(n, now)
+
+    def _reindex(self, isbn: str) -> None:
+        """Перенос одной изменённой книги из старых корзин индексов в новые"""
+        indexed = self._changed.pop(isbn)
+        stored = self._books.get(isbn)
+        self._index.remove_book(isbn, indexed)
+        if stored is None:
+            self._titles.remove_book(indexed)
+        else:
+            self._index.add_book(stored)
+            # при прежнем названии индекс названий только меняет ссылки на книгу
+            self._titles.replace_book(indexed, stored)
+            if self._analytics is not None:
+                self._analytics.add(stored)
+
+    def update_index(self, verify: bool = False) -> None:
+        """Применение к индексам изменений с последней синхронизации
+
+        Если индекс разошёлся с коллекцией по размеру, выполняется полная перестройка.
+        verify=True дополнительно сверяет индекс с коллекцией.
+        """
+        if len(self._index) != len(self._books):
+            self.rebuild_index()
+        elif self._changed:
+            for isbn in list(self._changed):
+                self._reindex(isbn)
+            self._version += 1
+
+        if verify:
+            problems = self.check_index()
+            if problems:
+                raise RuntimeError(f"Индекс не соответствует каталогу: {'; '.join(problems[:10])}")
+
+    def rebuild_index(self) -> None:
+        """Полная перестройка индексов"""
         self._index.clear()
+        self._titles.clear()
+        self._changed.clear()
+        self._version += 1
+        self._instrument_index()
         for book in self._books:
             self._index.add_book(book)
+            self._titles.add_book(book)
+        # аналитика перестраивается на месте: ссылки, полученные из analytics(), остаются рабочими
+        if self._analytics is not None:
+            self._analytics.clear()
+            for book in self._books:
+                self._analytics.add(book)
+            for isbn in self._borrowed_books:
+                self._analytics.set_borrowed(isbn, True)
+
+    def check_index(self) -> List[str]:
+        """Сверка индексов с коллекцией без перестройки; возвращает список расхождений"""
+        problems = []
+        for book in self._books:
+            if not self._index.check_book(book):
+                problems.append(f"книга {book.isbn} не проиндексирована под текущими полями")
+        if len(self._index) != len(self._books):
+            problems.append(f"в индексе {len(self._index)} книг, в каталоге {len(self._books)}")
+        extra = self._index.extra_entries()
+        if extra > 0:
+            problems.append(f"в корзинах индекса {extra} записей под прежними полями книг")
+        if len(self._titles) != len(self._books):
+            problems.append(f"в индексе названий {len(self._titles)} книг, в каталоге {len(self._books)}")
+        return problems
 
     def get_random_book(self) -> Optional[Book]:
         """Получение случайной книги"""
         return self._books.get_random_book()
 
+    def _log_book(self, op: str, book: Book) -> None:
+        if self._wal is not None:
+            self._wal.append(op, book.title, book.author, str(book.year), book.genre, book.isbn)
+
+    def attach_wal(self, wal) -> None:
+        """Подключение журнала изменений (WriteAheadLog); None отключает журнал"""
+        self._wal = wal
+
+    def save(self, path: str) -> None:
+        """Сохранение каталога, индексов и выданных книг в двоичный снимок"""
+        if self._wal is not None:
+            self._wal.commit()
+        save_snapshot(self, path, self._wal.lsn if self._wal is not None else 0)
+
+    @classmethod
+    def load(cls, path: str) -> 'Library':
+        """Загрузка из снимка: файл отображается в память, поиск идёт по нему
+        без построения индексов, полная загрузка происходит при первом изменении
+        """
+        snapshot = CatalogSnapshot(path)
+        library = cls(snapshot.name)
+        library._books = SnapshotCollection(snapshot)
+        library._index = SnapshotIndex(snapshot)
+        library._titles = SnapshotTitleIndex(snapshot)
+        # сроки сохраняются: просроченные выдачи остаются просроченными после перезапуска
+        for isbn, reader, borrowed_at, due in snapshot.loans():
+            library._loans.borrow(isbn, reader, due).borrowed_at = borrowed_at
+        return library
+
 
 class DigitalLibrary(Library):
-    """цифровая библиотека"""
+    """цифровая библиотека
+
+    Каждая выдача цифровой копии - аренда с читателем и сроком; истёкшие
+    аренды возвращаются автоматически при следующей выдаче.
+    """
+
+    MEASURED = Library.MEASURED + ("add_digital_copy", "borrow_many", "return_many")
 
-    def __init__(self, name: str, max_digital_copies: int = 1000):
+    def __init__(self, name: str, max_digital_copies: int = 1000, lease_days: float = 14):
         super().__init__(name)
         self.max_digital_copies = max_digital_copies
-        self._digital_copies: Dict[str, int] = {}  # ISBN -> количество копий
+        self._leases = LeaseRegistry(lease_days * DAY)
+        self._digital_copies: Dict[str, int] = self._leases.available  # ISBN -> свободные копии
+        self._lease_lock = threading.Lock()  # одна операция, в том числе пакетная, - одно взятие
 
     def __repr__(self) -> str:
         return f"DigitalLibrary(name='{self.name}', books={len(self)}, digital_titles={len(self._digital_copies)})"
@@ -131,26 +537,36 @@ class DigitalLibrary(Library):
     def add_digital_copy(self, book: Book, copies: int = 1) -> None:
         """Добавление цифровой копии книги"""
         super().add_book(book)
-        if book.isbn not in self._digital_copies:
-            self._digital_copies[book.isbn] = 0
-        self._digital_copies[book.isbn] = min(
-            self._digital_copies[book.isbn] + copies,
-            self.max_digital_copies
-        )
-
-    def borrow_book(self, isbn: str, reader: str) -> bool:
-        """Переопределение выдачи книги"""
-        if isbn not in self._digital_copies or self._digital_copies[isbn] <= 0:
-            return False
-
-        self._digital_copies[isbn] -= 1
-        return True
-
-    def return_book(self, isbn: str) -> bool:
-        """Возврат книги в цифровую библиотеку"""
-        if isbn not in self._digital_copies:
-            return False
-
-        self._digital_copies[isbn] += 1
-        return True
-
+        with self._lease_lock:
+            self._leases.add_copies(book.isbn, copies, self.max_digital_copies)
+
+    def borrow_book(self, isbn: str, reader: str, due: Optional[float] = None) -> bool:
+        """Аренда цифровой копии до срока due (по умолчанию - через lease_days дней)"""
+        with self._lease_lock:
+            return self._leases.borrow(isbn, reader, due) is not None
+
+    def return_book(self, isbn: str, reader: Optional[str] = None) -> bool:
+        """Возврат самой ранней аренды читателя reader (или любой аренды книги)"""
+        with self._lease_lock:
+            return self._leases.release(isbn, reader) is not None
+
+    def borrow_many(self, requests: Iterable[Tuple[str, str]], due: Optional[float] = None) -> bool:
+        """Пакетная аренда пар (ISBN, читатель): выдаются все копии или ни одной"""
+        requests = list(requests)
+        with self._lease_lock:
+            return len(self._leases.borrow_many(requests, due)) == len(requests)
+
+    def return_many(self, requests: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """Пакетный возврат пар (ISBN, читатель); возвращает количество возвращённых копий"""
+        with self._lease_lock:
+            return self._leases.release_many(requests)
+
+    def leases_of(self, isbn: str) -> List[Lease]:
+        """Действующие аренды книги"""
+        with self._lease_lock:
+            return self._leases.leases_of(isbn)
+
+    def reclaim_expired(self, now: Optional[float] = None) -> int:
+        """Возврат истёкших аренд без ожидания следующей выдачи"""
+        with self._lease_lock:
+            return self._leases.reclaim(now)
@@ -0,0 +1,132 @@
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Callable, Iterator, Tuple
+
+DAY = 24 * 60 * 60
+
+
+@dataclass(slots=True)
+class Loan:
+    """выдача книги читателю"""
+    isbn: str
+    reader: str
+    borrowed_at: float
+    due: float
+
+    def __str__(self) -> str:
+        return f"{self.isbn} -> {self.reader} до {time.strftime('%Y-%m-%d', time.localtime(self.due))}"
+
+
+class LoanRegistry:
+    """реестр выдач: индекс по читателям и куча сроков возврата
+
+    Из кучи записи не удаляются сразу: при возврате или продлении старая
+    запись становится устаревшей и пропускается при обходе.
+    """
+
+    def __init__(self, loan_period: float = 14 * DAY, max_per_reader: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        self.loan_period = loan_period
+        self.max_per_reader = max_per_reader
+        self.clock = clock
+        self.readers: Dict[str, str] = {}  # ISBN -> читатель
+        self._loans: Dict[str, Loan] = {}
+        self._by_reader: Dict[str, Dict[str, Loan]] = {}
+        self._heap: List[Tuple[float, str]] = []  # (срок, ISBN)
+
+    def __len__(self) -> int:
+        return len(self._loans)
+
+    def __contains__(self, isbn: str) -> bool:
+        return isbn in self._loans
+
+    def __iter__(self) -> Iterator[Loan]:
+        return iter(self._loans.values())
+
+    def __repr__(self) -> str:
+        return f"LoanRegistry(выдано: {len(self)}, читателей: {len(self._by_reader)})"
+
+    def _push(self, loan: Loan) -> None:
+        heapq.heappush(self._heap, (loan.due, loan.isbn))
+        # устаревших записей больше, чем живых: перестраиваем кучу
+        if len(self._heap) > 2 * len(self._loans) + 64:
+            self._heap = [(current.due, current.isbn) for current in self._loans.values()]
+            heapq.heapify(self._heap)
+
+    def _is_current(self, due: float, isbn: str) -> bool:
+        loan = self._loans.get(isbn)
+        return loan is not None and loan.due == due
+
+    def get(self, isbn: str) -> Optional[Loan]:
+        return self._loans.get(isbn)
+
+    def can_borrow(self, reader: str) -> bool:
+        """Не превышен ли лимит выдач читателя"""
+        return self.max_per_reader is None or len(self._by_reader.get(reader, ())) < self.max_per_reader
+
+    def borrow(self, isbn: str, reader: str, due: Optional[float] = None) -> Optional[Loan]:
+        """Оформление выдачи; None, если книга уже выдана или лимит исчерпан"""
+        if isbn in self._loans or not self.can_borrow(reader):
+            return None
+        now = self.clock()
+        loan = Loan(isbn, reader, now, due if due is not None else now + self.loan_period)
+        self._loans[isbn] = loan
+        self.readers[isbn] = reader
+        if reader not in self._by_reader:
+            self._by_reader[reader] = {}
+        self._by_reader[reader][isbn] = loan
+        self._push(loan)
+        return loan
+
+    def return_loan(self, isbn: str) -> Optional[Loan]:
+        """Закрытие выдачи"""
+        loan = self._loans.pop(isbn, None)
+        if loan is None:
+            return None
+        del self.readers[isbn]
+        loans = self._by_reader[loan.reader]
+        del loans[isbn]
+        if not loans:
+            del self._by_reader[loan.reader]
+        return loan
+
+    def renew(self, isbn: str, due: Optional[float] = None) -> bool:
+        """Продление срока выдачи"""
+        loan = self._loans.get(isbn)
+        if loan is None:
+            return False
+        loan.due = due if due is not None else max(loan.due, self.clock()) + self.loan_period
+        self._push(loan)
+        return True
+
+    def loans_of(self, reader: str) -> List[Loan]:
+        """Выдачи читателя в порядке оформления"""
+        return list(self._by_reader.get(reader, {}).values())
+
+    def overdue(self, n: Optional[int] = None, now: Optional[float] = None) -> List[Loan]:
+        """Первые n просроченных выдач по возрастанию срока, O(n log m)"""
+        now = self.clock() if now is None else now
+        result: List[Loan] = []
+        taken: List[Tuple[float, str]] = []
+        seen = set()
+        while self._heap and (n is None or len(result) < n):
+            due, isbn = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            # повторная выдача с тем же сроком оставляет в куче дубликат
+            if self._is_current(due, isbn) and isbn not in seen:
+                seen.add(isbn)
+                result.append(self._loans[isbn])
+                taken.append((due, isbn))
+        # просмотренные выдачи остаются в куче до возврата
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return result
+
+    def clear(self) -> None:
+        self.readers.clear()
+        self._loans.clear()
+        self._by_reader.clear()
+        self._heap.clear()
@@ -0,0 +1,79 @@
+import threading
+from contextlib import contextmanager
+from typing import Optional, Hashable, Iterator
+
+
+class RWLock:
+    """блокировка читатели-писатель с приоритетом писателя
+
+    Повторный вход разрешён: поток-писатель может снова брать запись
+    и чтение, поток-читатель - снова брать чтение.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer: Optional[int] = None
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"RWLock(читателей: {self._readers}, писатель: {self._writer is not None})"
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        depth = getattr(self._local, "reads", 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class StripedLock:
+    """набор блокировок, выбираемых по хэшу ключа"""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __repr__(self) -> str:
+        return f"StripedLock(полос: {len(self._locks)})"
+
+    def lock(self, key: Hashable) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
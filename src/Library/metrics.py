@@ -0,0 +1,145 @@
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# hook(операция, длительность в секундах, размер результата или None)
+Hook = Callable[[str, float, Optional[int]], None]
+
+# верхние границы корзин: задержки в микросекундах и размеры результатов
+LATENCY_BOUNDS = tuple(2 ** k for k in range(25))  # до ~17 с
+SIZE_BOUNDS = (0,) + tuple(2 ** k for k in range(21))
+
+
+class Histogram:
+    """гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя корзина - всё, что больше
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q"""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        buckets = {(str(self.bounds[i]) if i < len(self.bounds) else "inf"): n
+                   for i, n in enumerate(self.counts) if n}
+        return {"count": self.count, "mean": self.total / self.count, "max": self.max,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99), "buckets": buckets}
+
+
+@dataclass
+class OperationStats:
+    """счётчики одной операции"""
+    calls: int = 0
+    errors: int = 0
+    latency_us: Histogram = field(default_factory=lambda: Histogram(LATENCY_BOUNDS))
+    sizes: Histogram = field(default_factory=lambda: Histogram(SIZE_BOUNDS))
+
+
+class Metrics:
+    """метрики операций библиотеки
+
+    Для каждой операции хранятся число вызовов и ошибок, гистограмма
+    задержек и гистограмма размеров результатов (для операций, возвращающих
+    коллекцию). Подключённые хуки получают каждое измерение и могут
+    передавать его во внешнюю систему метрик.
+    """
+
+    def __init__(self, hooks: Iterable[Hook] = ()):
+        self._ops: Dict[str, OperationStats] = {}
+        self._hooks: List[Hook] = list(hooks)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Metrics(операций: {len(self._ops)}, вызовов: {sum(s.calls for s in self._ops.values())})"
+
+    def add_hook(self, hook: Hook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        self._hooks.remove(hook)
+
+    def record(self, name: str, seconds: float, size: Optional[int] = None, error: bool = False) -> None:
+        with self._lock:
+            stats = self._ops.get(name)
+            if stats is None:
+                stats = self._ops[name] = OperationStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.latency_us.record(seconds * 1e6)
+            if size is not None:
+                stats.sizes.record(size)
+        for hook in self._hooks:
+            hook(name, seconds, size)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Копия всех счётчиков в виде словарей"""
+        with self._lock:
+            return {name: {"calls": s.calls, "errors": s.errors,
+                           "latency_us": s.latency_us.snapshot(), "sizes": s.sizes.snapshot()}
+                    for name, s in sorted(self._ops.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+
+
+def result_size(result: Any) -> Optional[int]:
+    """Размер результата для гистограммы: только для коллекций"""
+    if isinstance(result, (bool, int)) or not hasattr(result, "__len__"):
+        return None
+    return len(result)
+
+
+def _measured(method: Callable, name: str, metrics: Metrics) -> Callable:
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            metrics.record(name, time.perf_counter() - start, error=True)
+            raise
+        metrics.record(name, time.perf_counter() - start, result_size(result))
+        return result
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def instrument(obj: Any, metrics: Metrics, methods: Iterable[str], prefix: str = "") -> None:
+    """Замена методов объекта измеряющими обёртками
+
+    Обёртки ставятся атрибутами экземпляра, класс не меняется, поэтому
+    объекты без метрик не платят ничего. Для итераторов измеряется только
+    создание, а не перебор.
+    """
+    for name in methods:
+        setattr(obj, name, _measured(getattr(obj, name), prefix + name, metrics))
+
+
+def uninstrument(obj: Any, methods: Iterable[str]) -> None:
+    """Снятие обёрток, поставленных instrument"""
+    for name in methods:
+        obj.__dict__.pop(name, None)
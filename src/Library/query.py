@@ -0,0 +1,91 @@
+from dataclasses import dataclass, replace
+from itertools import islice
+from typing import Optional, List, Iterator, Callable, Tuple
+
+from src.Library.book import Book, BookCollection
+
+
+@dataclass(frozen=True)
+class Query:
+    """ленивый составной запрос к библиотеке
+
+    Каждый метод возвращает новый запрос, поэтому запросы можно
+    переиспользовать как основу. Книги выбираются только при итерации:
+    обход начинается с самого избирательного индекса, остальные условия
+    проверяются по ходу потока. Менять библиотеку во время обхода нельзя.
+    """
+    library: object
+    author_name: Optional[str] = None
+    genre_name: Optional[str] = None
+    year_lo: Optional[int] = None
+    year_hi: Optional[int] = None
+    max_results: Optional[int] = None
+
+    def author(self, author: str) -> 'Query':
+        return replace(self, author_name=author)
+
+    def genre(self, genre: str) -> 'Query':
+        return replace(self, genre_name=genre)
+
+    def year(self, year: int) -> 'Query':
+        return replace(self, year_lo=year, year_hi=year)
+
+    def year_between(self, lo: int, hi: int) -> 'Query':
+        return replace(self, year_lo=lo, year_hi=hi)
+
+    def limit(self, n: int) -> 'Query':
+        return replace(self, max_results=n)
+
+    def _plan(self) -> List[Tuple[str, int, Callable[[], Iterator[Book]], Callable[[Book], bool]]]:
+        """Условия запроса с оценкой числа книг, по возрастанию оценки
+
+        Для каждого условия: описание, оценка, источник книг и проверка книги.
+        """
+        index = self.library._index
+        steps = []
+        if self.author_name is not None:
+            bucket = index.author_bucket(self.author_name)
+            steps.append((f"author={self.author_name!r}", len(bucket),
+                          lambda bucket=bucket: iter(bucket.values()),
+                          lambda book, bucket=bucket: book.isbn in bucket))
+        if self.genre_name is not None:
+            bucket = index.genre_bucket(self.genre_name)
+            steps.append((f"genre={self.genre_name!r}", len(bucket),
+                          lambda bucket=bucket: iter(bucket.values()),
+                          lambda book, bucket=bucket: book.isbn in bucket))
+        if self.year_lo is not None:
+            lo, hi = self.year_lo, self.year_hi
+            steps.append((f"year={lo}..{hi}", index.count_year_range(lo, hi),
+                          lambda: index.search_by_year_range(lo, hi),
+                          lambda book: lo <= book.year <= hi))
+        steps.sort(key=lambda step: step[1])
+        return steps
+
+    def __iter__(self) -> Iterator[Book]:
+        steps = self._plan()
+        if not steps:
+            books = iter(self.library._books)
+        else:
+            _, _, source, _ = steps[0]
+            checks = [check for _, _, _, check in steps[1:]]
+            books = (book for book in source() if all(check(book) for check in checks))
+        if self.max_results is not None:
+            books = islice(books, self.max_results)
+        return books
+
+    def collect(self) -> BookCollection:
+        """Выполнение запроса с материализацией результата"""
+        return BookCollection(list(self))
+
+    def explain(self) -> str:
+        """Описание выбранного плана"""
+        steps = self._plan()
+        if not steps:
+            lines = [f"полный обход каталога (~{len(self.library._books)})"]
+        else:
+            name, estimate, _, _ = steps[0]
+            lines = [f"обход индекса {name} (~{estimate})"]
+            lines += [f"фильтр {name} (~{estimate})" for name, estimate, _, _ in steps[1:]]
+        if self.max_results is not None:
+            lines.append(f"ограничение {self.max_results}")
+        return "\n".join(lines)
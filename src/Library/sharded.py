@@ -0,0 +1,368 @@
+import heapq
+import itertools
+import multiprocessing
+import random
+import zlib
+from functools import reduce
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.Library.bloom import BloomFilter
+from src.Library.book import Book, BookCollection
+from src.Library.concurrent import ConcurrentLibrary
+from src.Library.diff import CatalogDiff, Resolver
+from src.Library.isbn import isbn_key
+from src.Library.library import Library
+from src.Library.loans import Loan
+from src.Library.text_index import TitleIndex
+
+
+def _resolve(library: Library, method: str) -> Callable:
+    """Метод шарда по имени; путь через точку ведёт к вложенным объектам (_index.search_by_author)"""
+    return reduce(getattr, method.split("."), library)
+
+
+class _Rows(list):
+    """книги в виде кортежей полей: так они сериализуются в несколько раз быстрее"""
+
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, (list, BookCollection)) and len(value) and isinstance(next(iter(value)), Book):
+        return _Rows((book.title, book.author, book.year, book.genre, book.isbn) for book in value)
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, _Rows):
+        return [Book(*row) for row in value]
+    return value
+
+
+def _serve_shard(conn, name: str) -> None:
+    """Цикл процесса-шарда: вызовы приходят по каналу, ответ - (ok, результат или исключение)"""
+    library = Library(name)
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        method, args, kwargs = message
+        try:
+            result = _resolve(library, method)(*map(_unpack, args), **kwargs)
+            if isinstance(result, Iterator):
+                result = list(result)
+            conn.send((True, _pack(result)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+class LocalShard:
+    """шард в текущем процессе: вызов выполняется сразу"""
+
+    def __init__(self, name: str):
+        self.library = Library(name)
+
+    def submit(self, method: str, *args, **kwargs) -> Callable[[], Any]:
+        # ошибка поднимается при получении ответа, как у ProcessShard
+        try:
+            result = _resolve(self.library, method)(*args, **kwargs)
+        except Exception as e:
+            def fail(error: Exception = e) -> Any:
+                raise error
+            return fail
+        return lambda: result
+
+    def close(self) -> None:
+        pass
+
+
+class ProcessShard:
+    """шард в отдельном процессе
+
+    submit отправляет вызов и сразу возвращает функцию ожидания ответа,
+    поэтому запросы ко всем шардам выполняются параллельно.
+    """
+
+    def __init__(self, name: str):
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_shard, args=(child, name), daemon=True)
+        self._process.start()
+        child.close()
+
+    def submit(self, method: str, *args, **kwargs) -> Callable[[], Any]:
+        self._conn.send((method, tuple(map(_pack, args)), kwargs))
+
+        def result() -> Any:
+            ok, value = self._conn.recv()
+            if not ok:
+                raise value
+            return _unpack(value)
+
+        return result
+
+    def close(self) -> None:
+        if self._process.is_alive():
+            self._conn.send(None)
+            self._process.join()
+        self._conn.close()
+
+
+class ShardedLibrary:
+    """библиотека, разделённая на шарды по хешу ISBN
+
+    Операции с одной книгой идут в её шард, поиск рассылается во все шарды
+    сразу, а результаты сливаются. С processes=True каждый шард живёт в своём
+    процессе и поиск выполняется на нескольких ядрах; книги в результатах
+    тогда - копии. Фильтр Блума по ISBN каталога отвечает на запросы о
+    неизвестных книгах без обращения к шардам. Составные запросы (query), кэш, журнал и снимки работают
+    только на отдельной Library.
+    """
+
+    def __init__(self, name: str, shards: int = 4, processes: bool = False):
+        self.name = name
+        shard_type = ProcessShard if processes else LocalShard
+        self._shards: List[Union[LocalShard, ProcessShard]] = [
+            shard_type(f"{name} [{i}]") for i in range(shards)
+        ]
+        self._isbns = BloomFilter()
+        self._removed = 0  # удалённые ISBN остаются в фильтре до перестройки
+
+    def __enter__(self) -> 'ShardedLibrary':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(self._gather("__len__"))
+
+    def __contains__(self, book: Book) -> bool:
+        return self._known(book.isbn) and self._call(book.isbn, "__contains__", book)
+
+    def __repr__(self) -> str:
+        return f"ShardedLibrary(name='{self.name}', shards={len(self._shards)}, books={len(self)})"
+
+    def __call__(self, query: str) -> BookCollection:
+        """library('автор')"""
+        return self.search_books(query)
+
+    def __add__(self, other: Union[Book, Library, 'ShardedLibrary']) -> 'ShardedLibrary':
+        """library + book или library + другая библиотека (слияние, см. merge)"""
+        if isinstance(other, (Library, ShardedLibrary)):
+            self.merge(other)
+        elif isinstance(other, Book) or all(hasattr(other, name) for name in ("title", "author", "year", "genre")):
+            self.add_book(other)
+        else:
+            raise TypeError(f"К библиотеке можно прибавить книгу или библиотеку, а не {type(other).__name__}")
+        return self
+
+    def close(self) -> None:
+        """Остановка процессов шардов"""
+        for shard in self._shards:
+            shard.close()
+
+    def shard_of(self, isbn: str) -> int:
+        # crc32, а не hash(): встроенный хеш строк различается между процессами.
+        # Ключ тот же, что в фильтре: разные записи одного ISBN попадают в один шард
+        return zlib.crc32(str(isbn_key(isbn)).encode("utf-8")) % len(self._shards)
+
+    def _known(self, isbn: str) -> bool:
+        """False - книги с таким ISBN точно нет; True - она возможно есть"""
+        return isbn_key(isbn) in self._isbns
+
+    def _remember(self, isbns: Iterable[str]) -> None:
+        for isbn in isbns:
+            self._isbns.add(isbn_key(isbn))
+        if self._isbns.overfull:
+            self._rebuild_filter()
+
+    def _rebuild_filter(self) -> None:
+        """Новый фильтр по ISBN из шардов, с запасом на рост каталога"""
+        parts = [list(part) for part in self._gather("_index.__iter__")]
+        self._isbns = BloomFilter(2 * sum(map(len, parts)) + 1024)
+        self._isbns.update(isbn_key(isbn) for part in parts for isbn in part)
+        self._removed = 0
+
+    def _call(self, isbn: str, method: str, *args, **kwargs) -> Any:
+        return self._shards[self.shard_of(isbn)].submit(method, *args, **kwargs)()
+
+    def _gather(self, method: str, *args, **kwargs) -> List[Any]:
+        """Вызов во всех шардах: сначала рассылка, затем сбор ответов"""
+        return self._wait([shard.submit(method, *args, **kwargs) for shard in self._shards])
+
+    @staticmethod
+    def _wait(pending: List[Callable[[], Any]]) -> List[Any]:
+        """Ответы всех шардов; ошибка поднимается после того, как прочитаны все ответы
+
+        Непрочитанный ответ остался бы в канале процесса-шарда и достался бы следующему вызову.
+        """
+        results = []
+        error: Optional[Exception] = None
+        for result in pending:
+            try:
+                results.append(result())
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+        return results
+
+    def add_book(self, book: Book) -> None:
+        self._call(book.isbn, "add_book", book)
+        self._remember([book.isbn])
+
+    def add_books(self, books: Iterable[Book]) -> int:
+        """Пакетное добавление: книги раскладываются по шардам и добавляются параллельно"""
+        parts: List[List[Book]] = [[] for _ in self._shards]
+        for book in books:
+            parts[self.shard_of(book.isbn)].append(book)
+        pending = [shard.submit("add_books", part) for shard, part in zip(self._shards, parts) if part]
+        try:
+            return sum(self._wait(pending))
+        finally:
+            # при ошибке в одном шарде книги других шардов уже добавлены
+            self._remember(book.isbn for part in parts for book in part)
+
+    def merge(self, other: Union[Library, 'ShardedLibrary'], conflict: Union[str, Resolver] = "ours") -> CatalogDiff:
+        """Слияние с тем же смыслом, что у Library.merge
+
+        Книги и выдачи other раскладываются по шардам, и каждый шард сливает
+        свою часть через Library.merge. Функция conflict с processes=True
+        должна сериализоваться (функция модуля, а не lambda).
+        """
+        if conflict not in ("ours", "theirs", "error") and not callable(conflict):
+            raise ValueError(f"Неизвестная политика конфликтов: {conflict}")
+        if isinstance(other, ShardedLibrary):
+            books = [book for part in other._gather("_books.__iter__") for book in part]
+            loans = [loan for part in other._gather("_loans.__iter__") for loan in part]
+        elif isinstance(other, ConcurrentLibrary):
+            with other._rwlock.read():
+                books, loans = list(other._books), list(other._loans)
+        else:
+            books, loans = list(other._books), list(other._loans)
+        parts = [Library(f"{other.name} [{i}]") for i in range(len(self._shards))]
+        grouped: List[List[Book]] = [[] for _ in self._shards]
+        for book in books:
+            grouped[self.shard_of(book.isbn)].append(book)
+        for part, group in zip(parts, grouped):
+            part.add_books(group)
+        for loan in loans:
+            part = parts[self.shard_of(loan.isbn)]
+            part._loans.borrow(loan.isbn, loan.reader, loan.due).borrowed_at = loan.borrowed_at
+
+        if conflict == "error":
+            # проверка во всех шардах до каких-либо изменений
+            changed = [pair for diff in self._wait([shard.submit("diff", part)
+                                                    for shard, part in zip(self._shards, parts)])
+                       for pair in diff.changed]
+            if changed:
+                isbns = ", ".join(ours.isbn for ours, _ in changed[:10])
+                raise ValueError(f"Книги различаются в каталогах: {isbns}")
+        try:
+            diffs = self._wait([shard.submit("merge", part, conflict) for shard, part in zip(self._shards, parts)])
+        finally:
+            self._remember(book.isbn for book in books)
+        return CatalogDiff([book for diff in diffs for book in diff.added], [],
+                           [pair for diff in diffs for pair in diff.changed])
+
+    def remove_book(self, isbn: str) -> bool:
+        if not self._known(isbn) or not self._call(isbn, "remove_book", isbn):
+            return False
+        self._removed += 1
+        if self._removed > self._isbns.count // 2:
+            self._rebuild_filter()
+        return True
+
+    def edit_book(self, isbn: str, **fields: Union[str, int]) -> bool:
+        return self._known(isbn) and self._call(isbn, "edit_book", isbn, **fields)
+
+    def get_book(self, isbn: str) -> Optional[Book]:
+        return self._call(isbn, "_index.search_by_isbn", isbn) if self._known(isbn) else None
+
+    @staticmethod
+    def _merge(parts: Iterable[List[Book]]) -> BookCollection:
+        result = BookCollection()
+        for part in parts:
+            for book in part:
+                result.add(book)
+        return result
+
+    def search_books(self, query: str) -> BookCollection:
+        """Поиск с тем же порядком веток, что у Library.search_books
+
+        Ветка выбирается по всем шардам сразу: если автор найден хотя бы в
+        одном шарде, поиск по году, жанру и названию не выполняется.
+        """
+        parts = self._gather("_index.search_by_author", query)
+        if not any(parts):
+            if query.isdigit():
+                parts = self._gather("_index.search_by_year", int(query.strip()))
+            else:
+                parts = self._gather("_index.search_by_genre", query)
+            if not any(parts):
+                book = self.get_book(query)
+                if book is not None:
+                    return BookCollection([book])
+                if not query.isdigit():
+                    return self.search_by_title(query, k=None, fuzzy=False)
+        return self._merge(parts)
+
+    def search_many(self, queries: Iterable[str]) -> List[Tuple[Book, ...]]:
+        """Пакетный поиск; повторяющиеся запросы выполняются один раз"""
+        queries = list(queries)
+        found = {query: tuple(self.search_books(query)) for query in dict.fromkeys(queries)}
+        return [found[query] for query in queries]
+
+    def search_by_title(self, query: str, k: Optional[int] = 10, fuzzy: bool = True) -> BookCollection:
+        """Топ-k по названию: лучшие k каждого шарда переранжируются вместе"""
+        # кандидаты ранжируются временным TitleIndex - в том же порядке, что и в одном шарде
+        candidates = TitleIndex()
+        candidates.add_books(book for part in self._gather("search_by_title", query, k, fuzzy) for book in part)
+        return BookCollection(candidates.search(query, k, fuzzy))
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        """Книги с lo по hi включительно: упорядоченные ответы шардов сливаются по году"""
+        parts = self._gather("search_by_year_range", lo, hi)
+        return heapq.merge(*parts, key=lambda book: book.year)
+
+    def search_by_decade(self, decade: int) -> Iterator[Book]:
+        parts = self._gather("search_by_decade", decade)
+        return heapq.merge(*parts, key=lambda book: book.year)
+
+    def get_random_book(self) -> Optional[Book]:
+        sizes = self._gather("__len__")
+        if not any(sizes):
+            return None
+        shard = random.choices(self._shards, weights=sizes)[0]
+        return shard.submit("get_random_book")()
+
+    def borrow_book(self, isbn: str, reader: str, due: Optional[float] = None) -> bool:
+        return self._known(isbn) and self._call(isbn, "borrow_book", isbn, reader, due)
+
+    def return_book(self, isbn: str) -> bool:
+        # выданная книга всегда есть в каталоге: удаление закрывает выдачу
+        return self._known(isbn) and self._call(isbn, "return_book", isbn)
+
+    def set_loan_policy(self, loan_days: float = 14, max_per_reader: Optional[int] = None) -> None:
+        """Политика выдачи для всех шардов
+
+        Лимит книг на читателя действует внутри шарда, а не на всю библиотеку.
+        """
+        self._gather("set_loan_policy", loan_days, max_per_reader)
+
+    def loans_of(self, reader: str) -> List[Loan]:
+        loans = [loan for part in self._gather("loans_of", reader) for loan in part]
+        return sorted(loans, key=lambda loan: loan.borrowed_at)
+
+    def overdue_loans(self, n: Optional[int] = None, now: Optional[float] = None) -> List[Loan]:
+        merged = heapq.merge(*self._gather("overdue_loans", n, now), key=lambda loan: loan.due)
+        return list(itertools.islice(merged, n))
+
+    def update_index(self, verify: bool = False) -> None:
+        self._gather("update_index", verify)
+
+    def rebuild_index(self) -> None:
+        self._gather("rebuild_index")
+
+    def check_index(self) -> List[str]:
+        return [problem for part in self._gather("check_index") for problem in part]
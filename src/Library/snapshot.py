@@ -0,0 +1,443 @@
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional, List, Dict, Iterator, Iterable, Tuple
+
+from src.Library.book import Book, BookCollection
+from src.Library.index import IndexDict
+from src.Library.text_index import TitleIndex
+
+MAGIC = b"LIBSNAP3"
+
+# порядок секций файла; каждая секция - массив, выровненный по 8 байт
+SECTIONS = (
+    ("strings", "B"),         # строки UTF-8 подряд
+    ("string_offsets", "Q"),  # границы строк, n + 1 значений
+    ("books", "I"),           # по 4 кода строк на книгу: название, автор, жанр, ISBN
+    ("years", "i"),           # год издания каждой книги
+    ("isbn_order", "I"),      # номера книг, отсортированные по ISBN
+    ("author_keys", "I"),     # коды авторов по алфавиту
+    ("author_starts", "I"),   # границы корзин в author_rows
+    ("author_rows", "I"),
+    ("genre_keys", "I"),
+    ("genre_starts", "I"),
+    ("genre_rows", "I"),
+    ("year_keys", "i"),
+    ("year_starts", "I"),
+    ("year_rows", "I"),
+    ("borrowed", "I"),        # пары (код ISBN, код читателя)
+    ("loan_times", "d"),      # пары (время выдачи, срок возврата) для каждой выдачи из borrowed
+)
+
+# magic, порядок байт, код названия библиотеки, номер последней записи журнала,
+# затем (смещение, длина) каждой секции
+HEADER = struct.Struct("<8sBxxxIQ" + "QQ" * len(SECTIONS))
+
+
+class _StringTable:
+    """словарь строк для записи снимка"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _buckets(index: Dict, keys: List, rows: Dict[str, int], key_code) -> Tuple[array, array, array]:
+    """Корзины вторичного индекса в виде ключей, границ и номеров книг"""
+    key_array = array("i" if key_code is None else "I")
+    starts = array("I", [0])
+    postings = array("I")
+    for key in keys:
+        key_array.append(key if key_code is None else key_code(key))
+        postings.extend(rows[isbn] for isbn in index[key])
+        starts.append(len(postings))
+    return key_array, starts, postings
+
+
+def save_snapshot(library, path: str, lsn: int = 0) -> None:
+    """Запись библиотеки вместе с готовыми индексами в двоичный снимок
+
+    lsn - номер последней записи журнала изменений, уже учтённой в снимке.
+    """
+    library.update_index()
+    index: IndexDict = library._index
+    if isinstance(index, SnapshotIndex):
+        # корзины загруженного и не изменённого снимка ещё лежат в файле
+        index._hydrate()
+    strings = _StringTable()
+    name_code = strings.code(library.name)
+
+    books = array("I")
+    years = array("i")
+    rows: Dict[str, int] = {}
+    for row, book in enumerate(library._books):
+        rows[book.isbn] = row
+        books.extend((strings.code(book.title), strings.code(book.author),
+                      strings.code(book.genre), strings.code(book.isbn)))
+        years.append(int(book.year))
+
+    isbn_order = array("I", (rows[isbn] for isbn in sorted(rows)))
+    authors = _buckets(index._author_index, sorted(index._author_index), rows, strings.code)
+    genres = _buckets(index._genre_index, sorted(index._genre_index), rows, strings.code)
+    years_index = _buckets(index._year_index, index._year_keys, rows, None)
+
+    borrowed = array("I")
+    loan_times = array("d")
+    for loan in library._loans:
+        borrowed.extend((strings.code(loan.isbn), strings.code(loan.reader)))
+        loan_times.extend((loan.borrowed_at, loan.due))
+
+    encoded = [value.encode("utf-8") for value in strings.values]
+    offsets = array("Q", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    sections = [array("B", b"".join(encoded)), offsets, books, years, isbn_order,
+                *authors, *genres, *years_index, borrowed, loan_times]
+
+    layout = []
+    position = HEADER.size
+    for data in sections:
+        position += -position % 8
+        layout.extend((position, len(data)))
+        position += len(data) * data.itemsize
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, sys.byteorder == "little", name_code, lsn, *layout))
+        for data in sections:
+            file.write(b"\0" * (-file.tell() % 8))
+            data.tofile(file)
+    os.replace(tmp_path, path)
+
+
+class CatalogSnapshot:
+    """снимок каталога, отображённый в память; книги читаются по запросу"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mmap)
+        if header[0] != MAGIC:
+            raise ValueError(f"'{path}' не является снимком каталога")
+        if header[1] != (sys.byteorder == "little"):
+            raise ValueError("Снимок записан на платформе с другим порядком байт")
+
+        view = memoryview(self._mmap)
+        self.lsn = header[3]
+        layout = header[4:]
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = layout[2 * i], layout[2 * i + 1]
+            size = array(typecode).itemsize
+            setattr(self, f"_{name}", view[offset:offset + length * size].cast(typecode))
+        self.name = self._string(header[2])
+        self._cache: List[Optional[Book]] = []
+
+    def __len__(self) -> int:
+        return len(self._years)
+
+    def __repr__(self) -> str:
+        return f"CatalogSnapshot(name='{self.name}', books={len(self)})"
+
+    def _string(self, code: int) -> str:
+        return str(self._strings[self._string_offsets[code]:self._string_offsets[code + 1]], "utf-8")
+
+    def book(self, row: int) -> Book:
+        """Книга по номеру строки"""
+        title, author, genre, isbn = self._books[4 * row:4 * row + 4]
+        return Book(self._string(title), self._string(author), self._years[row],
+                    self._string(genre), self._string(isbn))
+
+    def books(self) -> List[Book]:
+        """Все книги в порядке каталога; список создаётся один раз"""
+        if len(self._cache) != len(self):
+            self._cache = [self.book(row) for row in range(len(self))]
+        return self._cache
+
+    def _find(self, keys: memoryview, value: str) -> int:
+        """Позиция строкового ключа в отсортированном массиве кодов или -1"""
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(keys[mid]) < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(keys) and self._string(keys[lo]) == value else -1
+
+    def _bucket(self, position: int, starts: memoryview, rows: memoryview) -> List[Book]:
+        if position < 0:
+            return []
+        return [self.book(row) for row in rows[starts[position]:starts[position + 1]]]
+
+    def row_of(self, isbn: str) -> int:
+        """Номер строки книги по ISBN или -1"""
+        lo, hi = 0, len(self._isbn_order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(self._books[4 * self._isbn_order[mid] + 3]) < isbn:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._isbn_order):
+            row = self._isbn_order[lo]
+            if self._string(self._books[4 * row + 3]) == isbn:
+                return row
+        return -1
+
+    def search_by_isbn(self, isbn: str) -> Optional[Book]:
+        row = self.row_of(isbn)
+        return None if row < 0 else self.book(row)
+
+    def search_by_author(self, author: str) -> List[Book]:
+        return self._bucket(self._find(self._author_keys, author), self._author_starts, self._author_rows)
+
+    def search_by_genre(self, genre: str) -> List[Book]:
+        return self._bucket(self._find(self._genre_keys, genre), self._genre_starts, self._genre_rows)
+
+    def search_by_year(self, year: int) -> List[Book]:
+        position = bisect_left(self._year_keys, year)
+        if position == len(self._year_keys) or self._year_keys[position] != year:
+            position = -1
+        return self._bucket(position, self._year_starts, self._year_rows)
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        start = bisect_left(self._year_keys, lo)
+        stop = bisect_right(self._year_keys, hi)
+        for row in self._year_rows[self._year_starts[start]:self._year_starts[stop]]:
+            yield self.book(row)
+
+    def buckets(self, kind: str) -> Iterator[Tuple[object, List[Book]]]:
+        """Готовые корзины индекса (author, genre, year) из общего списка книг"""
+        books = self.books()
+        keys = getattr(self, f"_{kind}_keys")
+        starts = getattr(self, f"_{kind}_starts")
+        rows = getattr(self, f"_{kind}_rows")
+        for i, key in enumerate(keys):
+            yield (key if kind == "year" else self._string(key),
+                   [books[row] for row in rows[starts[i]:starts[i + 1]]])
+
+    def borrowed(self) -> Dict[str, str]:
+        pairs = self._borrowed
+        return {self._string(pairs[i]): self._string(pairs[i + 1]) for i in range(0, len(pairs), 2)}
+
+    def loans(self) -> Iterator[Tuple[str, str, float, float]]:
+        """Выдачи: (ISBN, читатель, время выдачи, срок возврата)"""
+        pairs, times = self._borrowed, self._loan_times
+        for i in range(0, len(pairs), 2):
+            yield self._string(pairs[i]), self._string(pairs[i + 1]), times[i], times[i + 1]
+
+    def close(self) -> None:
+        for name, _ in SECTIONS:
+            getattr(self, f"_{name}").release()
+        self._mmap.close()
+
+
+class SnapshotCollection(BookCollection):
+    """коллекция поверх снимка: чтение по ISBN без загрузки, остальное - после загрузки"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        super().__init__()
+        self._snapshot: Optional[CatalogSnapshot] = snapshot
+
+    def _hydrate(self) -> None:
+        if self._snapshot is not None:
+            snapshot, self._snapshot = self._snapshot, None
+            self._books = list(snapshot.books())
+            self._positions = {book.isbn: i for i, book in enumerate(self._books)}
+
+    def __len__(self) -> int:
+        return len(self._snapshot) if self._snapshot is not None else super().__len__()
+
+    def __contains__(self, book: Book) -> bool:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_isbn(book.isbn) == book
+        return super().__contains__(book)
+
+    def get(self, isbn: str) -> Optional[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_isbn(isbn)
+        return super().get(isbn)
+
+    def get_random_book(self) -> Optional[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.book(random.randrange(len(self._snapshot))) if len(self._snapshot) else None
+        return super().get_random_book()
+
+    def __iter__(self) -> Iterator[Book]:
+        self._hydrate()
+        return super().__iter__()
+
+    def __getitem__(self, key):
+        self._hydrate()
+        return super().__getitem__(key)
+
+    def add(self, book: Book) -> None:
+        self._hydrate()
+        super().add(book)
+
+    def remove(self, book: Book) -> bool:
+        self._hydrate()
+        return super().remove(book)
+
+    def clear(self) -> None:
+        self._snapshot = None
+        super().clear()
+
+
+class SnapshotIndex(IndexDict):
+    """индекс поверх снимка: поиск идёт по файлу, изменения - после загрузки корзин"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        super().__init__()
+        self._snapshot: Optional[CatalogSnapshot] = snapshot
+
+    def _hydrate(self) -> None:
+        if self._snapshot is None:
+            return
+        snapshot, self._snapshot = self._snapshot, None
+        self._isbn_index = {book.isbn: book for book in snapshot.books()}
+        self._author_index = {key: {book.isbn: book for book in bucket}
+                              for key, bucket in snapshot.buckets("author")}
+        self._genre_index = {key: {book.isbn: book for book in bucket}
+                             for key, bucket in snapshot.buckets("genre")}
+        self._year_index = {key: {book.isbn: book for book in bucket}
+                            for key, bucket in snapshot.buckets("year")}
+        self._year_keys = list(self._year_index)
+
+    def __len__(self) -> int:
+        return len(self._snapshot) if self._snapshot is not None else super().__len__()
+
+    def __contains__(self, isbn: str) -> bool:
+        if self._snapshot is not None:
+            return self._snapshot.row_of(isbn) >= 0
+        return super().__contains__(isbn)
+
+    def __getitem__(self, key):
+        self._hydrate()
+        return super().__getitem__(key)
+
+    def __iter__(self) -> Iterator[str]:
+        self._hydrate()
+        return super().__iter__()
+
+    def __repr__(self) -> str:
+        self._hydrate()
+        return super().__repr__()
+
+    def add_book(self, book: Book) -> None:
+        self._hydrate()
+        super().add_book(book)
+
+    def add_books(self, books: Iterable[Book]) -> None:
+        self._hydrate()
+        super().add_books(books)
+
+    def remove_book(self, isbn: str, indexed: Optional[Book] = None) -> bool:
+        self._hydrate()
+        return super().remove_book(isbn, indexed)
+
+    def check_book(self, book: Book) -> bool:
+        self._hydrate()
+        return super().check_book(book)
+
+    def extra_entries(self) -> int:
+        self._hydrate()
+        return super().extra_entries()
+
+    def search_by_isbn(self, isbn: str) -> Optional[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_isbn(isbn)
+        return super().search_by_isbn(isbn)
+
+    def search_by_author(self, author: str) -> List[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_author(author)
+        return super().search_by_author(author)
+
+    def search_by_year(self, year: int) -> List[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_year(year)
+        return super().search_by_year(year)
+
+    def search_by_year_range(self, lo: int, hi: int) -> Iterator[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_year_range(lo, hi)
+        return super().search_by_year_range(lo, hi)
+
+    def search_by_genre(self, genre: str) -> List[Book]:
+        if self._snapshot is not None:
+            return self._snapshot.search_by_genre(genre)
+        return super().search_by_genre(genre)
+
+    def author_bucket(self, author: str) -> Dict[str, Book]:
+        self._hydrate()
+        return super().author_bucket(author)
+
+    def genre_bucket(self, genre: str) -> Dict[str, Book]:
+        self._hydrate()
+        return super().genre_bucket(genre)
+
+    def year_bucket(self, year: int) -> Dict[str, Book]:
+        self._hydrate()
+        return super().year_bucket(year)
+
+    def count_year_range(self, lo: int, hi: int) -> int:
+        self._hydrate()
+        return super().count_year_range(lo, hi)
+
+    def clear(self) -> None:
+        self._snapshot = None
+        super().clear()
+
+
+class SnapshotTitleIndex(TitleIndex):
+    """индекс названий, который строится при первом обращении"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        super().__init__()
+        self._snapshot: Optional[CatalogSnapshot] = snapshot
+
+    def _hydrate(self) -> None:
+        if self._snapshot is not None:
+            snapshot, self._snapshot = self._snapshot, None
+            for book in snapshot.books():
+                super().add_book(book)
+
+    def __len__(self) -> int:
+        return len(self._snapshot) if self._snapshot is not None else super().__len__()
+
+    def add_book(self, book: Book) -> None:
+        self._hydrate()
+        super().add_book(book)
+
+    def add_books(self, books: Iterable[Book]) -> None:
+        self._hydrate()
+        super().add_books(books)
+
+    def remove_book(self, book: Book) -> bool:
+        self._hydrate()
+        return super().remove_book(book)
+
+    def replace_book(self, old: Book, new: Book) -> None:
+        self._hydrate()
+        super().replace_book(old, new)
+
+    def search(self, query: str, k: Optional[int] = 10, fuzzy: bool = True) -> List[Book]:
+        self._hydrate()
+        return super().search(query, k, fuzzy)
+
+    def clear(self) -> None:
+        self._snapshot = None
+        super().clear()
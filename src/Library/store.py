@@ -0,0 +1,208 @@
+import random
+from array import array
+from typing import Optional, List, Dict, Union, Iterator
+
+from src.Library.book import Book, BookCollection
+
+# годы хранятся в array('h')
+YEAR_MIN, YEAR_MAX = -32768, 32767
+
+
+def check_year(year: int) -> None:
+    """ValueError, если год не помещается в колонку годов BookStore"""
+    if not YEAR_MIN <= year <= YEAR_MAX:
+        raise ValueError(f"Год {year} вне допустимого диапазона {YEAR_MIN}..{YEAR_MAX}")
+
+
+class BookView:
+    """лёгкое представление книги, хранящейся в BookStore
+
+    Поля читаются из колонок хранилища по ISBN, поэтому представление
+    остаётся корректным после уплотнения хранилища. При удалении книги
+    поля копируются в представление: оно продолжает показывать удалённую
+    книгу, даже если ISBN потом добавят снова.
+    """
+
+    __slots__ = ("_store", "isbn", "_fields")
+
+    def __init__(self, store: 'BookStore', isbn: str):
+        self._store = store
+        self.isbn = isbn
+        self._fields: Optional[tuple] = None  # (название, автор, год, жанр) удалённой книги
+
+    def _detach(self) -> None:
+        self._fields = (self.title, self.author, self.year, self.genre)
+
+    @property
+    def title(self) -> str:
+        if self._fields is not None:
+            return self._fields[0]
+        return self._store._titles[self._store._positions[self.isbn]]
+
+    @property
+    def author(self) -> str:
+        if self._fields is not None:
+            return self._fields[1]
+        return self._store._strings[self._store._authors[self._store._positions[self.isbn]]]
+
+    @property
+    def year(self) -> int:
+        if self._fields is not None:
+            return self._fields[2]
+        return self._store._years[self._store._positions[self.isbn]]
+
+    @property
+    def genre(self) -> str:
+        if self._fields is not None:
+            return self._fields[3]
+        return self._store._strings[self._store._genres[self._store._positions[self.isbn]]]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (Book, BookView)):
+            return NotImplemented
+        return (self.isbn == other.isbn and self.title == other.title and self.author == other.author
+                and self.year == other.year and self.genre == other.genre)
+
+    __hash__ = None
+
+    def __str__(self) -> str:
+        return f"'{self.title}' - {self.author} ({self.year})"
+
+    def __repr__(self) -> str:
+        return f"Book(title='{self.title}', author='{self.author}', year={self.year})"
+
+    def to_book(self) -> Book:
+        """Полноценный экземпляр Book"""
+        return Book(self.title, self.author, self.year, self.genre, self.isbn)
+
+
+class BookStore(BookCollection):
+    """колоночное хранилище книг для больших каталогов
+
+    Авторы и жанры хранятся кодами словаря строк, годы - в array('h').
+    Названия почти всегда уникальны и не интернируются: запись в таблице
+    интернирования стоила бы дороже экономии. Наружу выдаются представления
+    BookView, по одному на строку: представление создаётся при первом
+    обращении, и при удалении книги хранилище копирует в него поля.
+    """
+
+    def __init__(self, books: Optional[List[Book]] = None):
+        self._isbns: List[Optional[str]] = []
+        self._titles: List[Optional[str]] = []
+        self._views: List[Optional[BookView]] = []  # строка -> выданное представление
+        self._authors = array('I')
+        self._genres = array('I')
+        self._years = array('h')
+        self._strings: List[str] = []  # код -> строка
+        self._codes: Dict[str, int] = {}  # строка -> код
+        super().__init__(books)
+
+    def __iter__(self) -> Iterator[BookView]:
+        return (self._view(i) for i, isbn in enumerate(self._isbns) if isbn is not None)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[BookView, BookCollection]:
+        if self._holes:
+            self._compact()
+        if isinstance(key, slice):
+            return BookCollection([self._view(i) for i in range(len(self._isbns))[key]])
+        return self._view(range(len(self._isbns))[key])
+
+    def __contains__(self, book: Book) -> bool:
+        position = self._positions.get(book.isbn)
+        return position is not None and self._row_equals(position, book)
+
+    def __repr__(self) -> str:
+        return f"BookStore(books={len(self)} шт., строк в словаре: {len(self._strings)})"
+
+    def _view(self, position: int) -> BookView:
+        view = self._views[position]
+        if view is None:
+            view = self._views[position] = BookView(self, self._isbns[position])
+        return view
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._codes[value] = code
+            self._strings.append(value)
+        return code
+
+    def _row_equals(self, position: int, book: Book) -> bool:
+        return (self._titles[position] == book.title
+                and self._strings[self._authors[position]] == book.author
+                and self._years[position] == book.year
+                and self._strings[self._genres[position]] == book.genre)
+
+    def _write_row(self, position: int, book: Book) -> None:
+        self._titles[position] = book.title
+        self._authors[position] = self._code(book.author)
+        self._genres[position] = self._code(book.genre)
+        self._years[position] = int(book.year)
+
+    def _compact(self) -> None:
+        live = [i for i, isbn in enumerate(self._isbns) if isbn is not None]
+        self._isbns = [self._isbns[i] for i in live]
+        self._titles = [self._titles[i] for i in live]
+        self._views = [self._views[i] for i in live]
+        self._authors = array('I', (self._authors[i] for i in live))
+        self._genres = array('I', (self._genres[i] for i in live))
+        self._years = array('h', (self._years[i] for i in live))
+        self._positions = {isbn: i for i, isbn in enumerate(self._isbns)}
+        self._holes = 0
+
+    def add(self, book: Book) -> None:
+        check_year(int(book.year))
+        position = self._positions.get(book.isbn)
+        if position is None:
+            position = len(self._isbns)
+            self._positions[book.isbn] = position
+            self._isbns.append(book.isbn)
+            self._titles.append(None)
+            self._views.append(None)
+            self._authors.append(0)
+            self._genres.append(0)
+            self._years.append(0)
+        self._write_row(position, book)
+
+    def remove(self, book: Book) -> bool:
+        if book not in self:
+            return False
+        position = self._positions[book.isbn]
+        if self._views[position] is not None:
+            self._views[position]._detach()
+            self._views[position] = None
+        del self._positions[book.isbn]
+        self._isbns[position] = None
+        self._titles[position] = None
+        self._holes += 1
+        if self._holes * 2 > len(self._isbns):
+            self._compact()
+        return True
+
+    def clear(self) -> None:
+        for view in self._views:
+            if view is not None:
+                view._detach()
+        self._isbns.clear()
+        self._titles.clear()
+        self._views.clear()
+        self._authors = array('I')
+        self._genres = array('I')
+        self._years = array('h')
+        self._positions.clear()
+        self._holes = 0
+
+    def get(self, isbn: str) -> Optional[BookView]:
+        position = self._positions.get(isbn)
+        if position is None:
+            return None
+        return self._view(position)
+
+    def get_random_book(self) -> Optional[BookView]:
+        if not self._positions:
+            return None
+        while True:
+            position = random.randrange(len(self._isbns))
+            if self._isbns[position] is not None:
+                return self._view(position)
@@ -0,0 +1,242 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from math import isqrt
+from typing import List, Dict, Iterable, Optional, Set
+
+from src.Library.book import Book
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Приведение к нижнему регистру с заменой ё на е"""
+    return text.casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова названия (кириллица, латиница, цифры)"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы слов с граничными пробелами: 'мир' -> ' ми', 'мир', 'ир '"""
+    result = set()
+    for token in tokenize(text):
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class TitleIndex:
+    """инвертированный индекс по названиям с нечётким поиском по триграммам"""
+
+    def __init__(self, min_similarity: float = 0.5):
+        self.min_similarity = min_similarity
+        self._token_index: Dict[str, Dict[str, Book]] = {}
+        # отсортированные слова для поиска по префиксу: основной список и короткий список новых
+        # слов, который вливается в основной, когда вырастет. Удалённые слова остаются в основном
+        # списке до уплотнения и пропускаются при поиске. Так добавление и удаление слова не
+        # сдвигают список из миллиона слов при каждом вызове.
+        self._tokens: List[str] = []
+        self._new_tokens: List[str] = []
+        self._removed_tokens: Set[str] = set()
+        self._trigram_index: Dict[str, Dict[str, Book]] = {}
+        self._trigram_counts: Dict[str, int] = {}  # ISBN -> число триграмм названия
+        # ISBN -> проиндексированная книга. Для BookStore это представление, чьи поля меняются
+        # при правке, поэтому remove_book и replace_book снимают книгу по переданной копии
+        self._indexed: Dict[str, Book] = {}
+
+    def __len__(self) -> int:
+        return len(self._trigram_counts)
+
+    def __repr__(self) -> str:
+        return f"TitleIndex(книг: {len(self)}, слов: {len(self._token_index)}, триграмм: {len(self._trigram_index)})"
+
+    def add_book(self, book: Book) -> None:
+        """Добавление названия книги в индекс; прежнее название того же ISBN удаляется"""
+        old = self._indexed.get(book.isbn)
+        if old is not None:
+            self.remove_book(old)
+        for token in set(tokenize(book.title)):
+            if token not in self._token_index:
+                self._token_index[token] = {}
+                self._list_token(token)
+            self._token_index[token][book.isbn] = book
+
+        grams = trigrams(book.title)
+        for gram in grams:
+            if gram not in self._trigram_index:
+                self._trigram_index[gram] = {}
+            self._trigram_index[gram][book.isbn] = book
+        self._trigram_counts[book.isbn] = len(grams)
+        self._indexed[book.isbn] = book
+
+    def add_books(self, books: Iterable[Book]) -> None:
+        """Пакетное добавление: название разбирается один раз, новые слова сортируются один раз"""
+        # из повторов ISBN остаётся последняя книга; прежние названия удаляются до пакета
+        latest = {book.isbn: book for book in books}
+        for isbn in latest.keys() & self._indexed.keys():
+            self.remove_book(self._indexed[isbn])
+
+        token_index = self._token_index
+        trigram_index = self._trigram_index
+        trigram_counts = self._trigram_counts
+        indexed = self._indexed
+        new_tokens = set()
+
+        for book in latest.values():
+            isbn = book.isbn
+            grams = set()
+            for token in set(tokenize(book.title)):
+                bucket = token_index.get(token)
+                if bucket is None:
+                    bucket = token_index[token] = {}
+                    new_tokens.add(token)
+                bucket[isbn] = book
+                padded = f" {token} "
+                for i in range(len(padded) - 2):
+                    grams.add(padded[i:i + 3])
+
+            for gram in grams:
+                bucket = trigram_index.get(gram)
+                if bucket is None:
+                    bucket = trigram_index[gram] = {}
+                bucket[isbn] = book
+            trigram_counts[isbn] = len(grams)
+            indexed[isbn] = book
+
+        # слова, удалённые раньше, ещё лежат в основном списке
+        relisted = new_tokens & self._removed_tokens
+        if relisted:
+            self._removed_tokens -= relisted
+            new_tokens -= relisted
+        if new_tokens:
+            # отсортированные отрезки: sort сливает их за линейное время
+            self._tokens.extend(self._new_tokens)
+            self._tokens.extend(sorted(new_tokens))
+            self._tokens.sort()
+            self._new_tokens.clear()
+
+    def _list_token(self, token: str) -> None:
+        """Новое слово в списке для поиска по префиксу"""
+        if token in self._removed_tokens:
+            self._removed_tokens.discard(token)
+            return
+        insort(self._new_tokens, token)
+        if len(self._new_tokens) > max(256, isqrt(len(self._tokens))):
+            self._tokens.extend(self._new_tokens)
+            self._tokens.sort()
+            self._new_tokens.clear()
+
+    def _unlist_token(self, token: str) -> None:
+        position = bisect_left(self._new_tokens, token)
+        if position < len(self._new_tokens) and self._new_tokens[position] == token:
+            del self._new_tokens[position]
+            return
+        self._removed_tokens.add(token)
+        if len(self._removed_tokens) > len(self._tokens) // 2 + 256:
+            self._tokens = [token for token in self._tokens if token not in self._removed_tokens]
+            self._removed_tokens.clear()
+
+    def remove_book(self, book: Book) -> bool:
+        """Удаление названия книги из индекса"""
+        if self._indexed.pop(book.isbn, None) is None:
+            return False
+
+        for token in set(tokenize(book.title)):
+            bucket = self._token_index.get(token)
+            if bucket is not None:
+                bucket.pop(book.isbn, None)
+                if not bucket:
+                    del self._token_index[token]
+                    self._unlist_token(token)
+
+        for gram in trigrams(book.title):
+            bucket = self._trigram_index.get(gram)
+            if bucket is not None:
+                bucket.pop(book.isbn, None)
+                if not bucket:
+                    del self._trigram_index[gram]
+        del self._trigram_counts[book.isbn]
+        return True
+
+    def replace_book(self, old: Book, new: Book) -> None:
+        """Замена книги с тем же ISBN; при неизменном названии только обновляются ссылки"""
+        if old.title != new.title or new.isbn not in self._trigram_counts:
+            self.remove_book(old)
+            self.add_book(new)
+            return
+        self._indexed[new.isbn] = new
+        for token in set(tokenize(new.title)):
+            self._token_index[token][new.isbn] = new
+        for gram in trigrams(new.title):
+            self._trigram_index[gram][new.isbn] = new
+
+    def clear(self) -> None:
+        self._token_index.clear()
+        self._tokens.clear()
+        self._new_tokens.clear()
+        self._removed_tokens.clear()
+        self._trigram_index.clear()
+        self._trigram_counts.clear()
+        self._indexed.clear()
+
+    def _prefix_matches(self, prefix: str) -> Dict[str, Book]:
+        result: Dict[str, Book] = {}
+        for tokens in (self._tokens, self._new_tokens):
+            for i in range(bisect_left(tokens, prefix), len(tokens)):
+                token = tokens[i]
+                if not token.startswith(prefix):
+                    break
+                bucket = self._token_index.get(token)
+                if bucket is not None:
+                    result.update(bucket)
+        return result
+
+    def _match_tokens(self, tokens: List[str]) -> Dict[str, Book]:
+        """Книги, содержащие все слова запроса; последнее слово - префикс"""
+        postings = [self._token_index.get(token, {}) for token in tokens[:-1]]
+        postings.append(self._prefix_matches(tokens[-1]))
+        postings.sort(key=len)
+        result = dict(postings[0])
+        for bucket in postings[1:]:
+            if not result:
+                break
+            result = {isbn: book for isbn, book in result.items() if isbn in bucket}
+        return result
+
+    def search(self, query: str, k: Optional[int] = 10, fuzzy: bool = True) -> List[Book]:
+        """Топ-k книг по названию: сначала точные и префиксные совпадения, затем нечёткие
+
+        k=None - все подходящие книги в том же порядке.
+        """
+        tokens = tokenize(query)
+        if k is None:
+            k = len(self._trigram_counts)
+        if not tokens or k <= 0:
+            return []
+
+        # все слова запроса совпали, поэтому ближе те названия, где меньше лишних триграмм
+        matches = self._match_tokens(tokens)
+        ranked = heapq.nsmallest(k, matches.values(), key=lambda book: self._trigram_counts[book.isbn])
+        if len(ranked) >= k or not fuzzy:
+            return ranked
+
+        # нечёткий поиск: кандидаты с наибольшим числом общих триграмм
+        grams = trigrams(query)
+        common: Dict[str, int] = {}
+        books: Dict[str, Book] = {}
+        for gram in grams:
+            for isbn, book in self._trigram_index.get(gram, {}).items():
+                if isbn not in matches:
+                    common[isbn] = common.get(isbn, 0) + 1
+                    books[isbn] = book
+        # доля триграмм запроса, найденных в названии; при равенстве - более короткое название
+        candidates = [isbn for isbn, count in common.items() if count / len(grams) >= self.min_similarity]
+        best = heapq.nlargest(
+            k - len(ranked), candidates,
+            key=lambda isbn: (common[isbn], -self._trigram_counts[isbn]),
+        )
+        return ranked + [books[isbn] for isbn in best]
@@ -0,0 +1,332 @@
+import cProfile
+import collections
+import io
+import numbers
+import pstats
+import struct
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.Library.book import Book
+
+MAGIC = b"LIBTRC1\n"
+
+# коды операций входят в формат файла: новые операции добавляются только в конец
+OPS = (
+    "add_book", "add_books", "remove_book", "edit_book",
+    "search_books", "search_many", "search_by_title", "search_by_year_range", "search_by_decade",
+    "borrow_book", "return_book", "update_index", "rebuild_index", "get_random_book",
+    "set_loan_policy",
+)
+_OP_CODES = {name: code for code, name in enumerate(OPS)}
+
+HEAD = struct.Struct("<BBB")  # операция, позиционных аргументов, именованных аргументов
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+
+Call = Tuple[str, tuple, Dict[str, Any]]
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _materialize(value: Any) -> Any:
+    """Генераторы, множества и коллекции книг - в список: его можно и записать, и передать библиотеке"""
+    if isinstance(value, (str, bytes, list, tuple)) or not hasattr(value, "__iter__"):
+        return value
+    return list(value)
+
+
+class _Encoder:
+    """значения аргументов в байты; повторная строка записывается номером в таблице строк"""
+
+    def __init__(self):
+        self._strings: Dict[str, int] = {}
+        # строки текущего вызова: попадают в таблицу, только если вызов записан целиком
+        self._pending: Dict[str, int] = {}
+
+    def value(self, value: Any, out: List[bytes]) -> None:
+        if value is None:
+            out.append(b"N")
+        elif value is True or value is False:
+            out.append(b"T" if value else b"F")
+        elif isinstance(value, numbers.Integral):
+            # numpy.int64 и подобные - как int; числа шире 64 бит - байтами целиком
+            value = int(value)
+            if -2 ** 63 <= value < 2 ** 63:
+                out.append(b"i" + INT.pack(value))
+            else:
+                data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+                out.append(b"I" + _varint(len(data)) + data)
+        elif isinstance(value, numbers.Real):
+            out.append(b"f" + FLOAT.pack(float(value)))
+        elif isinstance(value, str):
+            code = self._strings.get(value, self._pending.get(value))
+            if code is not None:
+                out.append(b"r" + _varint(code))
+            else:
+                self._pending[value] = len(self._strings) + len(self._pending)
+                data = value.encode("utf-8")
+                out.append(b"s" + _varint(len(data)) + data)
+        elif isinstance(value, (list, tuple)):
+            out.append(b"L" + _varint(len(value)))
+            for item in value:
+                self.value(item, out)
+        elif all(hasattr(value, name) for name in ("title", "author", "year", "genre", "isbn")):
+            # Book и BookView записываются полями
+            out.append(b"k")
+            for item in (value.title, value.author, value.year, value.genre, value.isbn):
+                self.value(item, out)
+        else:
+            raise TypeError(f"Аргумент нельзя записать в трассу: {type(value).__name__}")
+
+    def call(self, op: str, args: tuple, kwargs: Dict[str, Any]) -> bytes:
+        out = [HEAD.pack(_OP_CODES[op], len(args), len(kwargs))]
+        try:
+            for value in args:
+                self.value(value, out)
+            for key, value in kwargs.items():
+                self.value(key, out)
+                self.value(value, out)
+            self._strings.update(self._pending)
+        finally:
+            self._pending.clear()
+        return b"".join(out)
+
+
+class _Decoder:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = len(MAGIC)
+        self._strings: List[str] = []
+
+    def _varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self._data[self._pos]
+            self._pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def value(self) -> Any:
+        tag = self._data[self._pos:self._pos + 1]
+        self._pos += 1
+        if tag == b"r":
+            return self._strings[self._varint()]
+        if tag == b"s":
+            size = self._varint()
+            text = self._data[self._pos:self._pos + size].decode("utf-8")
+            self._pos += size
+            self._strings.append(text)
+            return text
+        if tag == b"i":
+            (result,) = INT.unpack_from(self._data, self._pos)
+            self._pos += INT.size
+            return result
+        if tag == b"I":
+            size = self._varint()
+            result = int.from_bytes(self._data[self._pos:self._pos + size], "little", signed=True)
+            self._pos += size
+            return result
+        if tag == b"f":
+            (result,) = FLOAT.unpack_from(self._data, self._pos)
+            self._pos += FLOAT.size
+            return result
+        if tag == b"k":
+            return Book(*(self.value() for _ in range(5)))
+        if tag == b"L":
+            return [self.value() for _ in range(self._varint())]
+        if tag in (b"N", b"T", b"F"):
+            return {b"N": None, b"T": True, b"F": False}[tag]
+        raise ValueError(f"Повреждённая трасса: неизвестный тег {tag!r} в позиции {self._pos - 1}")
+
+    def calls(self) -> Iterator[Call]:
+        while self._pos < len(self._data):
+            code, nargs, nkwargs = HEAD.unpack_from(self._data, self._pos)
+            self._pos += HEAD.size
+            args = tuple(self.value() for _ in range(nargs))
+            kwargs = {}
+            for _ in range(nkwargs):
+                key = self.value()
+                kwargs[key] = self.value()
+            yield OPS[code], args, kwargs
+
+
+def read_trace(path: str) -> List[Call]:
+    """Все вызовы трассы: (операция, позиционные аргументы, именованные аргументы)"""
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} не является трассой библиотеки")
+    return list(_Decoder(data).calls())
+
+
+class TraceRecorder:
+    """запись операций библиотеки в двоичную трассу
+
+    attach подменяет операции из OPS на экземпляре библиотеки, как
+    enable_metrics. Пишутся только внешние вызовы: вызовы библиотеки изнутри
+    себя (например, поиск по названию из search_books) при воспроизведении
+    повторятся сами; вложенность считается для каждого потока отдельно.
+    Одноразовые аргументы (генераторы, множества) перед записью
+    собираются в список, и библиотека получает этот же список. Проверка
+    `book in library` не записывается. Запись не меняет поведения
+    библиотеки: вызов с аргументом, который нельзя записать, всё равно
+    выполняется, а в трассу не попадает и учитывается в skipped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC)
+        self._encoder = _Encoder()
+        self._lock = threading.Lock()  # запись вызова в файл целиком
+        self._local = threading.local()  # глубина вложенных вызовов в потоке
+        self._attached: List[Tuple[Any, List[str]]] = []
+        self.count = 0
+        self.skipped = 0
+
+    def __enter__(self) -> 'TraceRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, op: str, args: tuple, kwargs: Dict[str, Any]) -> bool:
+        """Запись вызова; False, если аргументы нельзя записать"""
+        with self._lock:
+            try:
+                data = self._encoder.call(op, args, kwargs)
+            except (TypeError, ValueError):
+                self.skipped += 1
+                return False
+            self._file.write(data)
+            self.count += 1
+        return True
+
+    def _recording(self, op: str, method: Callable) -> Callable:
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            if depth == 0:
+                args = tuple(map(_materialize, args))
+                kwargs = {key: _materialize(value) for key, value in kwargs.items()}
+                self.record(op, args, kwargs)
+            local.depth = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                local.depth = depth
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def attach(self, library: Any) -> Any:
+        """Запись всех операций библиотеки; возвращает её же"""
+        names = [op for op in OPS if hasattr(library, op)]
+        for op in names:
+            setattr(library, op, self._recording(op, getattr(library, op)))
+        self._attached.append((library, names))
+        return library
+
+    def close(self) -> None:
+        """Снятие обёрток и закрытие файла"""
+        for library, names in self._attached:
+            for op in names:
+                library.__dict__.pop(op, None)
+        self._attached.clear()
+        if not self._file.closed:
+            self._file.close()
+
+
+@dataclass
+class ReplayReport:
+    """результат воспроизведения трассы"""
+    calls: int = 0
+    seconds: float = 0.0
+    errors: int = 0
+    operations: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    profile: Optional[str] = None  # отчёт cProfile или tracemalloc
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        lines = [f"{self.calls} вызовов за {self.seconds:.3f} с ({self.calls_per_second:.0f} выз/с), "
+                 f"ошибок: {self.errors}"]
+        for op, row in sorted(self.operations.items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"  {op:22} {row['calls']:>8} выз  {row['total_ms']:10.1f} мс  "
+                         f"p50 {row['p50_us']:9.1f} мкс  p99 {row['p99_us']:9.1f} мкс")
+        if self.profile:
+            lines.append(self.profile)
+        return "\n".join(lines)
+
+
+def replay(calls: List[Call], library: Any, profile: Optional[str] = None, top: int = 15) -> ReplayReport:
+    """Воспроизведение трассы с наибольшей скоростью
+
+    profile: None, "cprofile" или "tracemalloc". Ленивые результаты
+    (диапазоны годов) перебираются до конца, чтобы замерить всю работу.
+    Исключения считаются и не прерывают воспроизведение.
+    """
+    timings: Dict[str, List[float]] = collections.defaultdict(list)
+    methods = {op: getattr(library, op) for op in OPS if hasattr(library, op)}
+    clock = time.perf_counter
+    errors = 0
+
+    profiler = cProfile.Profile() if profile == "cprofile" else None
+    if profile == "tracemalloc":
+        tracemalloc.start()
+    elif profiler is not None:
+        profiler.enable()
+
+    started = clock()
+    for op, args, kwargs in calls:
+        start = clock()
+        try:
+            result = methods[op](*args, **kwargs)
+            if hasattr(result, "__next__"):
+                collections.deque(result, maxlen=0)
+        except Exception:
+            errors += 1
+        timings[op].append(clock() - start)
+    seconds = clock() - started
+
+    report_text = None
+    if profiler is not None:
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        report_text = stream.getvalue()
+    elif profile == "tracemalloc":
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"память: сейчас {current / 2 ** 20:.1f} МБ, пик {peak / 2 ** 20:.1f} МБ"]
+        lines += [f"  {stat}" for stat in snapshot.statistics("lineno")[:top]]
+        report_text = "\n".join(lines)
+
+    operations = {}
+    for op, samples in timings.items():
+        samples.sort()
+        operations[op] = {
+            "calls": len(samples),
+            "total_ms": sum(samples) * 1000,
+            "p50_us": samples[len(samples) // 2] * 1e6,
+            "p99_us": samples[min(len(samples) - 1, len(samples) * 99 // 100)] * 1e6,
+        }
+    return ReplayReport(len(calls), seconds, errors, operations, report_text)
@@ -0,0 +1,239 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Optional, List, Iterator, Tuple
+
+from src.Library.book import Book
+from src.Library.library import Library
+from src.Library.snapshot import CatalogSnapshot
+
+OPS = ("add", "remove", "edit", "borrow", "return")
+
+# длина полезной нагрузки и её CRC32; нагрузка - номер записи, код операции и строки
+FRAME = struct.Struct("<II")
+RECORD = struct.Struct("<QB")
+FIELD = struct.Struct("<H")
+
+
+def _encode(lsn: int, op: str, fields: Tuple[str, ...]) -> bytes:
+    parts = [RECORD.pack(lsn, OPS.index(op))]
+    for value in fields:
+        data = value.encode("utf-8")
+        parts.append(FIELD.pack(len(data)))
+        parts.append(data)
+    payload = b"".join(parts)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _scan(path: str) -> Iterator[Tuple[int, int, str, List[str]]]:
+    """Записи журнала (конец записи, номер, операция, поля) до первой повреждённой"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        data = file.read()
+    position = 0
+    while position + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, position)
+        start = position + FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return  # недописанный хвост после сбоя
+        lsn, op = RECORD.unpack_from(payload)
+        fields = []
+        offset = RECORD.size
+        while offset < length:
+            (size,) = FIELD.unpack_from(payload, offset)
+            offset += FIELD.size
+            fields.append(payload[offset:offset + size].decode("utf-8"))
+            offset += size
+        position = start + length
+        yield position, lsn, OPS[op], fields
+
+
+def read_log(path: str) -> Iterator[Tuple[int, str, List[str]]]:
+    """Корректные записи журнала: (номер, операция, поля)"""
+    for _, lsn, op, fields in _scan(path):
+        yield lsn, op, fields
+
+
+class WriteAheadLog:
+    """журнал изменений библиотеки с групповой записью
+
+    Записи копятся в буфере и сбрасываются на диск пачками по group_size,
+    но не позже чем через max_delay секунд после первой несброшенной записи:
+    это делает фоновый поток. max_delay=None отключает сброс по времени, тогда
+    записи меньше пачки ждут commit. fsync=False оставляет сброс на
+    усмотрение ОС.
+    """
+
+    def __init__(self, path: str, group_size: int = 64, fsync: bool = True,
+                 max_delay: Optional[float] = 0.005):
+        self.path = path
+        self.group_size = group_size
+        self.fsync = fsync
+        self.max_delay = max_delay
+        self.lsn = 0
+        valid_length = 0
+        for end, lsn, _, _ in _scan(path):
+            valid_length, self.lsn = end, lsn
+        self._file = open(path, "ab")
+        # отрезаем недописанный хвост, иначе новые записи окажутся за мусором
+        if self._file.tell() != valid_length:
+            self._file.truncate(valid_length)
+        self._buffer = bytearray()
+        self._pending = 0
+        self._oldest = 0.0  # время первой несброшенной записи
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        if max_delay is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, name=f"wal-flush {path}", daemon=True)
+            self._flusher.start()
+
+    def __repr__(self) -> str:
+        return f"WriteAheadLog(path='{self.path}', lsn={self.lsn}, pending={self._pending})"
+
+    def __enter__(self) -> 'WriteAheadLog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(self, op: str, *fields: str) -> int:
+        """Добавление записи; возвращает её номер"""
+        with self._lock:
+            self.lsn += 1
+            lsn = self.lsn
+            if not self._pending:
+                self._oldest = time.monotonic()
+                self._flushed.notify()
+            self._buffer += _encode(lsn, op, fields)
+            self._pending += 1
+            if self._pending >= self.group_size:
+                self._write()
+        return lsn
+
+    def _flush_loop(self) -> None:
+        """Фоновый сброс записей, ждущих дольше max_delay"""
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._flushed.wait()
+                    continue
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._flushed.wait(remaining)
+                else:
+                    self._write()
+
+    def commit(self) -> None:
+        """Сброс накопленных записей на диск"""
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        if not self._buffer:
+            return
+        self._file.write(self._buffer)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._buffer.clear()
+        self._pending = 0
+
+    def truncate(self, upto: Optional[int] = None) -> None:
+        """Очистка журнала после сохранения снимка; нумерация записей продолжается
+
+        upto - номер последней записи, учтённой в снимке: более поздние
+        записи остаются в журнале. Без upto журнал очищается целиком.
+        """
+        with self._lock:
+            self._write()
+            tail = b""
+            if upto is not None:
+                start = 0
+                for end, lsn, _, _ in _scan(self.path):
+                    if lsn > upto:
+                        with open(self.path, "rb") as file:
+                            file.seek(start)
+                            tail = file.read()
+                        break
+                    start = end
+            self._file.truncate(0)
+            self._file.write(tail)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._flushed.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.commit()
+        self._file.close()
+
+
+def apply_record(library: Library, op: str, fields: List[str]) -> None:
+    """Повтор одной записи журнала"""
+    if op == "add":
+        title, author, year, genre, isbn = fields
+        library.add_book(Book(title, author, int(year), genre, isbn))
+    elif op == "edit":
+        title, author, year, genre, isbn = fields
+        library.edit_book(isbn, title=title, author=author, year=int(year), genre=genre)
+    elif op == "remove":
+        library.remove_book(fields[0])
+    elif op == "borrow":
+        due = float(fields[2]) if len(fields) > 2 else None
+        library.borrow_book(fields[0], fields[1], due)
+    elif op == "return":
+        library.return_book(fields[0])
+
+
+def checkpoint(library: Library, snapshot_path: str) -> None:
+    """Сжатие журнала: состояние сохраняется в снимок, журнал очищается
+
+    Из журнала удаляются только записи, учтённые в снимке: изменения,
+    сделанные другими потоками после сохранения, остаются.
+    """
+    library.save(snapshot_path)
+    if library._wal is not None:
+        snapshot = CatalogSnapshot(snapshot_path)
+        lsn = snapshot.lsn
+        snapshot.close()
+        library._wal.truncate(lsn)
+
+
+def recover(snapshot_path: str, wal_path: str, name: Optional[str] = None,
+            group_size: int = 64, fsync: bool = True, max_delay: Optional[float] = 0.005) -> Library:
+    """Восстановление: последний снимок плюс записи журнала, которых в нём нет
+
+    name задаёт имя восстановленной библиотеки; по умолчанию - имя из
+    снимка или "Библиотека", если снимка нет. К восстановленной библиотеке
+    подключается журнал wal_path.
+    """
+    base_lsn = 0
+    if os.path.exists(snapshot_path):
+        snapshot = CatalogSnapshot(snapshot_path)
+        base_lsn = snapshot.lsn
+        snapshot.close()
+        library = Library.load(snapshot_path)
+        if name is not None:
+            library.name = name
+    else:
+        library = Library(name if name is not None else "Библиотека")
+
+    for lsn, op, fields in read_log(wal_path):
+        if lsn > base_lsn:
+            apply_record(library, op, fields)
+    library.update_index()
+
+    wal = WriteAheadLog(wal_path, group_size, fsync, max_delay)
+    wal.lsn = max(wal.lsn, base_lsn)
+    library.attach_wal(wal)
+    return library
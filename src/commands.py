@@ -0,0 +1,75 @@
+import shlex
+from typing import List, Tuple, Callable, Dict
+
+from src.Library.library import Library
+from src.Library.book import Book
+
+Result = Tuple[bool, str]
+
+
+def _add(library: Library, args: List[str]) -> Result:
+    if len(args) != 5:
+        return False, "Not enough arguments"
+    title, author, year, genre, isbn = args
+    if not year.lstrip("-").isdigit():
+        return False, f"Год должен быть числом: {year}"
+    book = Book(title, author, int(year), genre, isbn)
+    if book in library:
+        return False, f"Попытка добавить существующую книгу: {book.title}"
+    library.add_book(book)
+    return True, f"Добавлена новая книга: {book}"
+
+
+def _remove(library: Library, args: List[str]) -> Result:
+    if len(args) != 1:
+        return False, "Использование: remove <isbn>"
+    if library.remove_book(args[0]):
+        return True, f"Удалена книга с ISBN {args[0]}"
+    return False, f"Книга с ISBN {args[0]} не найдена"
+
+
+def _search(library: Library, args: List[str]) -> Result:
+    if not args:
+        return False, "Использование: search <автор|год|жанр|название>"
+    results = library.search_books(" ".join(args))
+    return True, f"Найдено {len(results)} книг" + "".join(f"; {book.isbn} {book}" for book in results)
+
+
+def _borrow(library: Library, args: List[str]) -> Result:
+    if len(args) != 2:
+        return False, "Использование: borrow <isbn> <читатель>"
+    isbn, reader = args
+    if library.borrow_book(isbn, reader):
+        return True, f"Книга {isbn} выдана читателю {reader}"
+    return False, f"Книга {isbn} не может быть выдана"
+
+
+def _return(library: Library, args: List[str]) -> Result:
+    if len(args) != 1:
+        return False, "Использование: return <isbn>"
+    if library.return_book(args[0]):
+        return True, f"Книга с ISBN {args[0]} возвращена в библиотеку"
+    return False, f"Книга с ISBN {args[0]} не выдавалась"
+
+
+COMMANDS: Dict[str, Callable[[Library, List[str]], Result]] = {
+    "add": _add,
+    "remove": _remove,
+    "search": _search,
+    "borrow": _borrow,
+    "return": _return,
+}
+
+
+def execute(library: Library, line: str) -> Result:
+    """Выполнение текстовой команды; аргументы с пробелами берутся в кавычки"""
+    try:
+        parts = shlex.split(line)
+    except ValueError as e:
+        return False, f"Ошибка разбора команды: {e}"
+    if not parts:
+        return False, "Пустая команда"
+    handler = COMMANDS.get(parts[0])
+    if handler is None:
+        return False, f"Неизвестная команда: {parts[0]}"
+    return handler(library, parts[1:])
@@ -0,0 +1,192 @@
+"""Нагрузочный генератор на событиях симуляции
+
+Те же события, что в run_simulation, но без печати, с весами событий и
+каталогом заданного размера. Каждый сид выполняется в отдельном процессе
+пула и полностью воспроизводим: одинаковый сид даёт ту же
+последовательность операций и тот же итоговый отпечаток каталога.
+Отчёт в JSON: операций в секунду и перцентили задержек по каждому событию.
+
+Запуск: python -m src.loadgen --seeds 8 --steps 100000 --catalog 10000 \\
+    [--weights search_books=5,borrow_book=2] [--workers 4] [--out report.json]
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from src.Library.library import Library
+from src.samples import READERS, synthetic_books
+from src.simulation import EVENTS
+
+PERCENTILES = (50, 90, 99)
+FAKE_ISBN = "000-0-00-000000-0"
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """Разбор строки вида "search_books=5,borrow_book=2" """
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        event, _, value = item.partition("=")
+        if event not in EVENTS:
+            raise ValueError(f"Неизвестное событие: {event}")
+        weights[event] = float(value)
+    return weights
+
+
+def percentiles(samples: List[int]) -> Dict[str, float]:
+    """Перцентили задержек в микросекундах по выборке в наносекундах"""
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    result: Dict[str, float] = {"count": len(samples)}
+    for p in PERCENTILES:
+        rank = min(len(samples) - 1, len(samples) * p // 100)
+        result[f"p{p}_us"] = round(samples[rank] / 1000, 2)
+    result["max_us"] = round(samples[-1] / 1000, 2)
+    return result
+
+
+def fingerprint(library: Library) -> int:
+    """Контрольная сумма состава каталога и выдач для сравнения прогонов"""
+    state = "\n".join(sorted(book.isbn for book in library._books))
+    state += "\n" + "\n".join(f"{isbn}={reader}" for isbn, reader in sorted(library._borrowed_books.items()))
+    return zlib.crc32(state.encode("utf-8"))
+
+
+def run_seed(seed: int, steps: int, catalog: int = 1000,
+             weights: Optional[Dict[str, float]] = None) -> dict:
+    """Прогон одного сида; задержки возвращаются сырыми, в наносекундах"""
+    weights = weights or {}
+    rng = random.Random(seed)
+    random.seed(seed)  # get_random_book пользуется модулем random
+    events = [event for event in EVENTS if weights.get(event, 1) > 0]
+    cumulative = []
+    total = 0.0
+    for event in events:
+        total += weights.get(event, 1)
+        cumulative.append(total)
+
+    pool = synthetic_books(2 * catalog, seed)
+    authors = sorted({book.author for book in pool})
+    genres = sorted({book.genre for book in pool})
+    years = sorted({book.year for book in pool})
+    library = Library("Нагрузочный тест")
+    library.add_books(pool[:catalog])
+
+    latencies: Dict[str, List[int]] = {event: [] for event in events}
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for event in rng.choices(events, cum_weights=cumulative, k=steps):
+        if event == "add_book":
+            book = rng.choice(pool)
+            began = clock()
+            if book not in library:
+                library.add_book(book)
+        elif event == "remove_book":
+            began = clock()
+            book = library.get_random_book()
+            if book:
+                library.remove_book(book.isbn)
+        elif event == "search_books":
+            kind = rng.randrange(3)
+            query = (rng.choice(authors) if kind == 0 else
+                     rng.choice(genres) if kind == 1 else str(rng.choice(years)))
+            began = clock()
+            library.search_books(query)
+        elif event == "update_index":
+            began = clock()
+            library.update_index()
+        elif event == "borrow_book":
+            reader = rng.choice(READERS)
+            began = clock()
+            book = library.get_random_book()
+            if book:
+                library.borrow_book(book.isbn, reader)
+        elif event == "return_book":
+            # выбор идёт до замера: список ключей не относится к операции
+            isbn = rng.choice(list(library._borrowed_books)) if library._borrowed_books else None
+            began = clock()
+            if isbn is not None:
+                library.return_book(isbn)
+        else:  # check_nonexistent
+            began = clock()
+            library.search_books(FAKE_ISBN)
+        latencies[event].append(clock() - began)
+    seconds = time.perf_counter() - start
+
+    return {
+        "seed": seed,
+        "steps": steps,
+        "seconds": seconds,
+        "books": len(library),
+        "borrowed": len(library._borrowed_books),
+        "fingerprint": fingerprint(library),
+        "latencies": latencies,
+    }
+
+
+def _run_seed(args: tuple) -> dict:
+    return run_seed(*args)
+
+
+def run(seeds: Sequence[int], steps: int, catalog: int = 1000,
+        weights: Optional[Dict[str, float]] = None, workers: Optional[int] = None) -> dict:
+    """Прогон нескольких сидов в пуле процессов и сводный отчёт
+
+    workers=1 выполняет всё в текущем процессе.
+    """
+    tasks = [(seed, steps, catalog, weights) for seed in seeds]
+    start = time.perf_counter()
+    if workers == 1:
+        runs = [_run_seed(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(_run_seed, tasks))
+    wall = time.perf_counter() - start
+
+    merged: Dict[str, List[int]] = {}
+    per_seed = []
+    for result in runs:
+        latencies = result.pop("latencies")
+        for event, samples in latencies.items():
+            merged.setdefault(event, []).extend(samples)
+        result["ops_per_sec"] = round(steps / result["seconds"], 1) if result["seconds"] else None
+        result["events"] = {event: percentiles(samples) for event, samples in latencies.items()}
+        per_seed.append(result)
+
+    return {
+        "config": {"seeds": list(seeds), "steps": steps, "catalog": catalog,
+                   "weights": {event: (weights or {}).get(event, 1) for event in EVENTS}},
+        "wall_seconds": round(wall, 3),
+        "ops_per_sec": round(steps * len(tasks) / wall, 1) if wall else None,
+        "events": {event: percentiles(samples) for event, samples in merged.items()},
+        "seeds": per_seed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный генератор библиотеки")
+    parser.add_argument("--seeds", type=int, default=4, help="количество сидов, начиная с --first-seed")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=100_000, help="событий на сид")
+    parser.add_argument("--catalog", type=int, default=10_000, help="начальный размер каталога")
+    parser.add_argument("--weights", default="", help="веса событий: search_books=5,borrow_book=2")
+    parser.add_argument("--workers", type=int, default=None, help="процессов в пуле")
+    parser.add_argument("--out", help="файл для отчёта; по умолчанию stdout")
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    report = run(seeds, args.steps, args.catalog, parse_weights(args.weights), args.workers)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
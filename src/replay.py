@@ -0,0 +1,69 @@
+"""Запись трассы симуляции и воспроизведение её на любой реализации библиотеки
+
+record выполняет run_simulation с заданным сидом без вывода на экран и
+записывает все операции библиотеки в двоичную трассу. replay
+воспроизводит трассу без генератора случайных чисел и печати, при желании
+под cProfile или tracemalloc, и печатает время по каждой операции.
+
+Запуск: python -m src.replay record sim.trace --seed 20 --steps 100000
+        python -m src.replay replay sim.trace [--library concurrent] [--profile cprofile]
+"""
+import argparse
+import contextlib
+import io
+from typing import Callable, Dict
+
+from src.Library.concurrent import ConcurrentLibrary
+from src.Library.library import Library
+from src.Library.sharded import ShardedLibrary
+from src.Library.store import BookStore
+from src.Library.trace import TraceRecorder, read_trace, replay
+from src.simulation import run_simulation
+
+LIBRARIES: Dict[str, Callable[[], object]] = {
+    "library": lambda: Library("Воспроизведение"),
+    "store": lambda: Library("Воспроизведение", BookStore()),
+    "concurrent": lambda: ConcurrentLibrary("Воспроизведение"),
+    "sharded": lambda: ShardedLibrary("Воспроизведение"),
+    "sharded-processes": lambda: ShardedLibrary("Воспроизведение", processes=True),
+}
+
+
+def record(path: str, seed: int, steps: int) -> int:
+    """Трасса run_simulation; возвращает число записанных вызовов"""
+    with TraceRecorder(path) as recorder:
+        library = recorder.attach(Library("Центральная городская библиотека"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_simulation(seed, steps, library)
+    return recorder.count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("trace")
+    record_parser.add_argument("--seed", type=int, default=20)
+    record_parser.add_argument("--steps", type=int, default=10_000)
+    replay_parser = commands.add_parser("replay")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--library", choices=sorted(LIBRARIES), default="library")
+    replay_parser.add_argument("--profile", choices=("cprofile", "tracemalloc"))
+    replay_parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        print(f"Записано вызовов: {record(args.trace, args.seed, args.steps)} в {args.trace}")
+        return
+
+    calls = read_trace(args.trace)
+    library = LIBRARIES[args.library]()
+    try:
+        print(replay(calls, library, args.profile, args.top))
+    finally:
+        if hasattr(library, "close"):
+            library.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import random
+from typing import List
+
 from src.Library.book import Book
 
 SAMPLE_BOOKS = [
@@ -17,3 +20,21 @@ AUTHORS = ["Михаил Булгаков", "Фёдор Достоевский",
 GENRES = ["Роман", "Антиутопия", "Фэнтези", "Детектив", "Сказка"]
 YEARS = [66, 1892, 1936, 1949, 1967, 1997]
 READERS = ["Иванов И.И.", "Петров П.П.", "Сидорова С.С.", "Кузнецов А.В.", "Морозова О.Л."]
+
+
+def synthetic_books(n: int, seed: int = 0, first: int = 0) -> List[Book]:
+    """Синтетический каталог из n книг по образцу SAMPLE_BOOKS
+
+    Названия и жанры берутся из образцов, авторов примерно по одному на
+    двадцать книг, годы от 1800 до 2023. ISBN уникальны и зависят только от
+    номера книги, поэтому first позволяет получить следующую партию без
+    пересечений с уже выданными.
+    """
+    rng = random.Random(seed)
+    authors = AUTHORS + [f"Автор {k}" for k in range(max(1, n // 20))]
+    books = []
+    for i in range(first, first + n):
+        sample = rng.choice(SAMPLE_BOOKS)
+        books.append(Book(f"{sample.title} {i}", rng.choice(authors), rng.randint(1800, 2023),
+                          rng.choice(GENRES), f"978-5-{i:09d}"))
+    return books
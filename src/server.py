@@ -0,0 +1,85 @@
+"""Сетевой сервер библиотеки на asyncio
+
+Протокол строковый: клиент шлёт команды терминала (add, remove, search,
+borrow, return), по одной на строку, и может отправлять их пачкой, не дожидаясь
+ответов. На каждую команду приходит одна строка "OK <текст>" или "ERR <текст>"
+в том же порядке. Команда q закрывает соединение.
+
+Запуск: python -m src.server --port 7070 [--snapshot catalog.snap]
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+from src.Library.library import Library
+from src.commands import execute
+
+MAX_LINE = 1 << 16
+
+
+def respond(library: Library, line: str) -> str:
+    try:
+        ok, message = execute(library, line)
+    except Exception as e:
+        # непредвиденная ошибка команды не должна рвать соединение и остальные ответы пачки
+        ok, message = False, f"Внутренняя ошибка: {type(e).__name__}: {e}"
+    return f"{'OK' if ok else 'ERR'} {message.replace(chr(10), ' ')}\n"
+
+
+async def handle_client(library: Library, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Обслуживание соединения: все пришедшие команды выполняются и отвечаются одной записью"""
+    buffer = b""
+    try:
+        while True:
+            chunk = await reader.read(MAX_LINE)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            if len(buffer) > MAX_LINE:
+                writer.write("ERR Слишком длинная строка\n".encode("utf-8"))
+                break
+
+            responses = []
+            closing = False
+            for raw in lines:
+                line = raw.decode("utf-8", errors="replace").strip()
+                if line == "q":
+                    closing = True
+                    break
+                if line:
+                    responses.append(respond(library, line))
+            writer.write("".join(responses).encode("utf-8"))
+            await writer.drain()
+            if closing:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(library: Library, host: str = "127.0.0.1", port: int = 7070) -> asyncio.AbstractServer:
+    """Запуск сервера; библиотека общая для всех клиентов"""
+    return await asyncio.start_server(lambda r, w: handle_client(library, r, w), host, port)
+
+
+async def main(host: str, port: int, snapshot: Optional[str]) -> None:
+    library = Library.load(snapshot) if snapshot else Library("Центральная городская библиотека")
+    server = await serve(library, host, port)
+    print(f"Сервер библиотеки '{library.name}' слушает {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сетевой сервер библиотеки")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    parser.add_argument("--snapshot", help="снимок каталога для загрузки")
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.snapshot))
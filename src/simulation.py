@@ -2,12 +2,23 @@ import random
 from src.Library.library import Library
 from src.samples import SAMPLE_BOOKS, AUTHORS, YEARS, READERS, GENRES
 
-def run_simulation(seed: int = 20, steps: int  | None = None) -> None:
+EVENTS = (
+    "add_book",
+    "remove_book",
+    "search_books",
+    "update_index",
+    "borrow_book",
+    "return_book",
+    "check_nonexistent",
+)
+
+def run_simulation(seed: int = 20, steps: int  | None = None, library: Library | None = None) -> None:
     if not seed is None:
         random.seed(seed)
 
     print(random.choice(SAMPLE_BOOKS))
-    library = Library("Центральная городская библиотека")
+    if library is None:
+        library = Library("Центральная городская библиотека")
 
     for n in range(9):
         book = random.choice(SAMPLE_BOOKS)
@@ -18,15 +29,7 @@ def run_simulation(seed: int = 20, steps: int  | None = None) -> None:
     while step < steps:
         print(f"\nШАГ {step}")
 
-        event = random.choice([
-            "add_book",
-            "remove_book",
-            "search_books",
-            "update_index",
-            "borrow_book",
-            "return_book",
-            "check_nonexistent"
-        ])
+        event = random.choice(EVENTS)
 
         print(event)
 
@@ -1,7 +1,30 @@
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+
 import pytest
 from src.Library.index import IndexDict
 from src.Library.book import Book, BookCollection
 from src.Library.library import Library, DigitalLibrary
+from src.Library.store import BookStore
+from src.Library.text_index import TitleIndex
+from src.Library.importer import import_catalog
+from src.Library.cache import QueryCache
+from src.Library.loans import DAY, LoanRegistry
+from src.Library.concurrent import ConcurrentLibrary
+from src.Library.sharded import ShardedLibrary
+from src.Library.isbn import isbn_key, is_valid_isbn, parse_isbn
+from src.Library.bloom import BloomFilter
+from src.Library.trace import TraceRecorder, read_trace, replay
+from src.Library.wal import WriteAheadLog, checkpoint, read_log, recover
+from src.samples import SAMPLE_BOOKS, synthetic_books
+from src.commands import execute
+from src.server import serve
+from src.loadgen import run, parse_weights, fingerprint
+from src.simulation import run_simulation
+from benchmarks.suite import compare, slope
 
 def test_book_creation():
     book = Book("Test Book", "Test Author", 2023, "Test Genre", "123-456-789")
@@ -66,6 +89,30 @@ def test_book_collection_iteration():
     assert slice_result[0] == books[1]
 
 
+def test_book_collection_hash_backed():
+    books = [Book(f"Book {i}", "Author", 2000 + i, "Genre", str(i)) for i in range(6)]
+    collection = BookCollection(books)
+
+    # удаление из середины сохраняет порядок
+    assert collection.remove(books[1]) is True
+    assert collection.remove(books[3]) is True
+    assert [book.isbn for book in collection] == ["0", "2", "4", "5"]
+    assert collection[1] == books[2]
+    assert collection[-1] == books[5]
+    assert len(collection[1:]) == 3
+
+    # принадлежность проверяется по ISBN и содержимому
+    assert books[1] not in collection
+    assert Book("Other", "Author", 2000, "Genre", "0") not in collection
+
+    # повторное добавление того же ISBN не создаёт дубликат
+    collection.add(books[0])
+    assert len(collection) == 4
+
+    for _ in range(20):
+        assert collection.get_random_book() in collection
+
+
 def test_book_collection_filter():
     book1 = Book("Book 1", "Author A", 2021, "Fiction", "111")
     book2 = Book("Book 2", "Author A", 2022, "Non-Fiction", "222")
@@ -138,6 +185,70 @@ def test_index_dict_remove():
     assert result is False
 
 
+def test_index_dict_genre():
+    book1 = Book("Book 1", "Author A", 2021, "Fiction", "111")
+    book2 = Book("Book 2", "Author B", 2022, "Fiction", "222")
+
+    index = IndexDict()
+    index.add_book(book1)
+    index.add_book(book2)
+
+    assert index.search_by_genre("Fiction") == [book1, book2]
+    assert index.search_by_genre("Poetry") == []
+
+    index.remove_book("111")
+    assert index.search_by_genre("Fiction") == [book2]
+
+    index.remove_book("222")
+    assert index.search_by_genre("Fiction") == []
+
+    index.add_book(book1)
+    index.clear()
+    assert index.search_by_genre("Fiction") == []
+
+
+def test_index_dict_year_range():
+    books = [
+        Book("Book 1", "Author A", 1949, "Fiction", "111"),
+        Book("Book 2", "Author B", 1936, "Fiction", "222"),
+        Book("Book 3", "Author C", 1967, "Fiction", "333"),
+        Book("Book 4", "Author D", 1936, "Fiction", "444"),
+    ]
+    index = IndexDict()
+    for book in books:
+        index.add_book(book)
+
+    assert list(index.search_by_year_range(1930, 1950)) == [books[1], books[3], books[0]]
+    assert list(index.search_by_year_range(1950, 1960)) == []
+    assert list(index.search_by_decade(1965)) == [books[2]]
+
+    index.remove_book("222")
+    index.remove_book("444")
+    assert list(index.search_by_decade(1930)) == []
+    assert index._year_keys == [1949, 1967]
+
+
+def test_index_dict_remove_without_scan():
+    class Unequal(Book):
+        __slots__ = ()
+
+        def __eq__(self, other):
+            raise AssertionError("удаление не должно сравнивать книги")
+
+    index = IndexDict()
+    books = [Unequal(f"Book {i}", "Author", 1936, "Roman", str(i)) for i in range(1000)]
+    for book in books:
+        index.add_book(book)
+
+    # корзины - словари ISBN -> книга, удаление убирает один ключ без обхода
+    for bucket in (index._author_index["Author"], index._year_index[1936], index._genre_index["Roman"]):
+        assert type(bucket) is dict and list(bucket) == [book.isbn for book in books]
+    assert index.remove_book("500")
+    for bucket in (index._author_index["Author"], index._year_index[1936], index._genre_index["Roman"]):
+        assert "500" not in bucket and len(bucket) == 999
+    assert list(index._author_index["Author"])[499:501] == ["499", "501"]
+
+
 def test_index_dict_iteration():
     books = [
         Book("Book 1", "Author 1", 2021, "Genre 1", "111"),
@@ -154,6 +265,64 @@ def test_index_dict_iteration():
     assert "222" in isbns
     assert len(isbns) == 2
 
+
+def test_title_index_search():
+    index = TitleIndex()
+    for book in SAMPLE_BOOKS:
+        index.add_book(book)
+
+    # повторное добавление ISBN заменяет прежнее название
+    index.add_book(Book("Старое название", "Автор", 2000, "Роман", "111"))
+    index.add_book(Book("Новое название", "Автор", 2000, "Роман", "111"))
+    index.add_books([Book("Другое название", "Автор", 2000, "Роман", "111")])
+    assert index.search("Старое", fuzzy=False) == index.search("Новое", fuzzy=False) == []
+    assert [book.title for book in index.search("Другое")] == ["Другое название"]
+    assert index.remove_book(Book("Другое название", "Автор", 2000, "Роман", "111"))
+    assert len(index) == len(SAMPLE_BOOKS)
+
+    # префикс последнего слова и регистр
+    assert [book.isbn for book in index.search("мастер и марг")] == ["978-5-17-067840-4"]
+    # ё и е не различаются
+    assert [book.isbn for book in index.search("Унесенные")] == ["978-5-389-05863-9"]
+    # опечатки
+    assert [book.isbn for book in index.search("Гари Потер", k=1)] == ["978-5-389-07435-6"]
+    assert index.search("Гари Потер", fuzzy=False) == []
+    assert index.search("zzz") == []
+
+    index.remove_book(SAMPLE_BOOKS[0])
+    assert index.search("Мастер") == []
+    assert len(index) == len(SAMPLE_BOOKS) - 1
+
+    # поиск по названию в search_books не обрезается до k, как и остальные ветки
+    library = Library("Test Library")
+    library.add_books(Book(f"Сказки, том {i}", f"Автор {i}", 1900 + i, "Проза", str(i)) for i in range(25))
+    assert len(library.search_by_title("сказки")) == 10
+    assert len(library.search_books("сказки")) == 25
+    assert [len(result) for result in library.search_many(["сказки", "том 1"])] == [25, 11]
+
+
+def test_title_index_token_churn():
+    index = TitleIndex()
+    books = [Book(f"Слово{i:04d}", "Author", 2000, "Genre", str(i)) for i in range(2000)]
+    for book in books:
+        index.add_book(book)
+    # удаление и повторное добавление слов проходит через отложенные списки
+    for book in books[::2]:
+        index.remove_book(book)
+    for book in books[:100:2]:
+        index.add_book(book)
+
+    expected = {book.isbn for book in books[1::2]} | {book.isbn for book in books[:100:2]}
+    assert {book.isbn for book in index.search("слово", k=None, fuzzy=False)} == expected
+    assert [book.isbn for book in index.search("слово0050", fuzzy=False)] == ["50"]
+    assert index.search("слово0102", fuzzy=False) == []
+    assert [book.isbn for book in index.search("слово01", k=None, fuzzy=False)] == \
+        [book.isbn for book in books[101:200:2]]
+    edited = Book("Слово0051", "Другой", 1999, "Genre", "51")
+    index.replace_book(books[51], edited)
+    assert index.search("слово0051", fuzzy=False)[0] is edited
+
+
 def test_library_creation():
     library = Library("Test Library")
 
@@ -208,11 +377,133 @@ def test_library_search():
     assert len(results) == 2
     assert all(book.year == 2021 for book in results)
 
+    # Поиск по диапазону лет
+    assert [book.year for book in library.search_by_year_range(2021, 2022)] == [2021, 2021, 2022]
+    assert len(list(library.search_by_decade(2020))) == 3
+
+    # Поиск по названию
+    results = library.search_books("Book")
+    assert len(results) == 3
+    assert len(library.search_by_title("Bok 2", k=1)) == 1
+
     # Поиск несуществующего
     results = library.search_books("NonExistent")
     assert len(results) == 0
 
 
+def test_library_add_books():
+    library = Library("Test Library")
+    library.add_book(Book("Book 1", "Author A", 2021, "Fiction", "111"))
+
+    added = library.add_books([
+        Book("Book 1", "Author A", 2021, "Fiction", "111"),
+        Book("Book 2", "Author A", 2022, "Non-Fiction", "222"),
+        Book("Book 3", "Author B", 1990, "Fiction", "333"),
+        Book("Book 3 copy", "Author B", 1990, "Fiction", "333"),
+    ])
+
+    assert added == 2
+    assert len(library) == 3
+    assert len(library.search_books("Author A")) == 2
+    assert [book.year for book in library.search_by_year_range(1900, 2100)] == [1990, 2021, 2022]
+    assert library._index.search_by_isbn("333").title == "Book 3"
+
+
+def test_import_catalog(tmp_path):
+    csv_path = tmp_path / "feed.csv"
+    csv_path.write_text(
+        "title,author,year,genre,isbn\n"
+        "Book 1,Author A,2021,Fiction,111\n"
+        "Book 2,Author A,not a year,Fiction,222\n"
+        "Book 3,Author B,2022,,333\n"
+        "Book 1,Author A,2021,Fiction,111\n",
+        encoding="utf-8",
+    )
+    jsonl_path = tmp_path / "feed.jsonl"
+    jsonl_path.write_text(
+        '{"title": "Book 4", "author": "Author C", "year": 1999, "genre": "Poetry", "isbn": "444"}\n'
+        '{"title": "Book 5", "author": "Author C", "year": 99999, "genre": "Poetry", "isbn": "555"}\n'
+        "{broken\n",
+        encoding="utf-8",
+    )
+
+    library = Library("Test Library")
+    report = import_catalog(library, str(csv_path), batch_size=2)
+    assert (report.rows, report.added, report.duplicates, report.rejected) == (4, 1, 1, 2)
+    assert len(report.errors) == 2
+
+    report = import_catalog(library, str(jsonl_path))
+    assert (report.rows, report.added, report.rejected) == (3, 1, 2)
+    assert len(library) == 2
+    assert report.rows_per_second > 0
+
+
+def test_library_query_builder():
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+
+    novels = library.query().genre("Роман")
+    assert len(list(novels)) == 5
+
+    query = novels.year_between(1930, 1970)
+    assert sorted(book.year for book in query) == [1936, 1936, 1967]
+
+    query = novels.year_between(1930, 1940)
+    assert query.explain().splitlines() == ["обход индекса year=1930..1940 (~2)", "фильтр genre='Роман' (~5)"]
+    assert [book.title for book in query] == ["Три товарища", "Унесённые ветром"]
+
+    # самый избирательный индекс выбирается первым
+    query = novels.author("Михаил Булгаков").year_between(1900, 2000)
+    assert query.explain().splitlines()[0] == "обход индекса author='Михаил Булгаков' (~1)"
+    assert [book.title for book in query] == ["Мастер и Маргарита"]
+
+    assert len(query.collect()) == 1
+    assert len(list(library.query().limit(3))) == 3
+    assert list(library.query().author("Лев Толстой").genre("Сказка")) == []
+    assert "ограничение 2" in novels.limit(2).explain()
+
+
+def test_library_query_cache():
+    library = Library("Test Library")
+    library.add_books([
+        Book("Book 1", "Author A", 2021, "Fiction", "111"),
+        Book("Book 2", "Author A", 2022, "Non-Fiction", "222"),
+    ])
+    cache = library.enable_cache(max_entries=2)
+
+    first = library.search_books("Author A")
+    assert library("Author A") is first
+    assert cache.stats().hits == 1
+
+    # изменение каталога делает запись устаревшей
+    library.add_book(Book("Book 3", "Author A", 2023, "Fiction", "333"))
+    assert len(library.search_books("Author A")) == 3
+    library.remove_book("111")
+    assert len(library.search_books("Author A")) == 2
+    assert cache.stats().stale == 2
+
+    library.search_books("Fiction")
+    library.search_books("2022")
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.entries == 2
+
+
+def test_query_cache_ttl_and_budget():
+    cache = QueryCache(ttl=0)
+    cache.put("a", 1, "value")
+    assert cache.get("a", 1) is None
+
+    cache = QueryCache(max_bytes=100)
+    cache.put("a", 1, "value", size=60)
+    cache.put("b", 1, "value", size=60)
+    assert cache.get("a", 1) is None
+    assert cache.get("b", 1) == "value"
+    cache.put("c", 1, "value", size=1000)
+    assert len(cache) == 1
+    assert cache.get("b", 2) is None
+
+
 def test_library_borrow_return():
     library = Library("Test Library")
     book = Book("Test Book", "Test Author", 2023, "Test", "123")
@@ -239,6 +530,47 @@ def test_library_borrow_return():
     assert result is False
 
 
+def test_library_loans():
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    library.set_loan_policy(loan_days=14, max_per_reader=2)
+    isbns = [book.isbn for book in SAMPLE_BOOKS]
+
+    assert library.borrow_book(isbns[0], "Reader 1", due=300.0) is True
+    assert library.borrow_book(isbns[1], "Reader 1", due=100.0) is True
+    # лимит читателя
+    assert library.borrow_book(isbns[2], "Reader 1") is False
+    assert library.borrow_book(isbns[2], "Reader 2", due=200.0) is True
+    assert library.borrow_book(isbns[3], "Reader 2") is True
+
+    assert [loan.isbn for loan in library.loans_of("Reader 1")] == isbns[:2]
+    assert library._borrowed_books[isbns[2]] == "Reader 2"
+
+    assert [loan.isbn for loan in library.overdue_loans(now=250.0)] == [isbns[1], isbns[2]]
+    assert [loan.isbn for loan in library.overdue_loans(n=1, now=1000.0)] == [isbns[1]]
+
+    assert library.return_book(isbns[1]) is True
+    assert library.remove_book(isbns[2]) is True
+    assert [loan.isbn for loan in library.overdue_loans(now=1000.0)] == [isbns[0]]
+    assert library.loans_of("Reader 2")[0].due > 14 * DAY
+    assert library.borrow_book(isbns[4], "Reader 1") is True
+
+
+def test_loan_registry_renew():
+    registry = LoanRegistry(loan_period=10, clock=lambda: 0.0)
+    registry.borrow("111", "Reader 1")
+    registry.borrow("222", "Reader 1", due=5)
+    assert [loan.isbn for loan in registry.overdue(now=10)] == ["222", "111"]
+
+    registry.renew("222", due=50)
+    assert [loan.isbn for loan in registry.overdue(now=10)] == ["111"]
+
+    # повторная выдача с тем же сроком не дублирует запись
+    registry.return_loan("111")
+    registry.borrow("111", "Reader 2")
+    assert [loan.isbn for loan in registry.overdue(now=100)] == ["111", "222"]
+
+
 def test_library_update_index():
     library = Library("Test Library")
 
@@ -261,6 +593,842 @@ def test_library_update_index():
     results = library.search_books("Author A")
     assert len(results) == 1
 
+
+def test_library_on_book_store():
+    library = Library("Store Library", BookStore())
+    books = [
+        Book("Book 1", "Author A", 2021, "Fiction", "111"),
+        Book("Book 2", "Author A", 2022, "Non-Fiction", "222"),
+        Book("Book 3", "Author B", 2021, "Fiction", "333"),
+    ]
+    for book in books:
+        library.add_book(book)
+
+    assert len(library) == 3
+    assert books[0] in library
+    assert list(library.search_books("Author A")) == books[:2]
+    assert len(library.search_books("2021")) == 2
+    assert library.get_random_book() in library
+
+    assert library.remove_book("111") is True
+    assert books[0] not in library
+    assert list(library.search_books("Fiction")) == [books[2]]
+    assert library._books[0].to_book() == books[1]
+
+    # годы хранятся в array('h'): выход за диапазон - ValueError без изменения хранилища
+    with pytest.raises(ValueError):
+        library.add_book(Book("Book 4", "Author C", 40000, "Fiction", "444"))
+    assert len(library) == 2 and library._books.get("444") is None
+    with pytest.raises(ValueError):
+        library.add_books([Book("Book 5", "Author C", 2020, "Fiction", "555"),
+                           Book("Book 6", "Author C", -40000, "Fiction", "666")])
+    assert len(library) == 3 and library.check_index() == []
+
+
+def test_book_store_removed_views(capsys):
+    library = Library("Store Library", BookStore())
+    library.add_books(SAMPLE_BOOKS)
+    view = library.get_random_book()
+    isbn = view.isbn
+    assert library.remove_book(isbn) is True
+    # представление удалённой книги хранит её поля
+    assert view.to_book() in SAMPLE_BOOKS and str(view)
+    library.add_book(Book("Новая книга", "Новый автор", 2020, "Роман", isbn))
+    assert view.title != "Новая книга"
+    assert library._books.get(isbn).title == "Новая книга"
+
+    # симуляция печатает удалённые книги
+    run_simulation(3, 300, Library("Store Library", BookStore()))
+    assert "Удалена книга" in capsys.readouterr().out
+
+
+def test_book_store_memory():
+    def per_book(factory, library: bool) -> float:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        collection = Library("Memory", factory()) if library else factory()
+        add = collection.add_book if library else collection.add
+        for i in range(20_000):
+            add(Book(f"Title {i}", f"Author {i % 500}", 1900 + i % 120, f"Genre {i % 20}", f"978-{i:09d}"))
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        assert len(collection) == 20_000
+        return used / 20_000
+
+    assert per_book(BookStore, False) < per_book(BookCollection, False) * 0.7
+    # индексы библиотеки держат по одному лёгкому BookView на книгу, экономия хранилища сохраняется
+    # (основную часть памяти библиотеки занимает индекс названий, он одинаков в обоих случаях)
+    assert per_book(BookStore, True) < per_book(BookCollection, True) - 100
+
+
+@pytest.mark.parametrize("collection", [BookCollection, BookStore])
+def test_library_incremental_update_index(collection):
+    library = Library("Test Library", collection())
+    library.add_books([
+        Book("Book 1", "Author A", 2021, "Fiction", "111"),
+        Book("Book 2", "Author B", 2022, "Non-Fiction", "222"),
+        Book("Book 3", "Author B", 2023, "Fiction", "333"),
+    ])
+
+    assert library.edit_book("111", author="Author C", year=1999) is True
+    assert library.edit_book("999", author="Author C") is False
+    assert library.check_index()
+
+    library.update_index(verify=True)
+    assert library.check_index() == []
+    assert [book.isbn for book in library.search_books("Author C")] == ["111"]
+    assert len(library.search_books("Author A")) == 0
+    assert len(library.search_books("1999")) == 1
+
+    # удаление книги с неприменёнными изменениями
+    library.edit_book("222", genre="Poetry")
+    assert library.remove_book("222") is True
+    assert len(library.search_books("Author B")) == 1
+    assert library.check_index() == []
+
+    # расхождение находится без перестройки
+    del library._index._genre_index["Fiction"]["333"]
+    assert len(library.check_index()) == 1
+    with pytest.raises(RuntimeError):
+        library.update_index(verify=True)
+    library.rebuild_index()
+    assert library.check_index() == []
+
+    # книга с известным ISBN заменяет прежнюю и в индексах
+    library.add_book(Book("Book 4", "Author D", 2000, "Drama", "333"))
+    assert len(library.search_books("Author B")) == 0 and len(library.search_books("2023")) == 0
+    assert [book.title for book in library.search_books("Book 4")] == ["Book 4"]
+    assert len(library.search_books("Book 3")) == 0
+    assert library.check_index() == []
+
+    # записи под прежними полями тоже находятся
+    library._index._author_index.setdefault("Author B", {})["333"] = library._books.get("333")
+    assert len(library.check_index()) == 1
+
+
+def test_library_save_load(tmp_path):
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    library.borrow_book("978-5-389-08251-1", "Reader 1")
+    path = str(tmp_path / "catalog.snap")
+    library.save(path)
+
+    loaded = Library.load(path)
+    assert loaded.name == "Test Library"
+    assert len(loaded) == len(SAMPLE_BOOKS)
+    assert loaded._borrowed_books == {"978-5-389-08251-1": "Reader 1"}
+    assert SAMPLE_BOOKS[2] in loaded
+    assert list(loaded.search_books("Роман")) == list(library.search_books("Роман"))
+    assert list(loaded.search_books("1936")) == list(library.search_books("1936"))
+    assert list(loaded.search_by_year_range(1900, 1950)) == list(library.search_by_year_range(1900, 1950))
+    assert len(loaded.search_books("Нет такого автора")) == 0
+    # индексы ещё не загружены в память
+    assert loaded._index._snapshot is not None
+
+    # снимок незагруженной библиотеки содержит те же корзины индексов
+    resaved = str(tmp_path / "resaved.snap")
+    loaded.save(resaved)
+    reloaded = Library.load(resaved)
+    for query in ("Роман", "Лев Толстой", "1936"):
+        assert list(reloaded.search_books(query)) == list(library.search_books(query))
+    assert len(reloaded.search_books("Роман")) == 5
+
+    # изменение загружает снимок целиком
+    assert loaded.remove_book("978-5-17-067840-4") is True
+    loaded.add_book(Book("Book 1", "Author A", 2021, "Fiction", "111"))
+    assert loaded._index._snapshot is None
+    assert len(loaded) == len(SAMPLE_BOOKS)
+    assert loaded.check_index() == []
+    assert len(loaded.search_by_title("мастер")) == 0
+
+
+def test_library_save_load_wide_years(tmp_path):
+    library = Library("Test Library")
+    books = [Book("Далёкое будущее", "Автор", 40000, "Фантастика", "111"),
+             Book("Древность", "Автор", -40000, "История", "222")]
+    library.add_books(books)
+    path = str(tmp_path / "catalog.snap")
+    library.save(path)
+    loaded = Library.load(path)
+    assert list(loaded.search_books("40000")) == books[:1]
+    assert list(loaded.search_by_year_range(-50000, 50000)) == books[::-1]
+    pytest.importorskip("numpy")
+    assert loaded.analytics().count_by_decade() == {-40000: 1, 40000: 1}
+
+
+def test_library_save_load_keeps_due_dates(tmp_path):
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    now = time.time()
+    library.borrow_book("978-5-389-08251-1", "Reader 1", due=now - DAY)
+    library.borrow_book("978-5-17-067840-4", "Reader 2", due=now + 7 * DAY)
+    path = str(tmp_path / "catalog.snap")
+    library.save(path)
+
+    loaded = Library.load(path)
+    overdue = loaded.overdue_loans()
+    assert [(loan.isbn, loan.reader, loan.due) for loan in overdue] == [("978-5-389-08251-1", "Reader 1", now - DAY)]
+    assert loaded._loans.get("978-5-17-067840-4").due == now + 7 * DAY
+    original = library._loans.get("978-5-389-08251-1")
+    assert loaded._loans.get("978-5-389-08251-1").borrowed_at == original.borrowed_at
+
+
+def test_library_wal_recovery(tmp_path):
+    wal_path = str(tmp_path / "library.wal")
+    snapshot_path = str(tmp_path / "library.snap")
+
+    library = Library("Test Library")
+    library.attach_wal(WriteAheadLog(wal_path, group_size=2))
+    library.add_books(SAMPLE_BOOKS[:3])
+    library.borrow_book(isbn="978-5-17-067840-4", reader="Reader 1")
+    checkpoint(library, snapshot_path)
+
+    library.remove_book("978-5-389-08251-1")
+    library.edit_book("978-5-04-105947-1", year=1866)
+    library.add_book(Book("Book 1", "Author A", 2021, "Fiction", "111"))
+    library.borrow_book(isbn="111", reader="Reader 2")
+    library._wal.commit()
+    assert [op for _, op, _ in read_log(wal_path)] == ["remove", "edit", "add", "borrow"]
+
+    # недописанная запись после сбоя игнорируется
+    with open(wal_path, "ab") as file:
+        file.write(b"\x20\x00\x00\x00garbage")
+
+    recovered = recover(snapshot_path, wal_path)
+    assert len(recovered) == len(library)
+    assert recovered._borrowed_books == library._borrowed_books
+    assert [book.year for book in recovered.search_books("Фёдор Достоевский")] == [1866]
+    assert recovered.check_index() == []
+
+    # журнал продолжается после восстановления
+    recovered.return_book("111")
+    recovered._wal.close()
+    restored = recover(snapshot_path, wal_path)
+    assert restored._borrowed_books == {"978-5-17-067840-4": "Reader 1"}
+    assert restored.name == "Test Library"
+    # снимок восстановленной без новых записей библиотеки сохраняет индексы
+    checkpoint(restored, snapshot_path)
+    restored._wal.close()
+    again = recover(snapshot_path, wal_path, name="Филиал")
+    assert again.name == "Филиал"
+    assert len(again.search_books("Фёдор Достоевский")) == 1 and len(again.search_books("Fiction")) == 1
+    again._wal.close()
+
+
+def test_wal_checkpoint_keeps_later_records(tmp_path):
+    wal_path = str(tmp_path / "library.wal")
+    snapshot_path = str(tmp_path / "library.snap")
+    library = ConcurrentLibrary("Test Library")
+    library.attach_wal(WriteAheadLog(wal_path, group_size=1))
+    library.add_books(SAMPLE_BOOKS[:3])
+
+    # запись другого потока между сохранением снимка и очисткой журнала
+    save = library.save
+
+    def save_then_add(path):
+        save(path)
+        library.add_book(Book("Book 1", "Author A", 2021, "Fiction", "111"))
+
+    library.save = save_then_add
+    checkpoint(library, snapshot_path)
+    assert [op for _, op, _ in read_log(wal_path)] == ["add"]
+    library._wal.close()
+    recovered = recover(snapshot_path, wal_path)
+    assert len(recovered) == 4 and recovered.check_index() == []
+    recovered._wal.close()
+
+
+def test_wal_flushes_within_max_delay(tmp_path):
+    path = str(tmp_path / "delay.wal")
+    wal = WriteAheadLog(path, group_size=64, max_delay=0.01)
+    start = time.monotonic()
+    wal.append("return", "111")
+    while not list(read_log(path)) and time.monotonic() - start < 5:
+        time.sleep(0.001)
+    elapsed = time.monotonic() - start
+    # неполная пачка попадает на диск без commit; запас на медленную машину
+    assert list(read_log(path)) == [(1, "return", ["111"])]
+    assert elapsed < 0.5
+    wal.close()
+
+    # без сброса по времени неполная пачка ждёт commit
+    wal = WriteAheadLog(path, group_size=64, max_delay=None)
+    wal.append("return", "222")
+    time.sleep(0.05)
+    assert len(list(read_log(path))) == 1
+    wal.close()
+    assert len(list(read_log(path))) == 2
+
+
+def run_threads(target, threads: int) -> None:
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        pool = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize("threads", [1, 8, 32])
+def test_concurrent_library_stress(threads):
+    library = ConcurrentLibrary("Test Library")
+    library.add_books(Book(f"Book {i}", f"Author {i % 10}", 2000 + i % 5, "Fiction", str(i))
+                      for i in range(50))
+    borrowed = [0] * threads
+    returned = [0] * threads
+
+    def worker(n: int) -> None:
+        for i in range(300):
+            isbn = str((n + i) % 60)
+            borrowed[n] += library.borrow_book(isbn, f"Reader {n}")
+            library.search_books(f"Author {i % 10}")
+            if i % 3 == 0:
+                returned[n] += library.return_book(isbn)
+            if i % 50 == 0:
+                library.add_book(Book(f"New {n}-{i}", "Author X", 2020, "Poetry", f"{n}-{i}"))
+                library.remove_book(f"{n}-{i}")
+
+    run_threads(worker, threads)
+    # каждая выдача учтена ровно один раз
+    assert sum(borrowed) - sum(returned) == len(library._borrowed_books) == len(library._loans)
+    assert all(isbn in library._index for isbn in library._borrowed_books)
+    assert library.check_index() == []
+    assert len(library) == 50
+
+
+def test_digital_library_concurrent_borrow():
+    dlib = DigitalLibrary("Digital Test")
+    dlib.add_digital_copy(Book("E-Book", "E-Author", 2023, "E-Genre", "123"), copies=100)
+    results = [0] * 16
+
+    def worker(n: int) -> None:
+        for _ in range(20):
+            results[n] += dlib.borrow_book("123", f"Reader {n}")
+
+    run_threads(worker, 16)
+    assert sum(results) == 100
+    assert dlib._digital_copies["123"] == 0
+
+
+def test_benchmark_compare():
+    assert slope({1000: 1.0, 1_000_000: 1.0}) == 0
+    assert round(slope({1000: 1.0, 1_000_000: 1000.0}), 6) == 1
+    baseline = {
+        "search_author": {"median_us": {"1000": 2.0, "1000000": 2.0}, "slope": 0.0},
+        "add_remove": {"median_us": {"1000": 20.0, "1000000": 30.0}, "slope": 0.06},
+    }
+    same = {
+        "search_author": {"median_us": {"1000": 2.2, "1000000": 2.1}, "slope": 0.01},
+        "add_remove": {"median_us": {"1000": 21.0, "1000000": 29.0}, "slope": 0.05},
+        "new_operation": {"median_us": {"1000": 5.0}, "slope": 0.9},
+    }
+    assert compare(same, baseline, 1.5, 0.25) == []
+
+    slower = {
+        "search_author": {"median_us": {"1000": 2.0, "1000000": 200.0}, "slope": 0.67},
+        "add_remove": {"median_us": {"1000": 40.0, "1000000": 30.0}, "slope": 0.0},
+    }
+    problems = compare(slower, baseline, 1.5, 0.25)
+    assert len(problems) == 3
+    assert problems[0].startswith("search_author: сложность")
+    assert "search_author при 1000000" in problems[1] and "add_remove при 1000" in problems[2]
+
+
+def test_library_metrics():
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    assert library.stats() == {}
+
+    seen = []
+    library.enable_metrics([lambda name, seconds, size: seen.append((name, size))])
+    library.search_books("Лев Толстой")
+    library.search_books("Роман")
+    library.search_books("1936")
+    library.search_books("Мастер")
+    library.borrow_book(SAMPLE_BOOKS[0].isbn, "Reader")
+
+    stats = library.stats()
+    assert stats["search_books"]["calls"] == 4
+    assert stats["search_books"]["sizes"]["max"] == 5
+    for branch in ("author", "genre", "year", "title"):
+        assert stats[f"search_books.{branch}"]["calls"] == 1
+    assert stats["index.search_by_author"]["calls"] == 4
+    assert stats["borrow_book"]["sizes"] == {"count": 0}
+    assert ("borrow_book", None) in seen and ("search_books.genre", 5) in seen
+
+    # после замены индекса обёртки метрик ставятся заново
+    library._index = IndexDict()
+    library.rebuild_index()
+    library.search_books("Лев Толстой")
+    assert library.stats()["index.search_by_author"]["calls"] == 5
+    assert library.search_books("Лев Толстой")
+
+    library.disable_metrics()
+    assert "search_books" not in vars(library)
+    assert "search_by_author" not in vars(library._index)
+    library.search_books("Роман")
+    assert library.stats() == {}
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_sharded_library_matches_library(processes):
+    books = synthetic_books(2000)
+    library = Library("Test Library")
+    library.add_books(books)
+    with ShardedLibrary("Sharded", shards=3, processes=processes) as sharded:
+        assert sharded.add_books(books) == 2000
+        assert len(sharded) == 2000
+        assert {sharded.shard_of(book.isbn) for book in books} == {0, 1, 2}
+
+        for query in (books[0].author, "Роман", str(books[1].year), books[1999].title, "нет такой книги"):
+            assert sorted(b.isbn for b in sharded.search_books(query)) == \
+                sorted(b.isbn for b in library.search_books(query))
+        typo = books[1999].title[:2] + books[1999].title[3:]  # пропущена буква
+        assert [b.isbn for b in sharded.search_by_title(typo, k=1)] == [books[1999].isbn]
+        years = [book.year for book in sharded.search_by_year_range(1900, 1950)]
+        assert years == sorted(years) == [book.year for book in library.search_by_year_range(1900, 1950)]
+
+        isbn = books[0].isbn
+        assert sharded.borrow_book(isbn, "Reader") is True
+        assert sharded.borrow_book(isbn, "Other") is False
+        assert [loan.isbn for loan in sharded.loans_of("Reader")] == [isbn]
+        assert sharded.return_book(isbn) is True
+        assert sharded.edit_book(isbn, year=1111) is True
+        sharded.update_index()
+        assert [b.isbn for b in sharded.search_books("1111")] == [isbn]
+        assert sharded.remove_book(isbn) is True
+        assert books[0] not in sharded and books[1] in sharded
+        assert sharded.get_book(books[1].isbn) == books[1]
+        assert sharded.check_index() == []
+
+        # тот же публичный API, что у Library: вызов и сложение
+        assert sorted(b.isbn for b in sharded(books[1].author)) == \
+            sorted(b.isbn for b in library(books[1].author))
+        sharded + books[0]
+        assert books[0] in sharded
+        other = ConcurrentLibrary("Другая")
+        other.add_books([Book("Новая", "Автор", 2001, "Роман", "777"), Book("Другое", "Автор", 1999, "Роман", books[1].isbn)])
+        other.borrow_book("777", "Reader")
+        borrowed_at = other._loans.get("777").borrowed_at - 100
+        other._loans.get("777").borrowed_at = borrowed_at
+        assert sharded + other is sharded
+        assert sharded.get_book("777").title == "Новая" and sharded.get_book(books[1].isbn).title == books[1].title
+        assert [(loan.isbn, loan.borrowed_at) for loan in sharded.loans_of("Reader")] == [("777", borrowed_at)]
+        with pytest.raises(ValueError):
+            sharded.merge(other, conflict="error")
+        assert [b.isbn for b in sharded.merge(other, conflict="theirs").changed[0]] == [books[1].isbn] * 2
+        assert sharded.get_book(books[1].isbn).title == "Другое"
+        with ShardedLibrary("Ещё", shards=2, processes=processes) as more:
+            more + sharded
+            assert len(more) == len(sharded) and [loan.isbn for loan in more.loans_of("Reader")] == ["777"]
+        with pytest.raises(TypeError):
+            sharded + 1
+
+
+def test_library_analytics():
+    pytest.importorskip("numpy")
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    library.borrow_book(SAMPLE_BOOKS[0].isbn, "Reader")
+    analytics = library.analytics()
+
+    assert analytics.count_by_genre()["Роман"] == 5
+    assert analytics.count_by_decade()[1930] == 2
+    assert analytics.year_histogram(1930, 1949, step=10) == {1930: 2, 1940: 2}
+    assert analytics.loan_ratio_by_genre()["Роман"] == pytest.approx(0.2)
+
+    # отчёты обновляются вместе с каталогом
+    library.add_book(Book("Idiot", "Фёдор Достоевский", 1869, "Роман", "111"))
+    library.remove_book(SAMPLE_BOOKS[0].isbn)
+    library.borrow_book("111", "Reader")
+    library.edit_book(SAMPLE_BOOKS[1].isbn, genre="Детектив")
+    assert analytics.count_by_genre()["Роман"] == 5
+    library.update_index()
+    assert analytics.count_by_genre() == {
+        "Роман": 4, "Антиутопия": 1, "Роман-эпопея": 1, "Фэнтези": 1, "Сказка": 1, "Детектив": 2}
+    assert analytics.top_authors(1) == [("Фёдор Достоевский", 2)]
+    assert analytics.borrowed_count() == 1 and analytics.borrowed_count("Роман") == 1
+    library.return_book("111")
+    assert analytics.loan_ratio_by_genre()["Роман"] == 0.0
+    assert len(analytics) == len(library) == 10
+
+    # полученная ссылка остаётся рабочей после полной перестройки индексов
+    library.edit_book(SAMPLE_BOOKS[2].isbn, genre="Детектив")
+    library.borrow_book("111", "Reader")
+    library.rebuild_index()
+    assert library.analytics() is analytics
+    assert analytics.count_by_genre()["Детектив"] == 3 and "Антиутопия" not in analytics.count_by_genre()
+    assert analytics.borrowed_count() == 1
+    library.remove_book("111")
+    assert len(analytics) == len(library) == 9
+
+
+def test_isbn_parsing():
+    assert parse_isbn("978-0-306-40615-7") == parse_isbn("9780306406157") == 9780306406157
+    assert parse_isbn("0-306-40615-2") == 9780306406157  # ISBN-10 переводится в ISBN-13
+    assert parse_isbn("0-8044-2957-X") == 9780804429573
+    assert is_valid_isbn("978-0-306-40615-8") is False
+    assert is_valid_isbn("978-0-306-4061") is False
+    assert isbn_key("111") == "111"
+    with pytest.raises(ValueError):
+        parse_isbn("978-0-306-40615-A")
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    bloom.update(range(10_000))
+    assert all(key in bloom for key in range(10_000))
+    false_positives = sum(key in bloom for key in range(10_000, 60_000))
+    assert false_positives < 50_000 * 0.02
+    assert not bloom.overfull
+    bloom.add("978-5-17-067840-4")
+    assert "978-5-17-067840-4" in bloom and bloom.overfull
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_sharded_library_shard_error(processes):
+    books = synthetic_books(30)
+    with ShardedLibrary("Sharded", shards=3, processes=processes) as sharded:
+        sharded.add_books(books[:1])
+        # в пустых шардах книги с номером 0 нет: ошибка поднимается после ответов всех шардов
+        with pytest.raises(IndexError):
+            sharded._gather("_books.__getitem__", 0)
+        assert len(sharded) == 1
+        assert sharded.add_books(books[1:]) == 29
+        assert sharded.get_book(books[5].isbn) == books[5]
+        assert len(sharded) == 30
+
+
+def test_sharded_library_isbn_filter():
+    with ShardedLibrary("Sharded", shards=2) as sharded:
+        sharded.add_books(synthetic_books(3000))
+        calls = []
+        for shard in sharded._shards:
+            submit = shard.submit
+            shard.submit = lambda *args, submit=submit: calls.append(args) or submit(*args)
+        assert sharded.get_book("000-0-00-000000-0") is None
+        assert sharded.borrow_book("000-0-00-000000-0", "Reader") is False
+        assert calls == []
+        assert sharded.get_book("978-5-000000042") is not None
+
+        # удалённые ISBN остаются в фильтре, пока удалений не станет много
+        for i in range(1600):
+            assert sharded.remove_book(f"978-5-{i:09d}")
+        assert sharded._removed < 1600
+        assert sharded.get_book("978-5-000000042") is None
+        assert len(sharded) == 1400
+
+    # шард выбирается по тому же ключу, что и в фильтре
+    with ShardedLibrary("Sharded", shards=16) as sharded:
+        spellings = ("978-0-306-40615-7", "9780306406157", "0-306-40615-2")
+        assert len({sharded.shard_of(isbn) for isbn in spellings}) == 1
+
+
+def test_search_many_matches_search_books():
+    library = Library("Test Library")
+    library.add_books(SAMPLE_BOOKS)
+    queries = ["Лев Толстой", "1936", "Роман", SAMPLE_BOOKS[2].isbn, "Мастер", "1936",
+               "нет такой книги", "2050", "Лев Толстой"]
+
+    results = library.search_many(queries)
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        assert list(result) == list(library.search_books(query))
+    assert results[1] is results[5] and results[0] is results[8]
+    assert results[3] == (SAMPLE_BOOKS[2],)
+    assert results[6] == results[7] == ()
+
+
+def test_trace_record_replay(tmp_path, capsys):
+    path = str(tmp_path / "sim.trace")
+    with TraceRecorder(path) as recorder:
+        recorded = recorder.attach(Library("Запись"))
+        run_simulation(5, 300, recorded)
+        recorded.edit_book(recorded.get_random_book().isbn, title="Новое название")
+        list(recorded.search_by_year_range(1800, 1900))
+    capsys.readouterr()
+    assert "search_books" not in recorded.__dict__
+
+    calls = read_trace(path)
+    assert len(calls) == recorder.count
+    assert calls[-2][0] == "edit_book" and calls[-2][2] == {"title": "Новое название"}
+    # вложенные вызовы (поиск по названию из search_books) не записываются
+    assert all(op != "search_by_title" for op, _, _ in calls)
+
+    for target in (Library("Воспроизведение"), ConcurrentLibrary("Воспроизведение")):
+        report = replay(calls, target)
+        assert report.calls == len(calls) and report.errors == 0
+        assert sum(row["calls"] for row in report.operations.values()) == len(calls)
+        assert fingerprint(target) == fingerprint(recorded)
+
+    report = replay(calls, Library("Профиль"), profile="cprofile", top=5)
+    assert "search_books" in report.profile
+    report = replay(calls, Library("Память"), profile="tracemalloc", top=5)
+    assert report.profile.startswith("память")
+
+
+def test_trace_recorder_arguments(tmp_path):
+    path = str(tmp_path / "args.trace")
+    books = synthetic_books(20)
+    with TraceRecorder(path) as recorder:
+        library = recorder.attach(ConcurrentLibrary("Запись"))
+        # генератор и множество собираются в список и для записи, и для библиотеки
+        assert library.add_books(book for book in books[:10]) == 10
+        assert len(library.search_many({books[0].author, "Роман"})) == 2
+
+        # неудачная запись не оставляет строк в таблице
+        assert recorder.record("search_books", ("Новый запрос", object()), {}) is False
+        library.search_books("Новый запрос")
+
+        # вложенность вызовов считается в каждом потоке отдельно
+        def worker():
+            for book in books[10:]:
+                library.add_book(book)
+                library.search_books(book.title)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    calls = read_trace(path)
+    assert len(calls) == recorder.count == 3 + 4 * 20
+    assert calls[0][0] == "add_books" and calls[0][1] == (books[:10],)
+    assert calls[2] == ("search_books", ("Новый запрос",), {})
+    assert all(op in ("add_book", "search_books") for op, _, _ in calls[3:])
+    target = Library("Воспроизведение")
+    assert replay(calls, target).errors == 0
+    assert fingerprint(target) == fingerprint(library)
+
+
+def test_trace_recorder_unusual_arguments(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "numbers.trace")
+    books = synthetic_books(10)
+    library = Library("Запись")
+    library.add_books(books)
+    with TraceRecorder(path) as recorder:
+        recorder.attach(library)
+        # числа numpy и целые шире 64 бит записываются, а не ломают вызов
+        assert library.edit_book(books[0].isbn, year=np.int64(1999)) is True
+        expected = [b.isbn for b in library.search_by_year_range(1999, 3000)]
+        assert [b.isbn for b in library.search_by_year_range(np.int32(1999), 2 ** 70)] == expected
+        library.borrow_book(books[1].isbn, "Reader", np.float32(2.5))
+        # аргумент, который нельзя записать: вызов выполняется, запись пропускается
+        library.add_book(Book("Новая", "Автор", 2000, "Роман", "777"))
+        library.edit_book("777", title=b"bytes")
+    assert recorder.count == 5 and recorder.skipped == 1
+    assert library._books.get("777").title == b"bytes"
+
+    calls = read_trace(path)
+    assert calls[0] == ("edit_book", (books[0].isbn,), {"year": 1999})
+    assert calls[2] == ("search_by_year_range", (1999, 2 ** 70), {})
+    assert calls[3] == ("borrow_book", (books[1].isbn, "Reader", 2.5), {})
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_library_merge_diff(store):
+    books = synthetic_books(300)
+    central = Library("Центральная", BookStore() if store else None)
+    central.add_books(books[:200])
+    branch = Library("Филиал")
+    branch.add_books(books[100:])
+    edited = books[150]
+    branch.edit_book(edited.isbn, title="Новое название")
+    central.borrow_book(books[10].isbn, "Иванов")
+    central.borrow_book(edited.isbn, "Иванов")
+    branch.borrow_book(edited.isbn, "Петров")
+    branch.borrow_book(books[250].isbn, "Петров", due=123.0)
+
+    diff = central.diff(branch)
+    assert {b.isbn for b in diff.added} == {b.isbn for b in books[200:]}
+    assert {b.isbn for b in diff.removed} == {b.isbn for b in books[:100]}
+    assert [(ours.title, theirs.title) for ours, theirs in diff.changed] == [(edited.title, "Новое название")]
+
+    with pytest.raises(ValueError):
+        central.merge(branch, conflict="error")
+    assert len(central) == 200
+
+    merged = central.merge(branch)
+    assert len(merged.added) == 100 and not merged.removed and not merged.changed
+    assert len(central) == 300 and central.check_index() == []
+    assert central.get_random_book() is not None
+    assert central._books.get(edited.isbn).title == edited.title
+    assert central._borrowed_books[edited.isbn] == "Иванов"
+    assert central._loans.get(books[250].isbn).due == 123.0
+    assert central._loans.get(books[250].isbn).borrowed_at == branch._loans.get(books[250].isbn).borrowed_at
+    assert not central.diff(branch).added
+
+    merged = central.merge(branch, conflict="theirs")
+    assert [(ours.title, theirs.title) for ours, theirs in merged.changed] == [(edited.title, "Новое название")]
+    assert central.search_books("Новое название")[0].isbn == edited.isbn
+    assert central._borrowed_books[edited.isbn] == "Петров"
+    assert not central.diff(branch).changed and len(central.diff(branch).removed) == 100
+    assert central.check_index() == []
+
+    other = Library("Другой филиал") + Book("Своя книга", "Автор", 2000, "Роман", edited.isbn)
+    central + other
+    assert central._books.get(edited.isbn).title == "Новое название"
+    with pytest.raises(TypeError):
+        central + "Своя книга"
+    view = next(iter((Library("Хранилище", BookStore()) + SAMPLE_BOOKS[0])._books))
+    assert SAMPLE_BOOKS[0] in Library("Копия") + view
+    concurrent = ConcurrentLibrary("Потоки")
+    concurrent.merge(central, conflict="theirs")
+    assert not concurrent.diff(central) and concurrent._borrowed_books == central._borrowed_books
+    central.merge(other, conflict=lambda ours, theirs: theirs if theirs.year > ours.year else ours)
+    assert central._books.get(edited.isbn).title == ("Своя книга" if edited.year < 2000 else "Новое название")
+
+
+def test_concurrent_library_query_and_analytics():
+    pytest.importorskip("numpy")
+    library = ConcurrentLibrary("Потоки")
+    books = synthetic_books(3000)
+    library.add_books(books[:1000])
+    analytics = library.analytics()
+    assert library.analytics() is analytics
+
+    def writer():
+        for book in books[1000:]:
+            library.add_book(book)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    # запрос и отчёты не видят корзины и колонки посреди изменения
+    while thread.is_alive():
+        query = library.query().genre(books[0].genre)
+        assert all(book.genre == books[0].genre for book in query)
+        assert "обход индекса" in query.explain()
+        assert sum(analytics.count_by_decade().values()) >= 1000
+        assert analytics.top_authors(1)
+    thread.join()
+    assert len(analytics) == sum(analytics.count_by_genre().values()) == 3000
+
+    # пока идёт запись, запрос и отчёт ждут
+    for read in (lambda: list(library.query().genre(books[0].genre)), analytics.count_by_genre):
+        done = threading.Event()
+        with library._rwlock.write():
+            reader = threading.Thread(target=lambda: read() and done.set())
+            reader.start()
+            assert not done.wait(0.05)
+        reader.join(5)
+        assert done.is_set()
+
+    library.set_loan_policy(loan_days=1, max_per_reader=1)
+    assert library.borrow_book(books[0].isbn, "Reader") and not library.borrow_book(books[1].isbn, "Reader")
+
+
+def test_concurrent_library_merge_locks_other():
+    books = synthetic_books(200)
+    first, second = ConcurrentLibrary("Первая"), ConcurrentLibrary("Вторая")
+    first.add_books(books[:150])
+    second.add_books(books[50:])
+
+    # пока в другой библиотеке идёт запись, diff её не читает
+    done = threading.Event()
+    with second._rwlock.write():
+        thread = threading.Thread(target=lambda: first.diff(second) and done.set())
+        thread.start()
+        assert not done.wait(0.05)
+    thread.join(5)
+    assert done.is_set()
+
+    # встречные слияния берут блокировки в одном порядке и не ждут друг друга
+    threads = [threading.Thread(target=lambda: [first.merge(second) for _ in range(20)]),
+               threading.Thread(target=lambda: [second.merge(first) for _ in range(20)])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(first) == len(second) == 200
+
+
+def test_execute_commands():
+    library = Library("Test Library")
+
+    assert execute(library, "add 'Мастер и Маргарита' 'Михаил Булгаков' 1967 Роман 111") == (
+        True, "Добавлена новая книга: 'Мастер и Маргарита' - Михаил Булгаков (1967)")
+    assert execute(library, "add Book Author 1967 Роман")[1] == "Not enough arguments"
+    assert execute(library, "add Book Author year Роман 222")[0] is False
+    assert execute(library, "search Михаил Булгаков")[1].startswith("Найдено 1 книг; 111")
+    assert execute(library, "borrow 111 'Reader 1'")[0] is True
+    assert execute(library, "borrow 111 'Reader 2'")[0] is False
+    assert execute(library, "return 111")[0] is True
+    assert execute(library, "remove 111")[0] is True
+    assert execute(library, "fly away")[0] is False
+    assert execute(library, "search 'unclosed")[0] is False
+
+
+def test_server_pipelining():
+    async def scenario() -> list:
+        library = Library("Test Library")
+        server = await serve(library, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            # команды отправляются пачкой, ответы приходят в том же порядке
+            writer.write("add Book Author 2021 Fiction 111\n"
+                         "search Author\n"
+                         "borrow 111 Reader\n"
+                         "borrow 111 Other\n"
+                         "q\n".encode("utf-8"))
+            await writer.drain()
+            lines = [(await reader.readline()).decode("utf-8") for _ in range(4)]
+            assert await reader.read() == b""
+            writer.close()
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert [line.split()[0] for line in lines] == ["OK", "OK", "OK", "ERR"]
+    assert lines[1].startswith("OK Найдено 1 книг")
+
+
+def test_server_unexpected_error(monkeypatch):
+    import src.server
+
+    def failing(library, line):
+        if line.startswith("search"):
+            raise RuntimeError("сбой поиска")
+        return execute(library, line)
+
+    monkeypatch.setattr(src.server, "execute", failing)
+
+    async def scenario() -> list:
+        server = await serve(Library("Test Library"), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write("search Author\nadd Book Author 2021 Fiction 111\nq\n".encode("utf-8"))
+            await writer.drain()
+            lines = [(await reader.readline()).decode("utf-8") for _ in range(2)]
+            writer.close()
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert lines[0].startswith("ERR Внутренняя ошибка: RuntimeError: сбой поиска")
+    assert lines[1].startswith("OK")
+
+
+def test_loadgen_reproducible():
+    weights = parse_weights("search_books=3,update_index=0")
+    first = run([1, 2], steps=2000, catalog=200, weights=weights, workers=2)
+    again = run([1, 2], steps=2000, catalog=200, weights=weights, workers=1)
+
+    assert [r["fingerprint"] for r in first["seeds"]] == [r["fingerprint"] for r in again["seeds"]]
+    assert first["seeds"][0]["fingerprint"] != first["seeds"][1]["fingerprint"]
+    assert "update_index" not in first["events"]
+    assert sum(e["count"] for e in first["events"].values()) == 4000
+    assert first["events"]["search_books"]["p50_us"] <= first["events"]["search_books"]["p99_us"]
+    with pytest.raises(ValueError):
+        parse_weights("fly_away=1")
+
+
 def test_digital_library_creation():
     dlib = DigitalLibrary("Digital Test", max_digital_copies=5)
 
@@ -290,7 +1458,8 @@ def test_digital_library_digital_copies():
     assert dlib._digital_copies["123"] == 2
 
     dlib.add_digital_copy(book, copies=998)
-    assert dlib._digital_copies["123"] == dlib.max_digital_copies
+    assert dlib._leases.licensed("123") == dlib.max_digital_copies
+    assert dlib._digital_copies["123"] == dlib.max_digital_copies - 1
 
 
 def test_digital_library_multiple_borrow():
@@ -303,4 +1472,62 @@ def test_digital_library_multiple_borrow():
     assert dlib.borrow_book("123", "Reader 2") is True
 
     # Третий читатель не может получить (копии кончились)
-    assert dlib.borrow_book("123", "Reader 3") is False
\ No newline at end of file
+    assert dlib.borrow_book("123", "Reader 3") is False
+
+
+def test_digital_library_leases():
+    dlib = DigitalLibrary("Digital Test")
+    book = Book("E-Book", "E-Author", 2023, "E-Genre", "123")
+    dlib.add_digital_copy(book, copies=2)
+
+    # возврат без выдачи не увеличивает число копий
+    assert dlib.return_book("123") is False
+    assert dlib._digital_copies["123"] == 2
+
+    assert dlib.borrow_book("123", "Reader 2")
+    assert dlib.borrow_book("123", "Reader 1", due=time.time() - 1)
+    assert [lease.reader for lease in dlib.leases_of("123")] == ["Reader 2", "Reader 1"]
+    assert dlib.return_book("123", "Reader 3") is False
+
+    # истёкшая аренда первого читателя освобождает копию при следующей выдаче
+    assert dlib.borrow_book("123", "Reader 3") is True
+    assert [lease.reader for lease in dlib.leases_of("123")] == ["Reader 2", "Reader 3"]
+    assert dlib.borrow_book("123", "Reader 4") is False
+
+    assert dlib.return_book("123", "Reader 3") is True
+    assert dlib.return_book("123") is True
+    assert dlib.return_book("123") is False
+    assert dlib._digital_copies["123"] == 2
+
+    assert dlib.borrow_book("123", "Reader 5", due=time.time() - 1)
+    assert dlib.reclaim_expired() == 1
+    assert dlib._digital_copies["123"] == 2
+
+    # лимит считается вместе с выданными копиями
+    limited = DigitalLibrary("Digital Test", max_digital_copies=3)
+    limited.add_digital_copy(book, copies=3)
+    assert limited.borrow_book("123", "Reader 1") and limited.borrow_book("123", "Reader 2")
+    limited.add_digital_copy(book, copies=5)
+    assert limited._leases.licensed("123") == 3
+    assert limited._digital_copies["123"] == 1
+    assert limited.return_book("123") and limited.return_book("123")
+    assert limited._digital_copies["123"] == 3
+
+
+def test_digital_library_borrow_many():
+    dlib = DigitalLibrary("Digital Test")
+    for i in range(3):
+        dlib.add_digital_copy(Book(f"E-Book {i}", "E-Author", 2023, "E-Genre", str(i)), copies=1000)
+
+    requests = [(str(i % 3), f"Reader {i}") for i in range(2400)]
+    assert dlib.borrow_many(requests) is True
+    assert dlib._digital_copies == {"0": 200, "1": 200, "2": 200}
+
+    # на "0" не хватает копий: пакет не применяется целиком
+    assert dlib.borrow_many([("1", "Extra"), ("0", "Extra")] + [("0", "Extra")] * 200) is False
+    assert dlib._digital_copies == {"0": 200, "1": 200, "2": 200}
+
+    assert dlib.return_many(requests[:300] + [("0", "Nobody")]) == 300
+    assert dlib._digital_copies == {"0": 300, "1": 300, "2": 300}
+    assert dlib.return_many((isbn, None) for isbn in ["0"] * 800) == 700
+    assert dlib._digital_copies["0"] == 1000